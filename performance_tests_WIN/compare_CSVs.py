@@ -1,34 +1,15 @@
-import numpy as np
+import os
+import sys
 
-### Python-Script to compare 2 CSV-files to check if the Query-Output is the same ###
+### Compares the query outputs of the APIs, see performance_tests_WSL/compare_CSVs.py ###
+###                                                                                   ###
+###   python compare_CSVs.py openeo_resultQ2.csv wcs_resultQ2.csv rasql_outputQ2.csv  ###
+###   python compare_CSVs.py      (all outputs in this directory, per query)          ###
 
-def compare_csv_data(data1, data2):
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 
-    # Convert data to numpy arrays and cleans data from bracktes
-    arr1 = np.array([float(x.strip('{} \n}')) for x in data1.split(',')])
-    arr2 = np.array([float(x.strip('{} \n}')) for x in data2.split(',')])
-    
-    # Check array lengths
-    print(f"Array lengths: {len(arr1)} vs {len(arr2)}")
-    if len(arr1) != len(arr2):
-        print("CSVs ARE NOT EQUAL!!!: Arrays have different lengths!")
-        return
-        
-    # Compare arrays
-    differences = np.abs(arr1 - arr2)
-    max_diff = np.max(differences)
-    
-    print(f"Maximum difference: {max_diff}")
-    if max_diff > 0:
-        diff_indices = np.where(differences > 0)[0]
-        print(f"Number of differences: {len(diff_indices)}")
-        print("\nFirst 5 differences:")
-        for idx in diff_indices[:5]:
-            print(f"Index {idx}: {arr1[idx]} vs {arr2[idx]} (diff: {differences[idx]})")
+sys.path.insert(0, os.path.join(os.path.dirname(SCRIPT_DIR), 'performance_tests_WSL'))
+from compare_CSVs import main
 
-# Load and compare
-with open('result.csv', 'r') as f1, open('era5_weekly (4).csv', 'r') as f2:
-    data1 = f1.read()
-    data2 = f2.read()
-    
-compare_csv_data(data1, data2)
\ No newline at end of file
+if __name__ == "__main__":
+    main(default_dir=SCRIPT_DIR)
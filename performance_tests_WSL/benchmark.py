@@ -0,0 +1,490 @@
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import threading
+import subprocess
+from datetime import datetime
+
+# WCPS query builder of the OpenEO backend
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'rasdaman-WCS-openEO_API_implementation'))
+from openeo.wcps import subset_query
+from stats import describe, describe_phases, format_phases, format_stats, measurements, write_csv_report, write_phase_report
+from phases import timed, timed_post
+from rasdaman_csv import decode_csv
+from rasql_pool import MODES as RASQL_MODES, RasqlConnectionPool
+from sinks import SINKS, get_sink
+from cache_modes import CACHE_MODES, rotate_query, run_hook, window_count
+from validate import DEFAULT_SAMPLES, check_output, compare_aligned, expected_grid, shape_problems, validation_problems
+import history
+
+### Benchmark runner for the queries Q1-Q8 against OpenEO, WCS and RasQL    ###
+### The queries are defined once in queries.json, every API runs the same  ###
+### extents. Results are written as results.json (machine-readable),        ###
+### query_stats.csv and query_stats.txt (summary) to the output directory.  ###
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_MATRIX = os.path.join(SCRIPT_DIR, 'queries.json')
+
+# openeo: OpenEO API of Rasdaman, backend: /result of our OpenEO backend (app.py)
+APIS = ['openeo', 'backend', 'wcs', 'rasql']
+DEFAULT_APIS = ['openeo', 'wcs', 'rasql']
+
+# Parse every result into an array (decode phase), disabled with --skip-decode
+DECODE_RESULTS = True
+
+# How results are stored (sinks.py), set with --sink
+RESULT_SINK = get_sink('csv')
+
+# Shape check of the output after every n-th iteration (0: off), values are compared on samples per query.
+# The check scans the whole output (Q6/Q8: the full cube), so only the first and every 10th iteration by default
+VALIDATE_EVERY = 10
+VALIDATION_SAMPLES = DEFAULT_SAMPLES
+
+# warm, cold or both (cache_modes.py): cold iterations rotate the window and/or run the hook first
+CACHE_MODE = 'warm'
+COLD_ROTATION = True
+COLD_HOOK = None
+
+# RasQL connections: warm reuses them across iterations, cold opens one per query
+RASQL_MODE = 'warm'
+RASQL_MAX_USES = 0
+_rasql_pool = None
+_rasql_pool_lock = threading.Lock()
+
+# Size of the last result per thread, read by sweep.py
+_result_size = threading.local()
+
+def load_matrix(path):
+    """Load the query matrix and resolve the named extents of every query"""
+    with open(path) as f:
+        matrix = json.load(f)
+
+    for name, query in matrix['queries'].items():
+        query['name'] = name
+        query['spatial_extent'] = matrix['extents'][query['spatial_extent']]
+        query['temporal_extent'] = matrix['temporal_extents'][query['temporal_extent']]
+    return matrix
+
+def build_process_graph(collection, query):
+    return {
+        "load_data": {
+            "process_id": "load_collection",
+            "arguments": {
+                "id": collection,
+                "spatial_extent": query['spatial_extent'],
+                "temporal_extent": query['temporal_extent']
+            }
+        },
+        "save": {
+            "process_id": "save_result",
+            "arguments": {
+                "x": {
+                    "from_node": "load_data"
+                },
+                "format": "text/csv"
+            },
+            "result": True
+        }
+    }
+
+def last_result_bytes():
+    """Bytes of the last result of this thread (HTTP body or RasQL array), None if unknown"""
+    return getattr(_result_size, 'bytes', None)
+
+def save_response(response, output_file, phases):
+    """Decode and store a response, returns the request time (connect + ttfb + transfer)"""
+    response.raise_for_status()
+    _result_size.bytes = len(response.content)
+    array = None
+    if DECODE_RESULTS or RESULT_SINK.needs_array:
+        array = timed(phases, 'decode', decode_csv, response.content)
+    if not RESULT_SINK.discard:
+        timed(phases, 'write', RESULT_SINK.write_response, output_file, response.content, array)
+    return phases['connect'] + phases['ttfb'] + phases['transfer']
+
+def test_openeo_performance(matrix, query, output_file, url_key='openeo'):
+    body = {
+        "title": query['name'],
+        "description": query['name'],
+        "process": {
+            "process_graph": build_process_graph(matrix['collection'], query)
+        }
+    }
+
+    response, phases = timed_post(
+        matrix['endpoints'][url_key],
+        json=body,
+        auth=tuple(matrix['auth'])
+    )
+    return save_response(response, output_file, phases), phases
+
+def test_backend_performance(matrix, query, output_file):
+    return test_openeo_performance(matrix, query, output_file, url_key='backend')
+
+def test_wcs_performance(matrix, query, output_file):
+    wcps_query, _ = subset_query(
+        matrix['collection'],
+        query['spatial_extent'],
+        query['temporal_extent'],
+        "csv"
+    )
+    params = {
+        'SERVICE': 'WCS',
+        'VERSION': '2.0.1',
+        'REQUEST': 'ProcessCoverages',
+        'QUERY': wcps_query
+    }
+
+    response, phases = timed_post(
+        matrix['endpoints']['wcs'],
+        params=params,
+        auth=tuple(matrix['auth'])
+    )
+    return save_response(response, output_file, phases), phases
+
+def rasql_query(matrix, query):
+    collection = matrix['collection']
+    subset = f"{collection}[{query['rasql']['subset']}]"
+    if query['rasql'].get('encode'):
+        subset = f'encode({subset}, "{query["rasql"]["encode"]}")'
+    return f"SELECT {subset} FROM {collection}"
+
+def rasql_pool(matrix):
+    """Connection pool of the RasQL endpoint, created on first use"""
+    global _rasql_pool
+    with _rasql_pool_lock:
+        if _rasql_pool is None:
+            endpoint = matrix['endpoints']['rasql']
+            user, password = matrix['auth']
+            _rasql_pool = RasqlConnectionPool(
+                endpoint['host'], endpoint['port'], user, password, RASQL_MODE, RASQL_MAX_USES
+            )
+        return _rasql_pool
+
+def close_rasql_pool():
+    """Close the idle RasQL connections, returns the pool statistics (None if RasQL was not used)"""
+    global _rasql_pool
+    with _rasql_pool_lock:
+        pool, _rasql_pool = _rasql_pool, None
+    if pool is None:
+        return None
+    pool.close_all()
+    return pool.stats()
+
+def test_rasql_performance(matrix, query, output_file):
+    phases = {}
+    _result_size.bytes = None
+    with rasql_pool(matrix).connection(phases) as query_executor:
+        result = timed(phases, 'execute', query_executor.execute_read, rasql_query(matrix, query))
+
+    if result and (DECODE_RESULTS or not RESULT_SINK.discard):
+        data_array = timed(phases, 'decode', result.to_array)
+        _result_size.bytes = getattr(data_array, 'nbytes', None)
+        if not RESULT_SINK.discard:
+            timed(phases, 'write', RESULT_SINK.write_array, output_file, data_array)
+
+    # As before, only the query itself counts as execution time
+    return phases['execute'], phases
+
+def test_rasql_cli_performance(matrix, query, output_file):
+    """RasQL via the rasql binary, e.g. from Windows with "command": ["wsl", "/opt/rasdaman/bin/rasql"]"""
+    user, password = matrix['auth']
+    rasql_cmd = matrix['endpoints']['rasql']['command'] + [
+        "-q", rasql_query(matrix, query),
+        "--user", user,
+        "--passwd", password,
+        "--out", "file",
+        "--outfile", os.path.splitext(output_file)[0]
+    ]
+
+    _result_size.bytes = None
+    start_time = time.perf_counter()
+    process = subprocess.run(rasql_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+    execution_time = time.perf_counter() - start_time
+
+    if process.returncode != 0:
+        raise RuntimeError(f"RasQL command failed with error: {process.stderr}")
+    # The rasql binary connects, queries and writes in one process
+    return execution_time, {"execute": execution_time}
+
+TESTS = {
+    'openeo': test_openeo_performance,
+    'backend': test_backend_performance,
+    'wcs': test_wcs_performance,
+    'rasql': test_rasql_performance
+}
+
+def measure(test, matrix, query, api, iterations, output_file, cold=False):
+    """
+    Measured iterations of one API
+
+    Cold iterations run the cold hook first (not measured) and, with
+    rotation, read window i + 1 of the query, so no iteration repeats the
+    window of the warm-up or of the previous iteration.
+    """
+    times = []
+    phase_times = {}
+    errors = []
+    hook_times = []
+    validation = {"checked": 0, "problems": []}
+
+    for i in range(iterations):
+        iteration_query = rotate_query(query, i + 1) if cold and COLD_ROTATION else query
+        try:
+            if cold and COLD_HOOK:
+                hook_times.append(run_hook(COLD_HOOK, query, api, i + 1))
+            execution_time, phases = test(matrix, iteration_query, output_file)
+            times.append(execution_time)
+            for phase, elapsed in phases.items():
+                phase_times.setdefault(phase, []).append(elapsed)
+            print(f"{query['name']} {api}{' cold' if cold else ''} iteration {i + 1}: {execution_time:.3f} seconds")
+        except Exception as e:
+            errors.append({"iteration": i + 1, "error": str(e)})
+            print(f"{query['name']} {api} iteration {i + 1} Error: {e}")
+            continue
+
+        # Outside of the measured time, only the shape is checked to keep it cheap
+        if VALIDATE_EVERY and i % VALIDATE_EVERY == 0 and os.path.exists(output_file):
+            validation["checked"] += 1
+            try:
+                problems = shape_problems(api, check_output(output_file, expected_grid(iteration_query)))
+            except ValueError as e:
+                problems = [f"{api}: {e}"]
+            for problem in problems:
+                validation["problems"].append({"iteration": i + 1, "problem": problem})
+                print(f"{query['name']} {api} iteration {i + 1} Validation: {problem}")
+
+    measurement = {
+        "cache": 'cold' if cold else 'warm',
+        "iterations": iterations,
+        "times": times,
+        "errors": errors,
+        "stats": describe(times),
+        "phases": describe_phases(phase_times),
+        "phase_times": phase_times,
+        "validation": validation
+    }
+    if cold:
+        measurement["windows"] = window_count(query) if COLD_ROTATION else 1
+        measurement["hook_times"] = hook_times
+    return measurement
+
+def run_query(matrix, query, apis, iterations, warmup, output_dir):
+    """
+    Run one query against every API: warm-up runs first (not recorded), then the measured iterations
+
+    With CACHE_MODE both the warm iterations are followed by cold ones,
+    stored under "cold" of the API result.
+    """
+    results = {}
+    for api in apis:
+        output_file = os.path.join(output_dir, f"{api}_result{query['name']}{RESULT_SINK.extension}")
+        test = TESTS[api]
+
+        for i in range(warmup):
+            try:
+                test(matrix, query, output_file)
+            except Exception as e:
+                print(f"{query['name']} {api} warm-up {i + 1} Error: {e}")
+
+        result = measure(test, matrix, query, api, iterations, output_file, cold=CACHE_MODE == 'cold')
+        if CACHE_MODE == 'both':
+            result['cold'] = measure(test, matrix, query, api, iterations, output_file, cold=True)
+        results[api] = dict(
+            result,
+            warmup=warmup,
+            output_file=os.path.basename(output_file) if result['times'] and not RESULT_SINK.discard else None
+        )
+    return results
+
+def validate_outputs(query, results, output_dir):
+    """Align the last outputs of all APIs of a query and compare them on sampled grid points"""
+    outputs = {
+        api: os.path.join(output_dir, result['output_file'])
+        for api, result in results.items()
+        if result['output_file'] and os.path.exists(os.path.join(output_dir, result['output_file']))
+    }
+    if not outputs:
+        return None
+    try:
+        validation = compare_aligned(outputs, expected_grid(query), VALIDATION_SAMPLES)
+        validation["problems"] = validation_problems(validation)
+    except ValueError as e:
+        validation = {"problems": [str(e)]}
+    for problem in validation["problems"]:
+        print(f"{query['name']} Validation: {problem}")
+    return validation
+
+def compare_with_baseline(results, baseline):
+    """Relative change of the mean time per query and API against a previous results.json"""
+    comparison = {}
+    for name, apis in results['queries'].items():
+        for api, api_result in apis.items():
+            previous = {
+                measurement.get('cache', 'warm'): measurement['stats']
+                for measurement in measurements(baseline.get('queries', {}).get(name, {}).get(api, {'stats': None}))
+            }
+            for result in measurements(api_result):
+                cache = result.get('cache', 'warm')
+                if not previous.get(cache) or not result['stats']:
+                    continue
+                # Warm results keep the API as key, like results.json without cache modes
+                key = api if cache == 'warm' else f"{api} ({cache})"
+                comparison.setdefault(name, {})[key] = {
+                    "baseline_mean": previous[cache]['mean'],
+                    "mean": result['stats']['mean'],
+                    "change": result['stats']['mean'] / previous[cache]['mean'] - 1
+                }
+    return comparison
+
+def write_text_report(results, path):
+    with open(path, 'w') as f:
+        f.write(f"Performance Test Results\n")
+        f.write(f"Date: {results['meta']['date']}\n")
+        f.write(f"Host: {results['meta']['host']}\n")
+        pool = results['meta'].get('rasql_pool')
+        if pool:
+            f.write(f"RasQL connections: {pool['mode']} ({pool['opened']} opened, {pool['closed']} closed)\n")
+
+        for name, apis in results['queries'].items():
+            f.write(f"\n{name}: {results['meta']['queries'][name]}\n")
+            for api, api_result in apis.items():
+                for result in measurements(api_result):
+                    stats = result['stats']
+                    cache = result.get('cache', 'warm')
+                    if cache == 'cold':
+                        hook = f", Hook: {sum(result['hook_times']):.3f} seconds" if result['hook_times'] else ""
+                        cache = f"cold, {result['windows']} windows{hook}"
+                    f.write(f"\n{api} Statistics ({cache}, Number of Iterations: {result['iterations']}, "
+                            f"Warm-up: {api_result['warmup']}, Errors: {len(result['errors'])}):\n")
+                    if not stats:
+                        continue
+                    for line in format_stats(stats) + format_phases(result['phases']):
+                        f.write(f"{line}\n")
+
+            validation = results.get('validation', {}).get(name)
+            if validation:
+                status = f"{len(validation['problems'])} problems" if validation['problems'] else "OK"
+                f.write(f"\nValidation ({validation.get('sampled', 0)} sampled grid points): {status}\n")
+                for problem in validation['problems']:
+                    f.write(f"{problem}\n")
+
+        if results.get('baseline'):
+            f.write(f"\nComparison with {results['meta']['baseline']}:\n")
+            for name, apis in results['baseline'].items():
+                for api, change in apis.items():
+                    f.write(f"{name} {api}: {change['baseline_mean']:.3f} -> {change['mean']:.3f} seconds "
+                            f"({change['change'] * 100:+.1f}%)\n")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark Q1-Q8 against OpenEO, WCS and RasQL")
+    parser.add_argument('--matrix', default=DEFAULT_MATRIX, help="Query matrix (JSON)")
+    parser.add_argument('--queries', nargs='+', help="Queries to run (default: all)")
+    parser.add_argument('--apis', nargs='+', choices=APIS, default=DEFAULT_APIS, help="APIs to benchmark")
+    parser.add_argument('--iterations', type=int, help="Iterations per query (default: from the matrix)")
+    parser.add_argument('--warmup', type=int, default=1, help="Unrecorded warm-up runs per query and API")
+    parser.add_argument('--output-dir', help="Output directory (default: benchmark_results/<timestamp>)")
+    parser.add_argument('--baseline', help="results.json of a previous run to compare against")
+    parser.add_argument('--history', default=history.DEFAULT_DATABASE,
+                        help="History database the run is appended to (compare with history.py)")
+    parser.add_argument('--no-history', action='store_true', help="Do not record the run in the history")
+    parser.add_argument('--rasql-cli', action='store_true',
+                        help="Run RasQL through the rasql binary instead of rasdapy (e.g. Windows with WSL)")
+    parser.add_argument('--skip-decode', action='store_true', help="Do not parse the results (no decode phase)")
+    parser.add_argument('--sink', choices=list(SINKS), default='csv',
+                        help="How results are stored: csv, npy, parquet, arrow (pyarrow) or discard")
+    parser.add_argument('--validate-every', type=int, default=VALIDATE_EVERY,
+                        help=f"Check the output shape after the first and every n-th iteration "
+                             f"(default: {VALIDATE_EVERY}, 0: no validation)")
+    parser.add_argument('--validation-samples', type=int, default=DEFAULT_SAMPLES,
+                        help="Grid points compared between the APIs per query")
+    parser.add_argument('--cache', choices=CACHE_MODES, default='warm',
+                        help="warm: repeat the same window, cold: defeat caches before every iteration, both: warm, then cold")
+    parser.add_argument('--cold-hook',
+                        help="Shell command run before every cold iteration (not measured), e.g. restarting Rasdaman")
+    parser.add_argument('--no-cold-rotation', action='store_true',
+                        help="Cold iterations read the same window (only the hook defeats caches)")
+    parser.add_argument('--rasql-connections', choices=RASQL_MODES, default='warm',
+                        help="warm: reuse RasQL connections across iterations, cold: one connection per query")
+    parser.add_argument('--rasql-max-uses', type=int, default=0,
+                        help="Queries per warm RasQL connection before it is renewed (0: unlimited)")
+    return parser.parse_args()
+
+def main():
+    global DECODE_RESULTS, RESULT_SINK, VALIDATE_EVERY, VALIDATION_SAMPLES, RASQL_MODE, RASQL_MAX_USES
+    global CACHE_MODE, COLD_ROTATION, COLD_HOOK
+    args = parse_args()
+    matrix = load_matrix(args.matrix)
+    DECODE_RESULTS = not args.skip_decode
+    RESULT_SINK = get_sink(args.sink)
+    VALIDATE_EVERY, VALIDATION_SAMPLES = args.validate_every, args.validation_samples
+    RASQL_MODE, RASQL_MAX_USES = args.rasql_connections, args.rasql_max_uses
+    CACHE_MODE, COLD_ROTATION, COLD_HOOK = args.cache, not args.no_cold_rotation, args.cold_hook
+    if args.rasql_cli:
+        TESTS['rasql'] = test_rasql_cli_performance
+
+    names = args.queries or list(matrix['queries'])
+    unknown = [name for name in names if name not in matrix['queries']]
+    if unknown:
+        sys.exit(f"Unknown queries: {', '.join(unknown)}")
+
+    started = datetime.now()
+    output_dir = args.output_dir or os.path.join(SCRIPT_DIR, 'benchmark_results', started.strftime('%Y%m%d_%H%M%S'))
+    os.makedirs(output_dir, exist_ok=True)
+
+    print("Starting Performance Tests...\n")
+
+    results = {
+        "meta": {
+            "date": started.strftime('%Y-%m-%d %H:%M:%S'),
+            "host": socket.gethostname(),
+            "matrix": os.path.abspath(args.matrix),
+            "apis": args.apis,
+            "iterations": args.iterations,
+            "warmup": args.warmup,
+            "baseline": args.baseline,
+            "rasql_connections": args.rasql_connections,
+            "sink": args.sink,
+            "cache": args.cache,
+            "cold_rotation": not args.no_cold_rotation if args.cache != 'warm' else None,
+            "cold_hook": args.cold_hook if args.cache != 'warm' else None,
+            "queries": {name: matrix['queries'][name]['description'] for name in names}
+        },
+        "queries": {}
+    }
+
+    for name in names:
+        query = matrix['queries'][name]
+        iterations = args.iterations if args.iterations is not None else query['iterations']
+        print(f"{name}: {query['description']} ({iterations} iterations)")
+        if CACHE_MODE != 'warm' and not COLD_HOOK and (not COLD_ROTATION or window_count(query) < 2):
+            print(f"Warning: {name} cannot be rotated, cold iterations only miss the caches with --cold-hook")
+        elif CACHE_MODE != 'warm' and COLD_ROTATION and window_count(query) < iterations:
+            print(f"Warning: {name} has only {window_count(query)} windows, cold iterations repeat windows")
+        print("-" * 50)
+        results['queries'][name] = run_query(matrix, query, args.apis, iterations, args.warmup, output_dir)
+        if VALIDATE_EVERY:
+            results.setdefault('validation', {})[name] = validate_outputs(query, results['queries'][name], output_dir)
+
+    results['meta']['rasql_pool'] = close_rasql_pool()
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            results['baseline'] = compare_with_baseline(results, json.load(f))
+
+    with open(os.path.join(output_dir, 'results.json'), 'w') as f:
+        json.dump(results, f, indent=2)
+    write_csv_report(results, os.path.join(output_dir, 'query_stats.csv'))
+    write_phase_report(results, os.path.join(output_dir, 'query_phases.csv'))
+    write_text_report(results, os.path.join(output_dir, 'query_stats.txt'))
+
+    print(f"\nResults written to {output_dir}")
+    if not args.no_history:
+        run_id = history.record(results, 'benchmark', output_dir, args.history)
+        print(f"Recorded as run {run_id} in {args.history}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+import os
+import copy
+import math
+import time
+import subprocess
+
+from validate import FULL_SIZES, GRID_AXES
+
+### Cold-cache measurements: every cold iteration has to miss the caches of ###
+### Rasdaman and the OS. Two strategies, usable together:                   ###
+###                                                                          ###
+### rotation: every iteration reads another window of the same size,        ###
+###           windows tile the Lat/Long axes and are visited in a scattered ###
+###           order, so consecutive iterations do not share tiles           ###
+### hook:     a shell command run before every iteration, e.g. restarting   ###
+###           Rasdaman or the stand-in, or dropping the page cache          ###
+
+# warm: measured after the warm-up on the same window, cold: caches defeated, both: warm, then cold
+CACHE_MODES = ['warm', 'cold', 'both']
+
+RESOLUTION = 0.25
+# Spatial extent keys of the rotated axes (low, high)
+EXTENT_KEYS = {'Lat': ('south', 'north'), 'Long': ('west', 'east')}
+
+def axis_windows(bounds, size):
+    """
+    Windows of an axis subset ("549:580" or the slice "568")
+
+    Returns:
+        tuple: (first index of window 0, cells, number of windows, window of the original),
+        None if the axis is open (*) or the window covers the whole axis
+    """
+    low, _, high = (bound.strip() for bound in bounds.partition(':'))
+    high = high or low
+    if low == '*' or high == '*':
+        return None
+    low, high = int(low), int(high)
+    cells = high - low + 1
+    first = low % cells
+    count = (size - first) // cells
+    if count < 2:
+        return None
+    return first, cells, count, low // cells
+
+def scatter_step(count):
+    """Step coprime to count near the golden ratio, visits all windows far apart from each other"""
+    step = max(int(round(count * 0.618)), 1)
+    while math.gcd(step, count) != 1:
+        step += 1
+    return step
+
+def rotation_axes(query, axes=GRID_AXES):
+    """Rotatable axes of a query: {axis: (position in the subset, first, cells, count, original)}"""
+    rotatable = {}
+    for position, (axis, bounds) in enumerate(zip(axes, query['rasql']['subset'].split(','))):
+        if axis not in EXTENT_KEYS or axis not in FULL_SIZES:
+            continue
+        windows = axis_windows(bounds, FULL_SIZES[axis])
+        if windows:
+            rotatable[axis] = (position,) + windows
+    return rotatable
+
+def window_count(query):
+    """Number of distinct windows rotation visits (1: the query cannot be rotated)"""
+    return math.prod(windows[3] for windows in rotation_axes(query).values())
+
+def rotate_query(query, index):
+    """
+    Copy of the query that reads window `index` instead of its own extent
+
+    Window 0 is the original extent. Only whole grid cells are shifted, so
+    every window returns the same grid shape. The ansi axis is not rotated,
+    the timestamps of the irregular axis are not part of queries.json.
+    """
+    rotatable = rotation_axes(query)
+    total = math.prod(windows[3] for windows in rotatable.values())
+    if total < 2:
+        return query
+
+    position = index * scatter_step(total) % total
+    rotated = copy.deepcopy(query)
+    subset = rotated['rasql']['subset'].split(',')
+    for axis, (subset_position, first, cells, count, original) in rotatable.items():
+        window = (original + position) % count
+        position //= count
+        low = first + window * cells
+        shift = (low - int(subset[subset_position].split(':')[0])) * RESOLUTION
+        subset[subset_position] = f"{low}:{low + cells - 1}" if ':' in subset[subset_position] else str(low)
+        for key in EXTENT_KEYS[axis]:
+            rotated['spatial_extent'][key] += shift
+    rotated['rasql']['subset'] = ','.join(subset)
+    return rotated
+
+def run_hook(command, query, api, iteration):
+    """Run the cold hook, the query, API and iteration are passed as environment variables"""
+    env = dict(os.environ, BENCHMARK_QUERY=query['name'], BENCHMARK_API=api, BENCHMARK_ITERATION=str(iteration))
+    start = time.perf_counter()
+    process = subprocess.run(command, shell=True, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                             universal_newlines=True)
+    if process.returncode != 0:
+        raise RuntimeError(f"Cold hook failed with exit code {process.returncode}: {process.stderr.strip()}")
+    return time.perf_counter() - start
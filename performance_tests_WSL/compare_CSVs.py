@@ -1,34 +1,220 @@
+import os
+import re
+import sys
+import json
+import argparse
 import numpy as np
 
-### Python-Script to compare 2 CSV-files to check if the Query-Output is the same ###
+from rasdaman_csv import CHUNK_SIZE, iter_chunk_values
+from sinks import read_result
 
-def compare_csv_data(data1, data2):
+### Compares the query outputs of the APIs to check if they return the same ###
+### values. Files are read in fixed-size chunks and parsed with NumPy, so   ###
+### even full-cube outputs (Q8) never have to fit into memory as text.      ###
+### All outputs of a query are compared against the first one in one pass. ###
+###                                                                          ###
+###   python compare_CSVs.py --dir benchmark_results/<timestamp>            ###
+###   python compare_CSVs.py openeo_resultQ4.csv wcs_resultQ4.csv           ###
 
-    # Convert data to numpy arrays and cleans data from bracktes
-    arr1 = np.array([float(x.strip('{} \n}')) for x in data1.split(',')])
-    arr2 = np.array([float(x.strip('{} \n}')) for x in data2.split(',')])
-    
-    # Check array lengths
-    print(f"Array lengths: {len(arr1)} vs {len(arr2)}")
-    if len(arr1) != len(arr2):
-        print("CSVs ARE NOT EQUAL!!!: Arrays have different lengths!")
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+BLOCK_SIZE = 1024 * 1024  # Values compared per step
+MAX_EXAMPLES = 5
+
+# benchmark.py writes <api>_result<query>.<ext>, older runs <api>_result<query>_WSL.csv and the
+# Windows scripts <api>_result<query>.csv and rasql_output<query>.csv, without a number for Q1
+OUTPUT_NAME = re.compile(r'^(?P<api>[a-z]+)_(?:result|output)(?P<query>Q\d+)?(?:_\w+)?\.(?:csv|npy|parquet|arrow)$')
+UNNUMBERED_QUERY = 'Q1'
+API_ORDER = ['openeo', 'backend', 'wcs', 'rasql']
+
+def iter_csv_values(path, chunk_size=CHUNK_SIZE):
+    """Values of a CSV output as a sequence of arrays"""
+    with open(path, 'rb') as f:
+        yield from iter_chunk_values(iter(lambda: f.read(chunk_size), b''))
+
+def iter_values(path, chunk_size=CHUNK_SIZE):
+    """Values of a CSV or binary (npy, parquet, arrow) output"""
+    if path.endswith('.csv'):
+        try:
+            yield from iter_csv_values(path, chunk_size)
+        except ValueError as e:
+            raise ValueError(f"{path} is not a numeric output: {e}")
         return
-        
-    # Compare arrays
-    differences = np.abs(arr1 - arr2)
-    max_diff = np.max(differences)
-    
-    print(f"Maximum difference: {max_diff}")
-    if max_diff > 0:
-        diff_indices = np.where(differences > 0)[0]
-        print(f"Number of differences: {len(diff_indices)}")
-        print("\nFirst 5 differences:")
-        for idx in diff_indices[:5]:
-            print(f"Index {idx}: {arr1[idx]} vs {arr2[idx]} (diff: {differences[idx]})")
-
-# Load and compare
-with open('openeo_resultQ1_WSL.csv', 'r') as f1, open('wcs_resultQ1_WSL.csv', 'r') as f2:
-    data1 = f1.read()
-    data2 = f2.read()
-    
-compare_csv_data(data1, data2)
\ No newline at end of file
+    values = read_result(path).reshape(-1)
+    step = chunk_size // 8
+    for start in range(0, len(values), step):
+        yield np.asarray(values[start:start + step], dtype=float)
+
+class ValueStream:
+    """Hands out the values of a file in blocks of any size"""
+
+    def __init__(self, path, chunk_size=CHUNK_SIZE):
+        self.chunks = iter_values(path, chunk_size)
+        self.buffer = np.empty(0)
+
+    def take(self, count):
+        parts = [self.buffer]
+        available = len(self.buffer)
+        for chunk in self.chunks:
+            parts.append(chunk)
+            available += len(chunk)
+            if available >= count:
+                break
+        values = np.concatenate(parts) if len(parts) > 1 else self.buffer
+        self.buffer = values[count:]
+        return values[:count]
+
+class DifferenceStats:
+    """Streaming absolute and relative differences between a reference and another output"""
+
+    def __init__(self, atol, rtol):
+        self.atol = atol
+        self.rtol = rtol
+        self.count = 0
+        self.sum_abs = 0.0
+        self.max_abs = 0.0
+        self.max_rel = 0.0
+        self.mismatches = 0
+        self.examples = []
+
+    def update(self, reference, values, offset):
+        difference = np.abs(values - reference)
+        # Both NaN counts as equal, one NaN as mismatch
+        both_nan = np.isnan(reference) & np.isnan(values)
+        difference[both_nan] = 0.0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            relative = np.where(difference == 0, 0.0, difference / np.abs(reference))
+
+        self.count += len(values)
+        self.sum_abs += float(np.nansum(difference))
+        self.max_abs = max(self.max_abs, float(np.nanmax(difference, initial=0.0)))
+        self.max_rel = max(self.max_rel, float(np.nanmax(relative, initial=0.0)))
+
+        mismatches = np.flatnonzero(~np.isclose(values, reference, rtol=self.rtol, atol=self.atol, equal_nan=True))
+        self.mismatches += len(mismatches)
+        for index in mismatches[:MAX_EXAMPLES - len(self.examples)]:
+            self.examples.append({
+                "index": int(offset + index),
+                "reference": float(reference[index]),
+                "value": float(values[index])
+            })
+
+    def result(self):
+        return {
+            "compared": self.count,
+            "max_abs_diff": self.max_abs,
+            "mean_abs_diff": self.sum_abs / self.count if self.count else None,
+            "max_rel_diff": self.max_rel,
+            "mismatches": self.mismatches,
+            "examples": self.examples
+        }
+
+def compare_files(paths, atol=1e-6, rtol=1e-6, chunk_size=CHUNK_SIZE, block_size=BLOCK_SIZE):
+    """
+    Compare every file against the first one in a single pass over all files
+
+    Returns:
+        dict: Number of values per file and the differences of every file to the reference
+    """
+    streams = [ValueStream(path, chunk_size) for path in paths]
+    stats = [DifferenceStats(atol, rtol) for _ in paths[1:]]
+    lengths = [0] * len(paths)
+
+    while True:
+        blocks = [stream.take(block_size) for stream in streams]
+        for i, block in enumerate(blocks):
+            lengths[i] += len(block)
+        if not any(len(block) for block in blocks):
+            break
+
+        reference = blocks[0]
+        offset = lengths[0] - len(reference)
+        for block, difference in zip(blocks[1:], stats):
+            # Values beyond the end of the shorter file are only counted
+            common = min(len(reference), len(block))
+            if common:
+                difference.update(reference[:common], block[:common], offset)
+
+    comparisons = {}
+    for path, length, difference in zip(paths[1:], lengths[1:], stats):
+        result = difference.result()
+        result["length_mismatch"] = length != lengths[0]
+        result["equal"] = not result["length_mismatch"] and result["mismatches"] == 0
+        comparisons[path] = result
+
+    return {
+        "reference": paths[0],
+        "values": dict(zip(paths, lengths)),
+        "comparisons": comparisons
+    }
+
+def find_outputs(directory, queries=None):
+    """Outputs per query in a result directory, ordered openeo, backend, wcs, rasql"""
+    outputs = {}
+    for name in sorted(os.listdir(directory)):
+        match = OUTPUT_NAME.match(name)
+        if not match:
+            continue
+        query = match.group('query') or UNNUMBERED_QUERY
+        if not queries or query in queries:
+            outputs.setdefault(query, []).append((match.group('api'), os.path.join(directory, name)))
+
+    def order(output):
+        api = output[0]
+        return API_ORDER.index(api) if api in API_ORDER else len(API_ORDER)
+
+    return {query: [path for _, path in sorted(files, key=order)] for query, files in sorted(outputs.items())}
+
+def print_comparison(name, comparison):
+    print(f"\n{name}: reference {os.path.basename(comparison['reference'])} "
+          f"({comparison['values'][comparison['reference']]} values)")
+    for path, result in comparison['comparisons'].items():
+        status = "EQUAL" if result['equal'] else "NOT EQUAL"
+        print(f"  {os.path.basename(path)}: {status}")
+        if result['length_mismatch']:
+            print(f"    Different number of values: {comparison['values'][path]}")
+        if result['compared']:
+            print(f"    Max abs diff {result['max_abs_diff']:.3g}, mean abs diff {result['mean_abs_diff']:.3g}, "
+                  f"max rel diff {result['max_rel_diff']:.3g}, {result['mismatches']} values outside the tolerance")
+        for example in result['examples']:
+            print(f"    Index {example['index']}: {example['reference']} vs {example['value']}")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Compare the query outputs of OpenEO, WCS and RasQL")
+    parser.add_argument('files', nargs='*', help="Output files, the first one is the reference")
+    parser.add_argument('--dir', help="Result directory, compares all outputs per query (default: this directory)")
+    parser.add_argument('--queries', nargs='+', help="Queries to compare (with --dir)")
+    parser.add_argument('--atol', type=float, default=1e-6, help="Absolute tolerance")
+    parser.add_argument('--rtol', type=float, default=1e-6, help="Relative tolerance")
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help="Bytes read per chunk")
+    parser.add_argument('--json', help="Write the comparison as JSON")
+    return parser.parse_args()
+
+def main(default_dir=SCRIPT_DIR):
+    args = parse_args()
+    if args.files:
+        if len(args.files) < 2:
+            sys.exit("At least two files are needed")
+        groups = {"files": args.files}
+    else:
+        groups = find_outputs(args.dir or default_dir, args.queries)
+        groups = {query: paths for query, paths in groups.items() if len(paths) > 1}
+        if not groups:
+            sys.exit("No query with at least two outputs found")
+
+    results = {}
+    for name, paths in groups.items():
+        try:
+            results[name] = compare_files(paths, args.atol, args.rtol, args.chunk_size)
+        except ValueError as e:
+            sys.exit(str(e))
+        print_comparison(name, results[name])
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    all_equal = all(result['equal'] for comparison in results.values() for result in comparison['comparisons'].values())
+    sys.exit(0 if all_equal else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,317 @@
+import os
+import sys
+import json
+import socket
+import sqlite3
+import argparse
+import platform
+import subprocess
+from datetime import datetime
+
+import numpy as np
+
+from stats import adjust_p_values, bootstrap_test, mann_whitney_u, measurements
+
+### Append-only history of all benchmark.py and loadgen.py runs (SQLite)    ###
+### with git commit, host and parameters, and a compare command that tests ###
+### a run against a baseline for significant regressions:                  ###
+###                                                                          ###
+###   python history.py list                                                ###
+###   python history.py compare --baseline previous --test mannwhitney      ###
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DATABASE = os.path.join(SCRIPT_DIR, 'benchmark_results', 'history.db')
+TESTS = ['mannwhitney', 'bootstrap']
+CORRECTIONS = ['holm', 'bh', 'none']
+# Compared by default; the phase times (phase_connect, ...) are small and noisy and only compared on request
+DEFAULT_METRICS = ['latency', 'cold_latency', 'throughput']
+# Metrics where a higher value is better, all others are times
+HIGHER_IS_BETTER = {'throughput'}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    created TEXT NOT NULL,
+    git_commit TEXT,
+    git_branch TEXT,
+    git_dirty INTEGER,
+    host TEXT,
+    platform TEXT,
+    python TEXT,
+    parameters TEXT NOT NULL,
+    output_dir TEXT
+);
+CREATE TABLE IF NOT EXISTS samples (
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    query TEXT NOT NULL,
+    api TEXT NOT NULL,
+    level REAL,
+    metric TEXT NOT NULL,
+    value REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS samples_run ON samples (run_id, query, api, metric);
+"""
+
+# Runs are never changed or removed once they are recorded
+APPEND_ONLY = """
+CREATE TRIGGER IF NOT EXISTS {table}_no_{action} BEFORE {action} ON {table}
+BEGIN SELECT RAISE(ABORT, '{table} is append-only'); END;
+"""
+
+def connect(path=DEFAULT_DATABASE):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    connection = sqlite3.connect(path)
+    connection.row_factory = sqlite3.Row
+    connection.executescript(SCHEMA)
+    for table in ('runs', 'samples'):
+        for action in ('UPDATE', 'DELETE'):
+            connection.executescript(APPEND_ONLY.format(table=table, action=action))
+    return connection
+
+def git_info():
+    """Commit, branch and uncommitted changes of the repository (None outside of git)"""
+    def git(*args):
+        try:
+            process = subprocess.run(['git', *args], cwd=SCRIPT_DIR, stdout=subprocess.PIPE,
+                                     stderr=subprocess.DEVNULL, universal_newlines=True, timeout=30)
+        except (OSError, subprocess.TimeoutExpired):
+            return None
+        return process.stdout.strip() if process.returncode == 0 else None
+
+    status = git('status', '--porcelain', '--untracked-files=no')
+    return {
+        "git_commit": git('rev-parse', 'HEAD'),
+        "git_branch": git('rev-parse', '--abbrev-ref', 'HEAD'),
+        "git_dirty": None if status is None else int(bool(status))
+    }
+
+def record_run(connection, kind, parameters, samples, output_dir=None):
+    """
+    Store a run and its samples
+
+    Args:
+        kind (str): benchmark or loadgen
+        parameters (dict): Everything needed to reproduce the run
+        samples (iterable): (query, api, level, metric, value)
+
+    Returns:
+        int: Id of the run
+    """
+    run = dict(
+        git_info(),
+        kind=kind,
+        created=datetime.now().isoformat(timespec='seconds'),
+        host=socket.gethostname(),
+        platform=platform.platform(),
+        python=platform.python_version(),
+        parameters=json.dumps(parameters),
+        output_dir=os.path.abspath(output_dir) if output_dir else None
+    )
+    with connection:
+        cursor = connection.execute(
+            f"INSERT INTO runs ({', '.join(run)}) VALUES ({', '.join('?' for _ in run)})",
+            list(run.values())
+        )
+        run_id = cursor.lastrowid
+        connection.executemany(
+            "INSERT INTO samples (run_id, query, api, level, metric, value) VALUES (?, ?, ?, ?, ?, ?)",
+            [(run_id, query, api, level, metric, float(value)) for query, api, level, metric, value in samples]
+        )
+    return run_id
+
+def benchmark_samples(results):
+    """Samples of a benchmark.py run: latency per iteration and the time of every phase"""
+    for name, apis in results['queries'].items():
+        for api, api_result in apis.items():
+            for result in measurements(api_result):
+                # Cold runs are only compared with cold runs
+                prefix = 'cold_' if result.get('cache') == 'cold' else ''
+                for value in result['times']:
+                    yield name, api, None, f"{prefix}latency", value
+                for phase, values in result.get('phase_times', {}).items():
+                    for value in values:
+                        yield name, api, None, f"{prefix}phase_{phase}", value
+
+def loadgen_samples(results):
+    """Samples of a loadgen.py run: latencies and throughput per second, per stage"""
+    for name, apis in results['queries'].items():
+        for api, result in apis.items():
+            for stage in result['stages']:
+                for value in stage.get('latencies', []):
+                    yield name, api, stage['level'], 'latency', value
+                for value in stage.get('throughput_windows', []):
+                    yield name, api, stage['level'], 'throughput', value
+
+def record(results, kind, output_dir, path=DEFAULT_DATABASE):
+    """Store a benchmark.py or loadgen.py result in the history, returns the run id"""
+    samples = benchmark_samples(results) if kind == 'benchmark' else loadgen_samples(results)
+    connection = connect(path)
+    try:
+        return record_run(connection, kind, results['meta'], samples, output_dir)
+    finally:
+        connection.close()
+
+def resolve_run(connection, selector, kind=None, before=None):
+    """
+    Run id for latest, previous (the run before `before`), an id or a git commit prefix
+    """
+    kind_filter = "AND kind = ?" if kind else ""
+    kind_args = [kind] if kind else []
+    if selector == 'latest':
+        row = connection.execute(f"SELECT id FROM runs WHERE 1 {kind_filter} ORDER BY id DESC LIMIT 1",
+                                 kind_args).fetchone()
+    elif selector == 'previous':
+        row = connection.execute(f"SELECT id FROM runs WHERE id < ? {kind_filter} ORDER BY id DESC LIMIT 1",
+                                 [before] + kind_args).fetchone()
+    elif selector.isdigit():
+        row = connection.execute("SELECT id FROM runs WHERE id = ?", [int(selector)]).fetchone()
+    else:
+        row = connection.execute(f"SELECT id FROM runs WHERE git_commit LIKE ? {kind_filter} ORDER BY id DESC LIMIT 1",
+                                 [f"{selector}%"] + kind_args).fetchone()
+    if row is None:
+        raise ValueError(f"No run found for {selector}")
+    return row['id']
+
+def load_samples(connection, run_id):
+    """{(query, api, level, metric): np.array}"""
+    samples = {}
+    for row in connection.execute("SELECT query, api, level, metric, value FROM samples WHERE run_id = ?", [run_id]):
+        samples.setdefault((row['query'], row['api'], row['level'], row['metric']), []).append(row['value'])
+    return {key: np.array(values) for key, values in samples.items()}
+
+def compare_runs(connection, baseline_id, run_id, test='mannwhitney', alpha=0.05, min_change=0.05,
+                 metrics=DEFAULT_METRICS, correction='holm'):
+    """
+    Test every query, API, load level and metric of a run against the baseline
+
+    A regression is a change in the worse direction that is statistically
+    significant (p < alpha) and larger than min_change (relative median),
+    so tiny but consistent differences do not fail a comparison. A full
+    matrix means well over a hundred tests, so the p-values are corrected
+    for multiple comparisons (correction) before they are held against
+    alpha; p_raw keeps the uncorrected value. metrics=None compares all
+    recorded metrics, including the phase times.
+    """
+    baseline = load_samples(connection, baseline_id)
+    candidate = load_samples(connection, run_id)
+    comparisons = []
+    for key in sorted(set(baseline) & set(candidate), key=lambda k: tuple('' if v is None else str(v) for v in k)):
+        query, api, level, metric = key
+        if metrics and metric not in metrics:
+            continue
+        before, after = baseline[key], candidate[key]
+        baseline_median, median = float(np.median(before)), float(np.median(after))
+        change = median / baseline_median - 1 if baseline_median else None
+
+        if test == 'mannwhitney':
+            result = mann_whitney_u(before, after)
+            p = result[1] if result else None
+            ci = None
+        else:
+            result = bootstrap_test(before, after)
+            p = result['p'] if result else None
+            ci = result['ci'] if result else None
+
+        comparisons.append({
+            "query": query,
+            "api": api,
+            "level": level,
+            "metric": metric,
+            "baseline_n": len(before),
+            "n": len(after),
+            "baseline_median": baseline_median,
+            "median": median,
+            "change": change,
+            "ci": ci,
+            "p_raw": p
+        })
+
+    adjusted = adjust_p_values([comparison['p_raw'] for comparison in comparisons], correction)
+    for comparison, p in zip(comparisons, adjusted):
+        change = comparison['change']
+        worse = change is not None and (change < 0 if comparison['metric'] in HIGHER_IS_BETTER else change > 0)
+        significant = p is not None and p < alpha and change is not None and abs(change) >= min_change
+        comparison.update({
+            "p": p,
+            "regression": significant and worse,
+            "improvement": significant and not worse
+        })
+    return comparisons
+
+def format_comparison(comparison):
+    level = f" @{comparison['level']:g}" if comparison['level'] is not None else ""
+    flag = "REGRESSION" if comparison['regression'] else "improved" if comparison['improvement'] else ""
+    change = f"{comparison['change'] * 100:+.1f}%" if comparison['change'] is not None else "n/a"
+    ci = f" CI [{comparison['ci'][0] * 100:+.1f}%, {comparison['ci'][1] * 100:+.1f}%]" if comparison['ci'] else ""
+    p = f"{comparison['p']:.3g}" if comparison['p'] is not None else "n/a"
+    return (f"{comparison['query']} {comparison['api']}{level} {comparison['metric']}: "
+            f"{comparison['baseline_median']:.4g} -> {comparison['median']:.4g} ({change}{ci}, p={p}, "
+            f"n={comparison['baseline_n']}/{comparison['n']}) {flag}").rstrip()
+
+def list_runs(connection, limit):
+    rows = connection.execute("SELECT * FROM runs ORDER BY id DESC LIMIT ?", [limit]).fetchall()
+    for row in reversed(rows):
+        commit = (row['git_commit'] or 'unknown')[:10] + ('+' if row['git_dirty'] else '')
+        parameters = json.loads(row['parameters'])
+        queries = ", ".join(parameters.get('queries', {}))
+        print(f"{row['id']:>5}  {row['created']}  {row['kind']:<9}  {commit:<11}  {row['host']}  {queries}")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark history and regression detection")
+    parser.add_argument('--database', default=DEFAULT_DATABASE, help="History database (SQLite)")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    list_parser = commands.add_parser('list', help="Show the recorded runs")
+    list_parser.add_argument('--limit', type=int, default=20)
+
+    compare_parser = commands.add_parser('compare', help="Test a run against a baseline")
+    compare_parser.add_argument('--run', default='latest', help="Run id, git commit or latest (default)")
+    compare_parser.add_argument('--baseline', default='previous',
+                                help="Run id, git commit, or previous (the run before --run of the same kind)")
+    compare_parser.add_argument('--test', choices=TESTS, default='mannwhitney', help="Statistical test")
+    compare_parser.add_argument('--alpha', type=float, default=0.05, help="Significance level")
+    compare_parser.add_argument('--correction', choices=CORRECTIONS, default='holm',
+                                help="Multiple-comparison correction: holm (family-wise), bh (false discovery rate) or none")
+    compare_parser.add_argument('--min-change', type=float, default=0.05,
+                                help="Smallest relative change of the median that counts (0.05 = 5%%)")
+    compare_parser.add_argument('--metrics', nargs='+', default=DEFAULT_METRICS,
+                                help=f"Metrics to compare (default: {' '.join(DEFAULT_METRICS)}; "
+                                     f"phase_<name> for phase times, all for every metric)")
+    compare_parser.add_argument('--json', help="Write the comparison as JSON")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    connection = connect(args.database)
+    try:
+        if args.command == 'list':
+            list_runs(connection, args.limit)
+            return
+
+        run_id = resolve_run(connection, args.run)
+        kind = connection.execute("SELECT kind FROM runs WHERE id = ?", [run_id]).fetchone()['kind']
+        baseline_id = resolve_run(connection, args.baseline, kind=kind, before=run_id)
+        metrics = None if 'all' in args.metrics else args.metrics
+        comparisons = compare_runs(connection, baseline_id, run_id, args.test, args.alpha, args.min_change,
+                                   metrics, args.correction)
+    except ValueError as e:
+        sys.exit(str(e))
+    finally:
+        connection.close()
+
+    print(f"Run {run_id} against baseline {baseline_id} ({args.test}, alpha {args.alpha}, "
+          f"{args.correction} correction):")
+    for comparison in comparisons:
+        print(format_comparison(comparison))
+    regressions = [c for c in comparisons if c['regression']]
+    print(f"\n{len(regressions)} regressions in {len(comparisons)} comparisons")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({"run": run_id, "baseline": baseline_id, "test": args.test, "correction": args.correction,
+                       "comparisons": comparisons}, f, indent=2)
+    sys.exit(1 if regressions else 0)
+
+if __name__ == "__main__":
+    main()
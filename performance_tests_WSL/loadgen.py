@@ -0,0 +1,284 @@
+import os
+import sys
+import csv
+import json
+import time
+import socket
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import benchmark
+from benchmark import (
+    APIS, DEFAULT_APIS, DEFAULT_MATRIX, RASQL_MODES, SCRIPT_DIR, TESTS,
+    close_rasql_pool, load_matrix, test_rasql_cli_performance
+)
+from sinks import SINKS, get_sink
+import history
+from stats import PERCENTILES, describe, percentile_key
+
+### Load generator for the queries Q1-Q8: measures throughput, latency       ###
+### percentiles and error rate of OpenEO, WCS and RasQL under concurrency.  ###
+###                                                                          ###
+### closed: N clients send requests back to back (one stage per N)          ###
+### open:   requests arrive at a constant rate, independent of how fast the ###
+###         API answers (one stage per rate); latency includes queueing     ###
+
+# A stage counts as saturated if its throughput grows by less than this factor
+SATURATION_GAIN = 1.05
+
+# Completed requests are counted per window, the history compares these throughput samples
+THROUGHPUT_WINDOW = 1.0
+
+def output_file(work_dir, api, name):
+    """Per-thread output file, concurrent requests must not write to the same file"""
+    return os.path.join(work_dir, f"{api}_load{name}_{threading.get_ident()}{benchmark.RESULT_SINK.extension}")
+
+def run_closed_stage(test, matrix, query, api, concurrency, duration, ramp_up, work_dir):
+    """
+    Closed loop: concurrency clients, each sends its next request as soon as the previous one returns
+
+    The clients start evenly spread over ramp_up seconds; only requests
+    started after the ramp-up are measured.
+    """
+    start = time.perf_counter()
+    measure_from = start + ramp_up
+    stop_at = measure_from + duration
+    samples = [[] for _ in range(concurrency)]
+
+    def client(index):
+        time.sleep(ramp_up * index / concurrency)
+        target = output_file(work_dir, api, query['name'])
+        while time.perf_counter() < stop_at:
+            request_start = time.perf_counter()
+            try:
+                test(matrix, query, target)
+                error = None
+            except Exception as e:
+                error = str(e)
+            finished = time.perf_counter()
+            if request_start >= measure_from:
+                samples[index].append((finished - request_start, error, finished - measure_from))
+
+    threads = [threading.Thread(target=client, args=(i,), daemon=True) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # Requests still running at stop_at are measured, the effective window is slightly longer
+    elapsed = max(time.perf_counter() - measure_from, duration)
+    return [sample for client_samples in samples for sample in client_samples], elapsed
+
+def run_open_stage(test, matrix, query, api, rate, duration, max_in_flight, work_dir):
+    """
+    Open loop: requests are scheduled at a constant arrival rate
+
+    Latency is measured from the scheduled start, so time spent waiting for
+    a free client is included and a saturated API shows up as growing
+    latency instead of a lower request rate (no coordinated omission).
+    """
+    total_requests = max(int(rate * duration), 1)
+    samples = []
+    samples_lock = threading.Lock()
+
+    def send(scheduled):
+        try:
+            test(matrix, query, output_file(work_dir, api, query['name']))
+            error = None
+        except Exception as e:
+            error = str(e)
+        finished = time.perf_counter()
+        with samples_lock:
+            samples.append((finished - scheduled, error, finished - start))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        for k in range(total_requests):
+            scheduled = start + k / rate
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            executor.submit(send, scheduled)
+    elapsed = time.perf_counter() - start
+    return samples, elapsed
+
+def throughput_windows(samples, elapsed, window=THROUGHPUT_WINDOW):
+    """Successful requests per second in each complete window of the stage"""
+    counts = [0] * int(elapsed // window)
+    for _, error, finished in samples:
+        index = int(finished // window)
+        if error is None and 0 <= index < len(counts):
+            counts[index] += 1
+    return [count / window for count in counts]
+
+def summarize_stage(samples, elapsed, level):
+    latencies = [latency for latency, error, _ in samples if error is None]
+    errors = [error for _, error, _ in samples if error is not None]
+    return {
+        "level": level,
+        "requests": len(samples),
+        "errors": len(errors),
+        "error_rate": len(errors) / len(samples) if samples else None,
+        "duration": elapsed,
+        "throughput": len(latencies) / elapsed if elapsed else None,
+        "latency": describe(latencies),
+        "first_errors": errors[:5],
+        "latencies": latencies,
+        "throughput_windows": throughput_windows(samples, elapsed)
+    }
+
+def saturation_level(stages):
+    """First level at which the throughput no longer grows, or None"""
+    for previous, stage in zip(stages, stages[1:]):
+        if previous['throughput'] and stage['throughput'] is not None \
+                and stage['throughput'] < previous['throughput'] * SATURATION_GAIN:
+            return previous['level']
+    return None
+
+def write_csv(results, path):
+    columns = ["query", "api", "mode", "level", "requests", "errors", "error_rate", "throughput"] \
+        + [percentile_key(p) for p in PERCENTILES]
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=columns)
+        writer.writeheader()
+        for name, apis in results['queries'].items():
+            for api, result in apis.items():
+                for stage in result['stages']:
+                    latency = stage['latency'] or {}
+                    row = {column: stage.get(column) for column in columns}
+                    row.update({"query": name, "api": api, "mode": results['meta']['mode']})
+                    for p in PERCENTILES:
+                        row[percentile_key(p)] = latency.get(percentile_key(p))
+                    writer.writerow(row)
+
+def write_text_report(results, path):
+    mode = results['meta']['mode']
+    unit = "clients" if mode == 'closed' else "req/s offered"
+    with open(path, 'w') as f:
+        f.write(f"Load Test Results ({mode} loop)\n")
+        f.write(f"Date: {results['meta']['date']}\n")
+        f.write(f"Host: {results['meta']['host']}\n")
+
+        for name, apis in results['queries'].items():
+            for api, result in apis.items():
+                f.write(f"\n{name} {api}:\n")
+                for stage in result['stages']:
+                    latency = stage['latency']
+                    percentiles = ", ".join(
+                        f"{percentile_key(p)} {latency[percentile_key(p)]:.3f}" for p in PERCENTILES
+                    ) if latency else "no successful requests"
+                    error_rate = stage['error_rate'] or 0
+                    f.write(f"{stage['level']:g} {unit}: {stage['throughput']:.2f} req/s, "
+                            f"error rate {error_rate * 100:.1f}%, {percentiles} seconds\n")
+                if result['saturation_level'] is not None:
+                    f.write(f"Saturation at {result['saturation_level']:g} {unit}\n")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Concurrent load generator for Q1-Q8")
+    parser.add_argument('--matrix', default=DEFAULT_MATRIX, help="Query matrix (JSON)")
+    parser.add_argument('--queries', nargs='+', default=['Q1'], help="Queries to run")
+    parser.add_argument('--apis', nargs='+', choices=APIS, default=DEFAULT_APIS, help="APIs to load")
+    parser.add_argument('--mode', choices=['closed', 'open'], default='closed',
+                        help="closed: fixed number of clients, open: constant arrival rate")
+    parser.add_argument('--concurrency', nargs='+', type=int, default=[1, 2, 4, 8, 16],
+                        help="Number of clients per stage (closed loop)")
+    parser.add_argument('--rate', nargs='+', type=float, default=[1, 2, 4, 8],
+                        help="Requests per second per stage (open loop)")
+    parser.add_argument('--duration', type=float, default=30, help="Measured seconds per stage")
+    parser.add_argument('--ramp-up', type=float, default=5,
+                        help="Seconds over which the clients of a stage start (closed loop)")
+    parser.add_argument('--max-in-flight', type=int, default=64,
+                        help="Maximum concurrent requests (open loop)")
+    parser.add_argument('--output-dir', help="Output directory (default: benchmark_results/loadgen_<timestamp>)")
+    parser.add_argument('--rasql-cli', action='store_true', help="Run RasQL through the rasql binary")
+    parser.add_argument('--sink', choices=list(SINKS), default='csv',
+                        help="How results are stored (discard: not at all)")
+    parser.add_argument('--rasql-connections', choices=RASQL_MODES, default='warm',
+                        help="warm: clients reuse RasQL connections, cold: one connection per request")
+    parser.add_argument('--history', default=history.DEFAULT_DATABASE,
+                        help="History database the run is appended to (compare with history.py)")
+    parser.add_argument('--no-history', action='store_true', help="Do not record the run in the history")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    matrix = load_matrix(args.matrix)
+    # Parsing the results would add client CPU time to every measured request
+    benchmark.DECODE_RESULTS = False
+    benchmark.RASQL_MODE = args.rasql_connections
+    benchmark.RESULT_SINK = get_sink(args.sink)
+    tests = dict(TESTS, rasql=test_rasql_cli_performance) if args.rasql_cli else TESTS
+
+    unknown = [name for name in args.queries if name not in matrix['queries']]
+    if unknown:
+        sys.exit(f"Unknown queries: {', '.join(unknown)}")
+
+    started = datetime.now()
+    output_dir = args.output_dir or os.path.join(
+        SCRIPT_DIR, 'benchmark_results', f"loadgen_{started.strftime('%Y%m%d_%H%M%S')}"
+    )
+    work_dir = os.path.join(output_dir, 'responses')
+    os.makedirs(work_dir, exist_ok=True)
+
+    levels = args.concurrency if args.mode == 'closed' else args.rate
+    results = {
+        "meta": {
+            "date": started.strftime('%Y-%m-%d %H:%M:%S'),
+            "host": socket.gethostname(),
+            "queries": args.queries,
+            "apis": args.apis,
+            "mode": args.mode,
+            "levels": levels,
+            "duration": args.duration,
+            "ramp_up": args.ramp_up if args.mode == 'closed' else None,
+            "max_in_flight": args.max_in_flight if args.mode == 'open' else None,
+            "rasql_connections": args.rasql_connections,
+            "sink": args.sink
+        },
+        "queries": {}
+    }
+
+    print(f"Starting {args.mode} loop load test...\n")
+
+    for name in args.queries:
+        query = matrix['queries'][name]
+        results['queries'][name] = {}
+        for api in args.apis:
+            stages = []
+            for level in levels:
+                if args.mode == 'closed':
+                    samples, elapsed = run_closed_stage(
+                        tests[api], matrix, query, api, level, args.duration, args.ramp_up, work_dir
+                    )
+                else:
+                    samples, elapsed = run_open_stage(
+                        tests[api], matrix, query, api, level, args.duration, args.max_in_flight, work_dir
+                    )
+                stage = summarize_stage(samples, elapsed, level)
+                stages.append(stage)
+
+                p99 = stage['latency'][percentile_key(99)] if stage['latency'] else float('nan')
+                print(f"{name} {api} {level:g}: {stage['throughput']:.2f} req/s, "
+                      f"{stage['errors']} errors, p99 {p99:.3f} seconds")
+
+            results['queries'][name][api] = {
+                "stages": stages,
+                "saturation_level": saturation_level(stages)
+            }
+
+    results['meta']['rasql_pool'] = close_rasql_pool()
+
+    with open(os.path.join(output_dir, 'loadgen_results.json'), 'w') as f:
+        json.dump(results, f, indent=2)
+    write_csv(results, os.path.join(output_dir, 'loadgen_stats.csv'))
+    write_text_report(results, os.path.join(output_dir, 'loadgen_stats.txt'))
+
+    print(f"\nResults written to {output_dir}")
+    if not args.no_history:
+        run_id = history.record(results, 'loadgen', output_dir, args.history)
+        print(f"Recorded as run {run_id} in {args.history}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,1041 @@
+import os
+import re
+import sys
+import json
+import time
+import struct
+import argparse
+import threading
+import numpy as np
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+from xml.sax.saxutils import escape
+
+# Process graph compiler of the OpenEO backend, /openeo/result runs the same WCPS as the backend
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'rasdaman-WCS-openEO_API_implementation'))
+from openeo.processes import compile_process_graph, ProcessGraphError
+from config import PYRAMIDS
+
+### Local stand-in for Rasdaman: serves WCS (GetCapabilities, DescribeCoverage, ###
+### GetCoverage, ProcessCoverages) and the OpenEO /result route over a          ###
+### synthetic era5_weekly cube, so the Python layers (backend, client,          ###
+### visualizer, benchmark.py, loadgen.py) can be measured without Rasdaman.     ###
+###                                                                              ###
+### ProcessCoverages understands the WCPS the backend generates: subsets,       ###
+### arithmetic, comparisons, casts, avg/min/max/add/count, the coverage         ###
+### constructors of openeo.wcps.reduce_axes and the condense expressions of     ###
+### openeo.wcps.reduce_axis. RasQL (rasserver) is not emulated.                 ###
+###                                                                              ###
+### The pyramid levels of config.PYRAMIDS (era5_weekly_1deg, era5_weekly_4deg)  ###
+### are served as coverages of their own, every level keeps every n-th grid     ###
+### point of the base cube.                                                     ###
+
+COVERAGE_ID = "era5_weekly"
+BAND = "t2m"
+NIL_VALUE = -9999
+AXES = ['ansi', 'Lat', 'Long']
+# Grid of ingredients.json: Lat -90..90 and Long 0..359.75 in steps of 0.25
+RESOLUTION = 0.25
+ORIGINS = {'Lat': -90.0, 'Long': 0.0}
+SIZES = {'Lat': 721, 'Long': 1440}
+# First timestamp of the real coverage (queries.json), one timestamp per step on average
+DEFAULT_START = "1970-01-10T03:08:48"
+DEFAULT_TIMESTAMPS = 167
+# The ansi axis is irregular like the real one: the gaps vary by up to +-50 % of the step.
+# First and last timestamp stay those of a regular axis, so time_range of queries.json still
+# covers every timestamp (0: regular axis)
+DEFAULT_JITTER = 0.5
+GRID_CRS = "CRS:1"
+
+FORMATS = {
+    'csv': 'text/csv',
+    'text/csv': 'text/csv',
+    'json': 'application/json',
+    'application/json': 'application/json',
+    'gtiff': 'image/tiff',
+    'tiff': 'image/tiff',
+    'image/tiff': 'image/tiff'
+}
+AGGREGATIONS = {
+    'add': np.sum,
+    'avg': np.mean,
+    'count': np.count_nonzero,
+    'min': np.min,
+    'max': np.max,
+    'some': np.any,
+    'all': np.all
+}
+OPERATORS = {
+    '+': np.add,
+    '-': np.subtract,
+    '*': np.multiply,
+    '/': np.divide,
+    '=': np.equal
+}
+CONDENSE_OPERATORS = {
+    '+': np.sum,
+    '*': np.prod,
+    'min': np.min,
+    'max': np.max,
+    'and': np.all,
+    'or': np.any
+}
+# Cast types, the values are stored as float64 again after the conversion
+CASTS = {
+    'boolean': np.bool_,
+    'char': np.int8,
+    'short': np.int16,
+    'int': np.int32,
+    'long': np.int32,
+    'float': np.float32,
+    'double': np.float64
+}
+OPERATIONS = ['GetCapabilities', 'DescribeCoverage', 'GetCoverage', 'ProcessCoverages']
+
+class MockError(Exception):
+    """Request the mock cannot answer, sent as OWS ExceptionReport"""
+
+    def __init__(self, message, status=400, code="InvalidRequest"):
+        super().__init__(message)
+        self.status = status
+        self.code = code
+
+def time_offsets(timestamps, step, jitter):
+    """
+    Offsets of the ansi timestamps from the first one in milliseconds
+
+    The gaps follow a fixed pattern between (1 - jitter) and (1 + jitter)
+    times the step, scaled so the last timestamp is where it would be on a
+    regular axis. The same arguments always give the same axis.
+    """
+    if not 0 <= jitter < 1:
+        raise ValueError(f"jitter must be in [0, 1), got {jitter}")
+    if timestamps < 2 or not jitter:
+        return np.round(np.arange(timestamps) * step * 1000).astype(np.int64)
+    gaps = 1.0 + jitter * np.sin(2.4 * np.arange(timestamps - 1) + 0.5)
+    span = (timestamps - 1) * step * 1000
+    offsets = np.round(np.concatenate([[0.0], np.cumsum(gaps)]) * span / gaps.sum()).astype(np.int64)
+    if np.any(np.diff(offsets) <= 0):
+        raise ValueError(f"A step of {step} seconds is too small for millisecond timestamps with jitter {jitter}")
+    return offsets
+
+class SyntheticCube:
+    """
+    era5_weekly-shaped cube (ansi x Lat x Long, float64)
+
+    Without data the values are computed from the grid coordinates for
+    every request, so only the requested subset is ever held in memory and
+    the full 721 x 1440 grid costs nothing until it is actually read. With
+    data (e.g. np.load(path, mmap_mode='r')) the given array is served.
+    With a storage (tiling.TileStorage) every read waits as long as loading
+    the touched tiles would take. A scale factor > 1 makes it a pyramid
+    level: every scale-th Lat/Long grid point, starting at the origin.
+    """
+
+    def __init__(self, timestamps=DEFAULT_TIMESTAMPS, start=DEFAULT_START, step=1.0, data=None, storage=None, scale=1,
+                 jitter=DEFAULT_JITTER):
+        if data is not None:
+            if data.shape[1:] != (SIZES['Lat'], SIZES['Long']):
+                raise ValueError(f"Cube must have the shape (ansi, {SIZES['Lat']}, {SIZES['Long']}), got {data.shape}")
+            timestamps = data.shape[0]
+        self._data = data
+        self.data = data[:, ::scale, ::scale] if data is not None and scale > 1 else data
+        self.storage = storage
+        self.scale = scale
+        self.resolution = RESOLUTION * scale
+        self.times = np.datetime64(start, 'ms') + time_offsets(timestamps, step, jitter).astype('timedelta64[ms]')
+        self.shape = (timestamps, (SIZES['Lat'] - 1) // scale + 1, (SIZES['Long'] - 1) // scale + 1)
+        self._base = (timestamps, start, step, jitter)
+
+    def level(self, scale):
+        """Pyramid level of a base cube, the tiling of the base is not simulated for it"""
+        timestamps, start, step, jitter = self._base
+        return SyntheticCube(timestamps, start, step, self._data, scale=scale, jitter=jitter)
+
+    def timestamp(self, index):
+        return f"{np.datetime_as_string(self.times[index], unit='ms')}Z"
+
+    def coordinates(self, axis, indices):
+        return ORIGINS[axis] + self.resolution * np.asarray(indices, dtype=float)
+
+    def read(self, selection):
+        """Values of a selection (per axis an index or an inclusive (low, high) range)"""
+        if self.storage:
+            time.sleep(self.storage.read_cost(selection))
+        index = tuple(s if isinstance(s, int) else slice(s[0], s[1] + 1) for s in selection)
+        if self.data is not None:
+            return np.array(self.data[index], dtype=float)
+
+        t, lat, lon = np.ix_(*[
+            np.arange(s[0], s[1] + 1) if isinstance(s, tuple) else np.array([s])
+            for s in selection
+        ])
+        lat = np.radians(self.coordinates('Lat', lat))
+        lon = np.radians(self.coordinates('Long', lon))
+        # Plausible 2 m temperatures in Kelvin: cold poles, a seasonal cycle and some structure
+        values = (
+            248.0 + 52.0 * np.cos(lat)
+            + 4.0 * np.sin(lon) * np.cos(lat)
+            - 6.0 * np.sin(lat) * np.cos(2 * np.pi * t / 52.0)
+            + 0.5 * np.sin(0.7 * t + 7.0 * lat + 3.0 * lon)
+        )
+        squeeze = tuple(k for k, s in enumerate(selection) if not isinstance(s, tuple))
+        return values.squeeze(axis=squeeze)
+
+    def grid_index(self, axis, value, crs=None, bound='slice'):
+        """Grid index of a subset bound (bound: slice, low or high)"""
+        size = self.shape[AXES.index(axis)]
+        if crs == GRID_CRS:
+            index = int(value)
+        elif axis == 'ansi':
+            index = self.time_index(value, bound)
+        else:
+            try:
+                position = (float(value) - ORIGINS[axis]) / self.resolution
+            except (TypeError, ValueError):
+                raise MockError(f"Invalid {axis} coordinate {value!r}")
+            # The cell of a grid point p spans (p - resolution, p], like the subsets of Rasdaman
+            # (Lat(47:55) selects the grid indices 549:580, see queries.json)
+            if bound == 'low':
+                index = int(np.floor(position + 1e-9)) + 1
+            else:
+                index = int(np.ceil(position - 1e-9))
+
+        if not 0 <= index < size:
+            raise MockError(f"Subset {axis}({value}) is outside of the coverage extent", code="InvalidSubsetting")
+        return index
+
+    def time_index(self, value, bound):
+        try:
+            time = np.datetime64(str(value).strip('"').rstrip('Z'), 'ms')
+        except ValueError:
+            raise MockError(f"Invalid timestamp {value!r}")
+        if bound == 'slice':
+            matches = np.flatnonzero(self.times == time)
+            if not len(matches):
+                raise MockError(f"No coefficient at ansi({value}) on the irregular axis", code="InvalidSubsetting")
+            return int(matches[0])
+        if bound == 'low':
+            return int(np.searchsorted(self.times, time, side='left'))
+        return int(np.searchsorted(self.times, time, side='right')) - 1
+
+class Coverage:
+    """
+    Coverage value during WCPS evaluation: a selection of the cube
+
+    The values are only read when needed, so chained subsets
+    ($c[Lat(...)][ansi(...)]) never touch more than the final selection.
+    """
+
+    def __init__(self, cube, selection=None, array=None):
+        self.cube = cube
+        self.selection = selection or [(0, size - 1) for size in cube.shape]
+        self._array = array
+
+    @property
+    def axes(self):
+        return [axis for axis, s in zip(AXES, self.selection) if isinstance(s, tuple)]
+
+    def values(self):
+        if self._array is None:
+            self._array = self.cube.read(self.selection)
+        return self._array
+
+    def subset(self, subsets):
+        """Apply (axis, crs, low, high, is_slice) subsets, None as bound stands for *"""
+        selection = list(self.selection)
+        array = self._array
+        for axis, crs, low, high, is_slice in subsets:
+            if axis not in AXES:
+                raise MockError(f"Unknown axis {axis}", code="InvalidAxisLabel")
+            k = AXES.index(axis)
+            current = selection[k]
+            if not isinstance(current, tuple):
+                raise MockError(f"Axis {axis} has already been sliced", code="InvalidSubsetting")
+
+            if is_slice:
+                new = self.cube.grid_index(axis, low, crs)
+                if not current[0] <= new <= current[1]:
+                    raise MockError(f"Slice {axis}({low}) is outside of the subset", code="InvalidSubsetting")
+            else:
+                lower = current[0] if low is None else max(self.cube.grid_index(axis, low, crs, 'low'), current[0])
+                upper = current[1] if high is None else min(self.cube.grid_index(axis, high, crs, 'high'), current[1])
+                if lower > upper:
+                    raise MockError(f"Subset {axis}({low}:{high}) is empty", code="InvalidSubsetting")
+                new = (lower, upper)
+
+            if array is not None:
+                position = [a for a, s in zip(AXES, selection) if isinstance(s, tuple)].index(axis)
+                index = new - current[0] if is_slice else slice(new[0] - current[0], new[1] - current[0] + 1)
+                array = array[(slice(None),) * position + (index,)]
+            selection[k] = new
+        return Coverage(self.cube, selection, array)
+
+    def domain(self, axis):
+        """imageCrsDomain of an axis: inclusive grid range"""
+        if axis not in self.axes:
+            raise MockError(f"Coverage has no axis {axis}", code="InvalidAxisLabel")
+        return self.selection[AXES.index(axis)]
+
+### WCPS subset: tokenizer, recursive descent parser and evaluator ###
+
+TOKEN = re.compile(r'\s*(?:(\$\w+)|"([^"]*)"|(\d+\.?\d*(?:[eE][-+]?\d+)?|\.\d+)|(\w+)|(\S))')
+
+def tokenize(text):
+    tokens = []
+    position = 0
+    text = text.strip()
+    while position < len(text):
+        match = TOKEN.match(text, position)
+        if not match or match.end() == position:
+            break
+        variable, string, number, name, symbol = match.groups()
+        if variable:
+            tokens.append(('var', variable[1:]))
+        elif string is not None:
+            tokens.append(('str', string))
+        elif number:
+            tokens.append(('num', float(number)))
+        elif name:
+            tokens.append(('name', name))
+        elif symbol:
+            tokens.append(('sym', symbol))
+        position = match.end()
+    return tokens
+
+class WcpsParser:
+    """
+    Parses the WCPS subset of the mock into nested tuples:
+    ('var', name), ('num', value), ('subset', expression, subsets),
+    ('agg', function, expression), ('binop', operator, left, right),
+    ('neg', expression), ('cast', type, expression),
+    ('coverage', name, iterators, values), ('condense', operator, iterators, using)
+    """
+
+    def __init__(self, text):
+        self.tokens = tokenize(text)
+        self.position = 0
+
+    def peek(self, kind=None, value=None):
+        if self.position >= len(self.tokens):
+            return False
+        token = self.tokens[self.position]
+        return (kind is None or token[0] == kind) and (value is None or token[1] == value)
+
+    def take(self, kind=None, value=None):
+        if not self.peek(kind, value):
+            found = self.tokens[self.position][1] if self.position < len(self.tokens) else "end of query"
+            raise MockError(f"WCPS syntax error: expected {value or kind}, found {found!r}", code="WcpsError")
+        token = self.tokens[self.position]
+        self.position += 1
+        return token[1]
+
+    def parse_query(self):
+        """Returns: (coverages {variable: coverage id}, expression, format or None)"""
+        self.take('name', 'for')
+        coverages = {}
+        while True:
+            variable = self.take('var') if self.peek('var') else self.take('name')
+            self.take('name', 'in')
+            self.take('sym', '(')
+            coverages[variable] = self.take('name')
+            self.take('sym', ')')
+            if not self.peek('sym', ','):
+                break
+            self.take('sym', ',')
+        self.take('name', 'return')
+
+        output_format = None
+        if self.peek('name', 'encode'):
+            self.take()
+            self.take('sym', '(')
+            expression = self.expression()
+            self.take('sym', ',')
+            output_format = self.take('str')
+            # Format parameters ("{...}") are accepted and ignored
+            if self.peek('sym', ','):
+                self.take('sym', ',')
+                self.take('str')
+            self.take('sym', ')')
+        else:
+            expression = self.expression()
+
+        if self.position != len(self.tokens):
+            raise MockError(f"WCPS syntax error at {self.tokens[self.position][1]!r}", code="WcpsError")
+        return coverages, expression, output_format
+
+    def expression(self):
+        left = self.sum()
+        if self.peek('sym', '='):
+            self.take()
+            left = ('binop', '=', left, self.sum())
+        return left
+
+    def sum(self):
+        left = self.term()
+        while self.peek('sym', '+') or self.peek('sym', '-'):
+            operator = self.take()
+            left = ('binop', operator, left, self.term())
+        return left
+
+    def term(self):
+        left = self.factor()
+        while self.peek('sym', '*') or self.peek('sym', '/'):
+            operator = self.take()
+            left = ('binop', operator, left, self.factor())
+        return left
+
+    def factor(self):
+        if self.peek('sym', '-'):
+            self.take()
+            return ('neg', self.factor())
+
+        if self.peek('num'):
+            node = ('num', self.take())
+        elif self.peek('var'):
+            node = ('var', self.take())
+        elif self.is_cast():
+            self.take('sym', '(')
+            cast = self.take('name')
+            self.take('sym', ')')
+            return ('cast', cast, self.factor())
+        elif self.peek('sym', '('):
+            self.take()
+            node = self.expression()
+            self.take('sym', ')')
+        elif self.peek('name', 'coverage'):
+            node = self.coverage_constructor()
+        elif self.peek('name', 'condense'):
+            node = self.condense()
+        elif self.peek('name') and self.tokens[self.position][1] in AGGREGATIONS:
+            function = self.take()
+            self.take('sym', '(')
+            node = ('agg', function, self.expression())
+            self.take('sym', ')')
+        elif self.peek('name'):
+            # Coverage variables may be written without $
+            node = ('var', self.take())
+        else:
+            raise MockError(f"WCPS syntax error at {self.tokens[self.position][1] if self.peek() else 'end of query'!r}",
+                            code="WcpsError")
+
+        while self.peek('sym', '['):
+            node = ('subset', node, self.subsets())
+        return node
+
+    def subsets(self):
+        self.take('sym', '[')
+        subsets = []
+        while True:
+            axis = self.take('name')
+            crs = None
+            if self.peek('sym', ':'):
+                self.take()
+                crs = self.take('str')
+            self.take('sym', '(')
+            low = self.bound()
+            high, is_slice = low, True
+            if self.peek('sym', ':'):
+                self.take()
+                high, is_slice = self.bound(), False
+            self.take('sym', ')')
+            subsets.append((axis, crs, low, high, is_slice))
+            if not self.peek('sym', ','):
+                break
+            self.take('sym', ',')
+        self.take('sym', ']')
+        return tuple(subsets)
+
+    def bound(self):
+        if self.peek('sym', '*'):
+            self.take()
+            return ('star',)
+        if self.peek('sym', '-'):
+            self.take()
+            return ('num', -self.take('num'))
+        if self.peek('num'):
+            return ('num', self.take())
+        if self.peek('str'):
+            return ('str', self.take())
+        return ('var', self.take('var'))
+
+    def is_cast(self):
+        """(int) and the other cast types in parentheses"""
+        tokens = self.tokens[self.position:self.position + 3]
+        return len(tokens) == 3 and tokens[0] == ('sym', '(') and tokens[1][0] == 'name' \
+            and tokens[1][1] in CASTS and tokens[2] == ('sym', ')')
+
+    def coverage_constructor(self):
+        self.take('name', 'coverage')
+        name = self.take('name')
+        self.take('name', 'over')
+        return ('coverage', name, self.iterators(), self.values())
+
+    def values(self):
+        self.take('name', 'values')
+        return self.expression()
+
+    def condense(self):
+        self.take('name', 'condense')
+        operator = self.take()
+        if operator not in CONDENSE_OPERATORS:
+            raise MockError(f"Condense operator {operator} is not supported", code="WcpsError")
+        self.take('name', 'over')
+        iterators = self.iterators()
+        self.take('name', 'using')
+        return ('condense', operator, iterators, self.expression())
+
+    def iterators(self):
+        iterators = []
+        while True:
+            variable = self.take('var')
+            axis = self.take('name')
+            self.take('sym', '(')
+            self.take('name', 'imageCrsDomain')
+            self.take('sym', '(')
+            domain = self.expression()
+            self.take('sym', ',')
+            domain_axis = self.take('name')
+            self.take('sym', ')')
+            self.take('sym', ')')
+            if domain_axis != axis:
+                raise MockError(f"Iterator ${variable} runs over {axis} but the domain of {domain_axis}", code="WcpsError")
+            iterators.append((variable, axis, domain))
+            if not self.peek('sym', ','):
+                break
+            self.take('sym', ',')
+        return tuple(iterators)
+
+def evaluate(node, env):
+    """Evaluate a parsed expression to a Coverage or a float"""
+    kind = node[0]
+    if kind == 'num':
+        return node[1]
+    if kind == 'var':
+        if node[1] not in env:
+            raise MockError(f"Unknown variable ${node[1]}", code="WcpsError")
+        return env[node[1]]
+    if kind == 'neg':
+        value = evaluate(node[1], env)
+        return Coverage(value.cube, value.selection, -value.values()) if isinstance(value, Coverage) else -value
+    if kind == 'subset':
+        value = evaluate(node[1], env)
+        if not isinstance(value, Coverage):
+            raise MockError("Only coverages can be subset", code="WcpsError")
+        return value.subset([
+            (axis, crs, resolve_bound(low, env), resolve_bound(high, env), is_slice)
+            for axis, crs, low, high, is_slice in node[2]
+        ])
+    if kind == 'agg':
+        value = evaluate(node[2], env)
+        values = value.values() if isinstance(value, Coverage) else np.asarray(value)
+        return float(AGGREGATIONS[node[1]](values))
+    if kind == 'binop':
+        return binary_operation(node[1], evaluate(node[2], env), evaluate(node[3], env))
+    if kind == 'cast':
+        value = evaluate(node[2], env)
+        with np.errstate(invalid='ignore'):
+            if isinstance(value, Coverage):
+                return Coverage(value.cube, value.selection, cast(value.values(), node[1]))
+            return float(cast(value, node[1]))
+    if kind == 'coverage':
+        return reduce_coverage(node, env)
+    if kind == 'condense':
+        return condense(node, env)
+    raise MockError(f"Unsupported WCPS expression {kind}", code="WcpsError")
+
+def resolve_bound(bound, env):
+    if bound[0] == 'star':
+        return None
+    if bound[0] == 'var':
+        if bound[1] not in env:
+            raise MockError(f"Unknown iterator ${bound[1]}", code="WcpsError")
+        return env[bound[1]]
+    return bound[1]
+
+def binary_operation(operator, left, right):
+    coverages = [value for value in (left, right) if isinstance(value, Coverage)]
+    if not coverages:
+        return float(OPERATORS[operator](left, right))
+    if len(coverages) == 2 and left.selection != right.selection:
+        raise MockError("Coverages of a binary operation must have the same domain", code="WcpsError")
+    result = OPERATORS[operator](
+        left.values() if isinstance(left, Coverage) else left,
+        right.values() if isinstance(right, Coverage) else right
+    )
+    return Coverage(coverages[0].cube, coverages[0].selection, result)
+
+def cast(values, type_name):
+    return np.asarray(values).astype(CASTS[type_name]).astype(float)
+
+def iterator_domains(iterators, env):
+    """{variable: (axis, (low, high))} of the iterators of a constructor or condense"""
+    domains = {}
+    for variable, axis, domain in iterators:
+        coverage = evaluate(domain, env)
+        if not isinstance(coverage, Coverage):
+            raise MockError(f"imageCrsDomain of ${variable} needs a coverage", code="WcpsError")
+        domains[variable] = (axis, coverage.domain(axis))
+    return domains
+
+def spread_iterators(node, domains):
+    """
+    The expression for all iterator values at once
+
+    Every slice X[a:"CRS:1"($i)] at an iterator becomes the trim
+    X[a:"CRS:1"(low:high)] over the domain of $i, so the expression is
+    evaluated once as an array that keeps the iterator axes instead of once
+    per iterator value (minutes for a 721 x 1440 grid).
+
+    Returns:
+        tuple: (expression, True if it depends on an iterator)
+    """
+    kind = node[0]
+    if kind in ('num', 'var'):
+        if kind == 'var' and node[1] in domains:
+            raise MockError(f"Iterator ${node[1]} can only be used as a CRS:1 slice", code="WcpsError")
+        return node, False
+    if kind == 'subset':
+        expression, used = spread_iterators(node[1], domains)
+        subsets = []
+        for axis, crs, low, high, is_slice in node[2]:
+            if low[0] == 'var' and low[1] in domains:
+                iterator_axis, (first, last) = domains[low[1]]
+                if not is_slice or crs != GRID_CRS or axis != iterator_axis:
+                    raise MockError(f"Iterator ${low[1]} must slice {iterator_axis} in CRS:1", code="WcpsError")
+                subsets.append((axis, GRID_CRS, ('num', first), ('num', last), False))
+                used = True
+            else:
+                subsets.append((axis, crs, low, high, is_slice))
+        return ('subset', expression, tuple(subsets)), used
+    if kind == 'neg':
+        expression, used = spread_iterators(node[1], domains)
+        return ('neg', expression), used
+    if kind in ('agg', 'cast'):
+        expression, used = spread_iterators(node[2], domains)
+        return (kind, node[1], expression), used
+    if kind == 'binop':
+        left, left_used = spread_iterators(node[2], domains)
+        right, right_used = spread_iterators(node[3], domains)
+        return ('binop', node[1], left, right), left_used or right_used
+    if kind in ('coverage', 'condense') and not uses_variables(node, domains):
+        # A nested reduction with iterators of its own is evaluated as it is
+        return node, False
+    raise MockError(f"{kind} inside a coverage constructor or condense is not supported", code="WcpsError")
+
+def uses_variables(node, variables):
+    """True if one of the variables occurs anywhere in the node"""
+    if isinstance(node, tuple):
+        if len(node) == 2 and node[0] == 'var':
+            return node[1] in variables
+        return any(uses_variables(part, variables) for part in node)
+    return False
+
+def reduced_selection(coverage, axes):
+    """Selection of a coverage whose axes were reduced, represented like sliced ones"""
+    return [s[0] if axis in axes and isinstance(s, tuple) else s for axis, s in zip(AXES, coverage.selection)]
+
+def reduce_coverage(node, env):
+    """
+    Coverage constructor in the form of openeo.wcps.reduce_axes:
+
+    coverage r over $i_ansi ansi(imageCrsDomain(X, ansi))
+    values avg(X[ansi:"CRS:1"($i_ansi)])
+
+    The values are computed as one aggregation over the other axes.
+    """
+    _, _, iterators, values = node
+    if values[0] != 'agg':
+        raise MockError("The values of a coverage constructor must be an aggregation", code="WcpsError")
+
+    expression, _ = spread_iterators(values[2], iterator_domains(iterators, env))
+    coverage = evaluate(expression, env)
+    keep = [axis for _, axis, _ in iterators]
+    if not isinstance(coverage, Coverage) or not set(keep) <= set(coverage.axes):
+        raise MockError("The values of a coverage constructor must keep every iterator axis", code="WcpsError")
+    reduce = [axis for axis in coverage.axes if axis not in keep]
+    result = AGGREGATIONS[values[1]](coverage.values(), axis=tuple(coverage.axes.index(axis) for axis in reduce))
+    return Coverage(coverage.cube, reduced_selection(coverage, reduce), np.asarray(result, dtype=float))
+
+def condense(node, env):
+    """
+    condense in the form of openeo.wcps.reduce_axis:
+
+    condense + over $i_ansi ansi(imageCrsDomain(X, ansi)) using X[ansi:"CRS:1"($i_ansi)]
+
+    The using expression is evaluated for all iterator values at once and
+    reduced along the iterator axes; a constant (using 1) is repeated once
+    per iterator value.
+    """
+    _, operator, iterators, using = node
+    domains = iterator_domains(iterators, env)
+    expression, used = spread_iterators(using, domains)
+    value = evaluate(expression, env)
+    if not used:
+        if isinstance(value, Coverage):
+            raise MockError("condense over a constant coverage is not supported", code="WcpsError")
+        count = int(np.prod([last - first + 1 for _, (first, last) in domains.values()]))
+        return float(CONDENSE_OPERATORS[operator](np.full(count, value)))
+
+    axes = [axis for axis, _ in domains.values()]
+    result = CONDENSE_OPERATORS[operator](value.values(), axis=tuple(value.axes.index(axis) for axis in axes))
+    if len(axes) == len(value.axes):
+        return float(result)
+    return Coverage(value.cube, reduced_selection(value, axes), np.asarray(result, dtype=float))
+
+def run_wcps(query, cubes):
+    """
+    Args:
+        cubes (dict): Coverage id -> SyntheticCube
+
+    Returns:
+        tuple: (body, media type)
+    """
+    coverages, expression, output_format = WcpsParser(query).parse_query()
+    env = {variable: Coverage(find_cube(cubes, coverage_id)) for variable, coverage_id in coverages.items()}
+    result = evaluate(expression, env)
+    if output_format is None:
+        if isinstance(result, Coverage):
+            raise MockError("A coverage result must be encoded", code="WcpsError")
+        return repr(result).encode(), 'text/plain'
+    return encode(result, output_format)
+
+### Encodings ###
+
+def encode(value, output_format):
+    media_type = FORMATS.get(output_format.lower())
+    if media_type is None:
+        raise MockError(f"Encoding format {output_format} is not supported by the mock", code="InvalidEncodingSyntax")
+    array = value.values() if isinstance(value, Coverage) else np.asarray(value, dtype=float)
+
+    if media_type == 'text/csv':
+        return encode_csv(array).encode(), media_type
+    if media_type == 'application/json':
+        return json.dumps(array.tolist()).encode(), media_type
+    if not isinstance(value, Coverage) or value.axes != ['Lat', 'Long']:
+        raise MockError("GeoTIFF needs a coverage with exactly the axes Lat and Long", code="InvalidEncodingSyntax")
+    return encode_geotiff(array, value), media_type
+
+def encode_csv(array):
+    """Rasdaman CSV: {v,v},{v,v} for 2D, every further dimension adds one level of braces"""
+    if array.ndim == 0:
+        return repr(float(array))
+    if array.ndim == 1:
+        return ",".join(map(repr, array.tolist()))
+    return ",".join("{" + encode_csv(part) + "}" for part in array)
+
+def encode_geotiff(array, coverage):
+    """
+    Uncompressed single-strip float64 GeoTIFF (EPSG:4326, pixel is area)
+
+    Rows run from north to south, the Lat axis of the grid from south to north.
+    """
+    array = np.ascontiguousarray(array[::-1], dtype='<f8')
+    height, width = array.shape
+    cube = coverage.cube
+    lat_range, long_range = coverage.selection[1], coverage.selection[2]
+    west = cube.coordinates('Long', long_range[0]) - cube.resolution
+    north = cube.coordinates('Lat', lat_range[1])
+
+    nodata = f"{NIL_VALUE}\0".encode()
+    extra = [
+        (33550, 12, struct.pack('<3d', cube.resolution, cube.resolution, 0.0)),
+        (33922, 12, struct.pack('<6d', 0.0, 0.0, 0.0, west, north, 0.0)),
+        # GeoKeyDirectory: geographic model, pixel is area, EPSG:4326
+        (34735, 3, struct.pack('<16H', 1, 1, 0, 3, 1024, 0, 1, 2, 1025, 0, 1, 1, 2048, 0, 1, 4326)),
+        (42113, 2, nodata)
+    ]
+    entries_count = 11 + len(extra)
+    offset = 8 + 2 + 12 * entries_count + 4
+    extra_offsets = []
+    extra_data = b''
+    for _, _, data in extra:
+        extra_offsets.append(offset + len(extra_data))
+        extra_data += data + b'\0' * (-len(data) % 8)
+    image_offset = offset + len(extra_data)
+
+    short, long_ = 3, 4
+    entries = [
+        (256, long_, 1, width),
+        (257, long_, 1, height),
+        (258, short, 1, 64),
+        (259, short, 1, 1),
+        (262, short, 1, 1),
+        (273, long_, 1, image_offset),
+        (277, short, 1, 1),
+        (278, long_, 1, height),
+        (279, long_, 1, array.nbytes),
+        (284, short, 1, 1),
+        (339, short, 1, 3)
+    ]
+    sizes = {2: 1, 3: 2, 12: 8}
+    for (tag, field_type, data), data_offset in zip(extra, extra_offsets):
+        entries.append((tag, field_type, len(data) // sizes[field_type], data_offset))
+
+    ifd = struct.pack('<H', len(entries))
+    for tag, field_type, count, value in entries:
+        # Values that fit into 4 bytes are stored in the entry itself
+        packed = struct.pack('<HI', value, 0)[:4] if field_type == short else struct.pack('<I', value)
+        ifd += struct.pack('<HHI', tag, field_type, count) + packed
+    ifd += struct.pack('<I', 0)
+    return b'II*\x00' + struct.pack('<I', 8) + ifd + extra_data + array.tobytes()
+
+### WCS documents ###
+
+def capabilities_document(coverage_ids):
+    operations = "".join(f'<ows:Operation name="{name}"/>' for name in OPERATIONS)
+    formats = "".join(f"<wcs:formatSupported>{media_type}</wcs:formatSupported>"
+                      for media_type in sorted(set(FORMATS.values())))
+    summaries = "".join(
+        f'<wcs:CoverageSummary><wcs:CoverageId>{coverage_id}</wcs:CoverageId>'
+        '<wcs:CoverageSubtype>ReferenceableGridCoverage</wcs:CoverageSubtype></wcs:CoverageSummary>'
+        for coverage_id in coverage_ids
+    )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        '<wcs:Capabilities xmlns:wcs="http://www.opengis.net/wcs/2.0" xmlns:ows="http://www.opengis.net/ows/2.0" version="2.0.1">'
+        '<ows:ServiceIdentification><ows:Title>Rasdaman mock</ows:Title></ows:ServiceIdentification>'
+        f'<ows:OperationsMetadata>{operations}</ows:OperationsMetadata>'
+        f'<wcs:ServiceMetadata>{formats}</wcs:ServiceMetadata>'
+        f'<wcs:Contents>{summaries}</wcs:Contents>'
+        '</wcs:Capabilities>'
+    ).encode()
+
+def describe_coverage_document(coverage_id, cube):
+    first, last = cube.timestamp(0), cube.timestamp(cube.shape[0] - 1)
+    lat_max = cube.coordinates('Lat', cube.shape[1] - 1)
+    long_max = cube.coordinates('Long', cube.shape[2] - 1)
+    coefficients = " ".join(f'"{cube.timestamp(i)}"' for i in range(cube.shape[0]))
+    high = " ".join(str(size - 1) for size in cube.shape)
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        '<wcs:CoverageDescriptions xmlns:wcs="http://www.opengis.net/wcs/2.0" xmlns:gml="http://www.opengis.net/gml/3.2" '
+        'xmlns:gmlcov="http://www.opengis.net/gmlcov/1.0" xmlns:swe="http://www.opengis.net/swe/2.0" '
+        'xmlns:gmlrgrid="http://www.opengis.net/gml/3.3/rgrid">'
+        f'<wcs:CoverageDescription gml:id="{coverage_id}">'
+        '<gml:boundedBy><gml:Envelope srsName="http://localhost:8080/def/crs-compound?1=http://localhost:8080/def/crs/OGC/0/AnsiDate'
+        '&amp;2=http://localhost:8080/def/crs/EPSG/0/4326" axisLabels="ansi Lat Long" uomLabels="d deg deg" srsDimension="3">'
+        f'<gml:lowerCorner>"{first}" {ORIGINS["Lat"] - cube.resolution} {ORIGINS["Long"] - cube.resolution}</gml:lowerCorner>'
+        f'<gml:upperCorner>"{last}" {lat_max} {long_max}</gml:upperCorner>'
+        '</gml:Envelope></gml:boundedBy>'
+        f'<wcs:CoverageId>{coverage_id}</wcs:CoverageId>'
+        '<gml:domainSet><gmlrgrid:ReferenceableGridByVectors dimension="3">'
+        f'<gml:limits><gml:GridEnvelope><gml:low>0 0 0</gml:low><gml:high>{high}</gml:high></gml:GridEnvelope></gml:limits>'
+        '<gml:axisLabels>ansi Lat Long</gml:axisLabels>'
+        f'<gmlrgrid:origin><gml:Point><gml:pos>"{first}" {ORIGINS["Lat"]} {ORIGINS["Long"]}</gml:pos></gml:Point></gmlrgrid:origin>'
+        '<gmlrgrid:generalGridAxis><gmlrgrid:GeneralGridAxis>'
+        '<gmlrgrid:offsetVector>1 0 0</gmlrgrid:offsetVector>'
+        f'<gmlrgrid:coefficients>{coefficients}</gmlrgrid:coefficients>'
+        '<gmlrgrid:gridAxesSpanned>ansi</gmlrgrid:gridAxesSpanned>'
+        '</gmlrgrid:GeneralGridAxis></gmlrgrid:generalGridAxis>'
+        '</gmlrgrid:ReferenceableGridByVectors></gml:domainSet>'
+        '<gmlcov:rangeType><swe:DataRecord>'
+        f'<swe:field name="{BAND}"><swe:Quantity><swe:nilValues><swe:NilValues>'
+        f'<swe:nilValue reason="">{NIL_VALUE}</swe:nilValue>'
+        '</swe:NilValues></swe:nilValues><swe:uom code="K"/></swe:Quantity></swe:field>'
+        '</swe:DataRecord></gmlcov:rangeType>'
+        '</wcs:CoverageDescription></wcs:CoverageDescriptions>'
+    ).encode()
+
+def exception_report(error):
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        '<ows:ExceptionReport xmlns:ows="http://www.opengis.net/ows/2.0" version="2.0.0">'
+        f'<ows:Exception exceptionCode="{error.code}"><ows:ExceptionText>{escape(str(error))}</ows:ExceptionText></ows:Exception>'
+        '</ows:ExceptionReport>'
+    ).encode()
+
+SUBSET = re.compile(r'^\s*(\w+)(?:,[^(]*)?\((.*)\)\s*$')
+
+def parse_kvp_subset(value):
+    """WCS KVP subset such as Lat(47,55) or ansi("2020-01-01") -> (axis, crs, low, high, is_slice)"""
+    match = SUBSET.match(value)
+    if not match:
+        raise MockError(f"Invalid SUBSET {value}", code="InvalidSubsetting")
+    axis, bounds = match.group(1), [bound.strip().strip('"') for bound in match.group(2).split(',')]
+    bounds = [None if bound == '*' else bound for bound in bounds]
+    if len(bounds) == 1:
+        return axis, None, bounds[0], bounds[0], True
+    if len(bounds) == 2:
+        return axis, None, bounds[0], bounds[1], False
+    raise MockError(f"Invalid SUBSET {value}", code="InvalidSubsetting")
+
+def get_coverage(params, cubes):
+    cube = find_cube(cubes, first_param(params, 'COVERAGEID'))
+    coverage = Coverage(cube).subset([parse_kvp_subset(value) for value in params.get('SUBSET', [])])
+    # Rasdaman answers with GML without FORMAT, the mock with JSON
+    return encode(coverage, first_param(params, 'FORMAT') or 'application/json')
+
+def find_cube(cubes, coverage_id):
+    if coverage_id not in cubes:
+        raise MockError(f"Coverage {coverage_id} does not exist", status=404, code="NoSuchCoverage")
+    return cubes[coverage_id]
+
+def pyramid_cubes(cube, levels=True):
+    """Coverage id -> cube: era5_weekly and, with levels, its pyramid levels from config.PYRAMIDS"""
+    cubes = {COVERAGE_ID: cube}
+    if levels:
+        for coverage_id, scale in PYRAMIDS.get(COVERAGE_ID, {}).get('levels', {}).items():
+            cubes[coverage_id] = cube.level(scale)
+    return cubes
+
+def first_param(params, name):
+    values = params.get(name)
+    return values[0] if values else None
+
+### HTTP server ###
+
+class MockRasdamanHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "MockRasdaman/1.0"
+
+    def do_GET(self):
+        self.handle_request()
+
+    def do_POST(self):
+        self.handle_request()
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def handle_request(self):
+        start = time.perf_counter()
+        url = urlsplit(self.path)
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+
+        try:
+            if url.path.rstrip('/').endswith('/result'):
+                content, media_type = self.openeo_result(body)
+            elif url.path.rstrip('/').endswith('/ows'):
+                content, media_type = self.ows(url.query, body)
+            else:
+                raise MockError(f"Unknown path {url.path}", status=404, code="NotFound")
+            status = 200
+        except MockError as e:
+            content, media_type, status = exception_report(e), 'application/xml', e.status
+        except Exception as e:
+            content, media_type, status = exception_report(MockError(str(e), code="InternalError")), 'application/xml', 500
+
+        # The injected latency comes on top of the time the request already took
+        remaining = self.server.latency - (time.perf_counter() - start)
+        if remaining > 0:
+            time.sleep(remaining)
+        self.send_response(status)
+        self.send_header('Content-Type', media_type)
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.write_body(content)
+
+    def write_body(self, content):
+        """Send the body, throttled to the configured bandwidth (bytes per second)"""
+        bandwidth = self.server.bandwidth
+        if not bandwidth:
+            self.wfile.write(content)
+            return
+
+        chunk_size = max(int(bandwidth / 100), 1024)
+        start = time.perf_counter()
+        for offset in range(0, len(content), chunk_size):
+            self.wfile.write(content[offset:offset + chunk_size])
+            ahead = (offset + chunk_size) / bandwidth - (time.perf_counter() - start)
+            if ahead > 0:
+                time.sleep(ahead)
+
+    def ows(self, query, body):
+        # KVP keys are case-insensitive, POST requests carry them form-encoded in the body
+        params = {}
+        for source in (query, body.decode('utf-8', 'replace')):
+            for key, values in parse_qs(source, keep_blank_values=True).items():
+                params.setdefault(key.upper(), []).extend(values)
+
+        request = (first_param(params, 'REQUEST') or '').lower()
+        cubes = self.server.cubes
+        if request == 'getcapabilities':
+            return capabilities_document(cubes), 'application/xml'
+        if request == 'describecoverage':
+            coverage_id = first_param(params, 'COVERAGEID')
+            return describe_coverage_document(coverage_id, find_cube(cubes, coverage_id)), 'application/xml'
+        if request == 'getcoverage':
+            return get_coverage(params, cubes)
+        if request == 'processcoverages':
+            query = first_param(params, 'QUERY')
+            if not query:
+                raise MockError("ProcessCoverages needs a QUERY", code="MissingParameterValue")
+            return run_wcps(query, cubes)
+        raise MockError(f"Operation {first_param(params, 'REQUEST')} is not supported", code="OperationNotSupported")
+
+    def openeo_result(self, body):
+        try:
+            document = json.loads(body or b'{}')
+            process_graph = document.get('process', {}).get('process_graph')
+            query, _ = compile_process_graph(process_graph)
+        except (ValueError, AttributeError, ProcessGraphError) as e:
+            raise MockError(f"Invalid process graph: {e}", code="ProcessGraphInvalid")
+        return run_wcps(query, self.server.cubes)
+
+class MockRasdamanServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, cube, latency=0.0, bandwidth=None, verbose=False, pyramid=True):
+        super().__init__(address, MockRasdamanHandler)
+        self.cube = cube
+        self.cubes = pyramid_cubes(cube, pyramid)
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.verbose = verbose
+
+def start_server(cube=None, host='localhost', port=0, latency=0.0, bandwidth=None, pyramid=True):
+    """Start the mock in a background thread (e.g. for tests), port 0 picks a free port"""
+    server = MockRasdamanServer((host, port), cube or SyntheticCube(), latency, bandwidth, pyramid=pyramid)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Local Rasdaman stand-in (WCS, WCPS subset, OpenEO /result)")
+    parser.add_argument('--host', default='localhost', help="Interface to listen on")
+    parser.add_argument('--port', type=int, default=8080, help="Port (Rasdaman: 8080)")
+    parser.add_argument('--timestamps', type=int, default=DEFAULT_TIMESTAMPS, help="Number of ansi timestamps")
+    parser.add_argument('--start', default=DEFAULT_START, help="First timestamp")
+    parser.add_argument('--step', type=float, default=1.0, help="Average seconds between two timestamps")
+    parser.add_argument('--jitter', type=float, default=DEFAULT_JITTER,
+                        help="Variation of the gaps between timestamps as a fraction of the step (0: regular axis)")
+    parser.add_argument('--cube', help="Serve a .npy array (ansi, 721, 1440) instead of synthetic values")
+    parser.add_argument('--latency', type=float, default=0.0, help="Minimum response time per request in seconds")
+    parser.add_argument('--bandwidth', type=float, help="Response bandwidth in MB/s (default: unlimited)")
+    parser.add_argument('--tiling', help="Simulate reads from this tiling, e.g. \"REGULAR [0:166, 0:31, 0:31]\"")
+    parser.add_argument('--tile-latency', type=float, default=0.002, help="Seconds per tile read (with --tiling)")
+    parser.add_argument('--disk-bandwidth', type=float, default=200, help="MB/s at which tiles are read (with --tiling)")
+    parser.add_argument('--no-pyramid', action='store_true', help="Serve only era5_weekly, not its pyramid levels")
+    parser.add_argument('--verbose', action='store_true', help="Log every request")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    data = np.load(args.cube, mmap_mode='r') if args.cube else None
+    storage = None
+    if args.tiling:
+        from tiling import Tiling, TileStorage
+        timestamps = data.shape[0] if data is not None else args.timestamps
+        tiling = Tiling.parse(args.tiling, [timestamps, SIZES['Lat'], SIZES['Long']])
+        storage = TileStorage(tiling, args.tile_latency, args.disk_bandwidth * 1024 * 1024)
+    try:
+        cube = SyntheticCube(args.timestamps, args.start, args.step, data, storage, jitter=args.jitter)
+    except ValueError as e:
+        sys.exit(str(e))
+    bandwidth = args.bandwidth * 1024 * 1024 if args.bandwidth else None
+
+    server = MockRasdamanServer((args.host, args.port), cube, args.latency, bandwidth, args.verbose, not args.no_pyramid)
+    for coverage_id, served in server.cubes.items():
+        print(f"Mock Rasdaman serving {coverage_id} {served.shape} on http://{args.host}:{server.server_port}/rasdaman/ows")
+    print(f"OpenEO: http://{args.host}:{server.server_port}/rasdaman/openeo/result")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
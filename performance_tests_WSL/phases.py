@@ -0,0 +1,97 @@
+import time
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+### Phase timings of a single benchmark request, measured with perf_counter: ###
+### connect (DNS, TCP and TLS), ttfb (request sent until the response       ###
+### headers arrive), transfer (response body), execute (RasQL query),       ###
+### decode (parse the result into an array), write (save to disk) and      ###
+### close (RasQL connection)                                                ###
+
+PHASES = ['connect', 'ttfb', 'transfer', 'execute', 'decode', 'write', 'close']
+
+# Connect time of the connections opened by the current thread
+_connect_times = threading.local()
+
+def _record_connect(elapsed):
+    _connect_times.total = getattr(_connect_times, 'total', 0.0) + elapsed
+
+def _take_connect_time():
+    elapsed = getattr(_connect_times, 'total', 0.0)
+    _connect_times.total = 0.0
+    return elapsed
+
+class TimedHTTPConnection(HTTPConnection):
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            _record_connect(time.perf_counter() - start)
+
+class TimedHTTPSConnection(HTTPSConnection):
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            _record_connect(time.perf_counter() - start)
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+class TimedAdapter(HTTPAdapter):
+    """HTTPAdapter whose connections report how long opening them took"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': TimedHTTPConnectionPool,
+            'https': TimedHTTPSConnectionPool
+        }
+
+def timed_session():
+    session = requests.Session()
+    adapter = TimedAdapter()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+def timed_post(url, **kwargs):
+    """
+    POST with connect/ttfb/transfer timings
+
+    Every call uses a new session and therefore a new connection, like
+    requests.post.
+
+    Returns:
+        tuple: (response with loaded body, phase timings in seconds)
+    """
+    with timed_session() as session:
+        _take_connect_time()
+        start = time.perf_counter()
+        # stream=True returns as soon as the headers have arrived
+        response = session.post(url, stream=True, **kwargs)
+        headers_received = time.perf_counter()
+        response.content
+        body_received = time.perf_counter()
+
+    connect = _take_connect_time()
+    return response, {
+        "connect": connect,
+        "ttfb": headers_received - start - connect,
+        "transfer": body_received - headers_received
+    }
+
+def timed(phases, phase, function, *args, **kwargs):
+    """Run function and add its duration to phases[phase]"""
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    phases[phase] = phases.get(phase, 0.0) + time.perf_counter() - start
+    return result
@@ -0,0 +1,244 @@
+import os
+import sys
+import copy
+import json
+import time
+import argparse
+from datetime import datetime
+
+import requests
+
+from benchmark import DEFAULT_MATRIX, SCRIPT_DIR, load_matrix
+from config import PYRAMIDS
+from openeo.pyramid import pyramid_levels
+from stats import describe
+from validate import GRID_AXES, INGREDIENTS
+
+### Multi-resolution pyramid of era5_weekly                                 ###
+###                                                                          ###
+### The levels are configured in config.PYRAMIDS of the backend (coverage   ###
+### id and scale factor of the Lat/Long axes, e.g. era5_weekly_1deg keeps   ###
+### every 4th grid point). The backend (resample_spatial) and the          ###
+### visualizer read the coarsest level that satisfies the requested        ###
+### resolution.                                                            ###
+###                                                                          ###
+###   python pyramid.py ingredients     ingredients.json + scale_factors,   ###
+###                                     wcst_import creates the levels      ###
+###                                     together with the base coverage     ###
+###   python pyramid.py create          levels of an already imported base  ###
+###                                     (WCS-T CreatePyramidMember)         ###
+###   python pyramid.py measure --mock  bytes and latency of a full-extent ###
+###                                     map per level                       ###
+
+# Only the spatial axes are downsampled, every weekly timestamp is kept
+SPATIAL_AXES = ('Lat', 'Long')
+MEASURE_APIS = ['wcs', 'openeo', 'backend']
+DEFAULT_MEASURE_APIS = ['wcs', 'openeo']
+
+def scale_factors(coverage_id, axes=GRID_AXES):
+    """[(level coverage, factors in grid order)] of the configured pyramid of a coverage"""
+    levels = PYRAMIDS.get(coverage_id, {}).get('levels', {})
+    return [
+        (level, [factor if axis in SPATIAL_AXES else 1 for axis in axes])
+        for level, factor in levels.items()
+    ]
+
+def pyramid_ingredients(ingredients, service_url=None):
+    """Ingredients that import the base coverage together with its pyramid levels"""
+    pyramid = copy.deepcopy(ingredients)
+    coverage_id = ingredients['input']['coverage_id']
+    factors = scale_factors(coverage_id)
+    if not factors:
+        raise ValueError(f"No pyramid configured for {coverage_id} (config.PYRAMIDS)")
+    pyramid['recipe']['options']['scale_factors'] = [
+        {"coverage_id": level, "factors": level_factors} for level, level_factors in factors
+    ]
+    if service_url:
+        pyramid['config']['service_url'] = service_url
+    return pyramid
+
+def create_levels(matrix, coverage_id):
+    """Create the pyramid levels of an imported coverage, returns the seconds per level"""
+    seconds = {}
+    for level, factors in scale_factors(coverage_id):
+        start = time.perf_counter()
+        response = requests.get(matrix['endpoints']['wcs'], params={
+            'SERVICE': 'WCS',
+            'VERSION': '2.0.1',
+            'REQUEST': 'CreatePyramidMember',
+            'BASE': coverage_id,
+            'MEMBER': level,
+            'SCALEFACTOR': ",".join(str(factor) for factor in factors)
+        }, auth=tuple(matrix['auth']))
+        if response.status_code != 200:
+            raise RuntimeError(f"Creating {level} failed with HTTP {response.status_code}: {response.text[:500]}")
+        seconds[level] = time.perf_counter() - start
+    return seconds
+
+def level_process_graph(collection, timestamp, resolution, output_format):
+    """Full-extent map of one timestamp, resample_spatial lets the backend pick the level"""
+    return {
+        "load_data": {
+            "process_id": "load_collection",
+            "arguments": {
+                "id": collection,
+                "spatial_extent": {"west": "*", "east": "*", "south": "*", "north": "*"},
+                "temporal_extent": [timestamp, timestamp]
+            }
+        },
+        "resample": {
+            "process_id": "resample_spatial",
+            "arguments": {"data": {"from_node": "load_data"}, "resolution": resolution}
+        },
+        "save": {
+            "process_id": "save_result",
+            "arguments": {"data": {"from_node": "resample"}, "format": output_format},
+            "result": True
+        }
+    }
+
+def request_level(matrix, api, coverage_id, resolution, timestamp, output_format):
+    """One full-extent map, returns (seconds, bytes)"""
+    start = time.perf_counter()
+    if api == 'wcs':
+        # The request of DataVisualizer.load_geotiff_data, on the level coverage
+        response = requests.get(matrix['endpoints']['wcs'], params={
+            'SERVICE': 'WCS',
+            'VERSION': '2.0.1',
+            'REQUEST': 'GetCoverage',
+            'COVERAGEID': coverage_id,
+            'FORMAT': 'image/tiff',
+            'SUBSET': f'ansi("{timestamp}")'
+        }, auth=tuple(matrix['auth']))
+    else:
+        response = requests.post(matrix['endpoints'][api], json={
+            "process": {
+                "process_graph": level_process_graph(matrix['collection'], timestamp, resolution, output_format)
+            }
+        }, auth=tuple(matrix['auth']))
+    response.raise_for_status()
+    return time.perf_counter() - start, len(response.content)
+
+def measure_levels(matrix, apis, iterations, output_format):
+    """Latency and response size of a full-extent map per pyramid level and API"""
+    levels = pyramid_levels(matrix['collection'])
+    if not levels:
+        raise ValueError(f"No pyramid configured for {matrix['collection']} (config.PYRAMIDS)")
+    timestamp = matrix['temporal_extents']['single_timestamp'][0]
+
+    results = []
+    for resolution, coverage_id in levels:
+        for api in apis:
+            latencies, sizes = [], []
+            for _ in range(iterations):
+                seconds, size = request_level(matrix, api, coverage_id, resolution, timestamp, output_format)
+                latencies.append(seconds)
+                sizes.append(size)
+            latency = describe(latencies)
+            results.append({
+                "coverage_id": coverage_id,
+                "resolution": resolution,
+                "api": api,
+                "bytes": sizes[-1],
+                "latency": {key: latency[key] for key in ('count', 'mean', 'min', 'max', 'p50', 'p95')}
+            })
+            print(f"{coverage_id} ({resolution:g} deg) {api}: {sizes[-1]} bytes, "
+                  f"median {latency['p50']:.3f} seconds")
+    return results
+
+def write_text_report(results, path):
+    native = {result['api']: result for result in results if result['resolution'] == results[0]['resolution']}
+    with open(path, 'w') as f:
+        f.write("Full-extent map per pyramid level\n\n")
+        f.write(f"{'Coverage':<20} {'Resolution':>10} {'API':<8} {'Bytes':>12} {'Reduction':>10} "
+                f"{'Median [s]':>11} {'Speedup':>8}\n")
+        for result in results:
+            base = native[result['api']]
+            reduction = base['bytes'] / result['bytes'] if result['bytes'] else float('nan')
+            speedup = base['latency']['p50'] / result['latency']['p50']
+            f.write(f"{result['coverage_id']:<20} {result['resolution']:>10g} {result['api']:<8} "
+                    f"{result['bytes']:>12} {reduction:>9.1f}x {result['latency']['p50']:>11.3f} {speedup:>7.1f}x\n")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Resolution pyramid of era5_weekly")
+    parser.add_argument('--matrix', default=DEFAULT_MATRIX, help="Query matrix (JSON)")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    ingredients_parser = commands.add_parser('ingredients', help="Write ingredients that import the pyramid levels")
+    ingredients_parser.add_argument('--ingredients', default=INGREDIENTS, help="ingredients.json of the base coverage")
+    ingredients_parser.add_argument('--output', help="Output file (default: ingredients_pyramid.json next to the input)")
+
+    commands.add_parser('create', help="Create the levels of an already imported coverage")
+
+    measure_parser = commands.add_parser('measure', help="Bytes and latency of a full-extent map per level")
+    measure_parser.add_argument('--apis', nargs='+', choices=MEASURE_APIS, default=DEFAULT_MEASURE_APIS,
+                                help="wcs: GetCoverage of the level, openeo/backend: /result with resample_spatial")
+    measure_parser.add_argument('--iterations', type=int, default=5, help="Requests per level and API")
+    measure_parser.add_argument('--format', default='gtiff', help="Output format of the /result requests")
+    measure_parser.add_argument('--mock', action='store_true', help="Measure against an in-process mock_rasdaman")
+    measure_parser.add_argument('--output-dir', help="Output directory (default: benchmark_results/pyramid_<timestamp>)")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    matrix = load_matrix(args.matrix)
+
+    if args.command == 'ingredients':
+        with open(args.ingredients) as f:
+            ingredients = json.load(f)
+        try:
+            pyramid = pyramid_ingredients(ingredients, matrix['endpoints']['wcs'])
+        except ValueError as e:
+            sys.exit(str(e))
+        output = args.output or os.path.join(os.path.dirname(args.ingredients), 'ingredients_pyramid.json')
+        with open(output, 'w') as f:
+            json.dump(pyramid, f, indent=2)
+        for level in pyramid['recipe']['options']['scale_factors']:
+            print(f"{level['coverage_id']}: scale factors {level['factors']}")
+        print(f"Written to {output}, import with wcst_import.sh {output}")
+        return
+
+    if args.command == 'create':
+        try:
+            seconds = create_levels(matrix, matrix['collection'])
+        except RuntimeError as e:
+            sys.exit(str(e))
+        for level, duration in seconds.items():
+            print(f"Created {level} in {duration:.1f} seconds")
+        return
+
+    server = None
+    if args.mock:
+        # Imported here, measuring against Rasdaman does not need the mock
+        from mock_rasdaman import start_server
+        server = start_server()
+        base = f"http://localhost:{server.server_port}/rasdaman"
+        matrix['endpoints'].update({"openeo": f"{base}/openeo/result", "wcs": f"{base}/ows"})
+    try:
+        results = measure_levels(matrix, args.apis, args.iterations, args.format)
+    finally:
+        if server:
+            server.shutdown()
+            server.server_close()
+
+    started = datetime.now()
+    output_dir = args.output_dir or os.path.join(
+        SCRIPT_DIR, 'benchmark_results', f"pyramid_{started.strftime('%Y%m%d_%H%M%S')}"
+    )
+    os.makedirs(output_dir, exist_ok=True)
+    with open(os.path.join(output_dir, 'pyramid_results.json'), 'w') as f:
+        json.dump({
+            "meta": {
+                "date": started.strftime('%Y-%m-%d %H:%M:%S'),
+                "mock": args.mock,
+                "apis": args.apis,
+                "iterations": args.iterations,
+                "format": args.format
+            },
+            "results": results
+        }, f, indent=2)
+    write_text_report(results, os.path.join(output_dir, 'pyramid_levels.txt'))
+    print(f"\nResults written to {output_dir}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+import numpy as np
+
+### Chunked parsing of Rasdaman CSV results ({{v,v}},{{v,v}}) and np.savetxt ###
+### rows. Every chunk is parsed with np.fromstring, so no Python object is  ###
+### created per value and full-cube results (Q6/Q8) stay at a few bytes    ###
+### of overhead per value. The grid shape comes from the brace nesting.    ###
+
+CHUNK_SIZE = 4 * 1024 * 1024  # Bytes parsed per chunk
+
+# Braces, commas and line breaks of the Rasdaman CSV ({{v,v}},{{v,v}}) all become separators
+SEPARATORS = bytes.maketrans(b'{},\r\n\t', b'      ')
+
+def parse_values(text):
+    """Parse space-separated numbers, fails if any token is not a number"""
+    values = np.fromstring(text, dtype=float, sep=' ')
+    codes = np.frombuffer(text, dtype=np.uint8) != ord(' ')
+    tokens = np.count_nonzero(codes[1:] & ~codes[:-1]) + int(codes[0])
+    if len(values) != tokens:
+        raise ValueError(f"Could not parse value {len(values) + 1} of a chunk")
+    return values
+
+def iter_chunk_values(chunks):
+    """Values of a CSV given as a sequence of byte chunks, as a sequence of arrays"""
+    tail = b''
+    for chunk in chunks:
+        chunk = tail + bytes(chunk).translate(SEPARATORS)
+        # The last number may continue in the next chunk
+        cut = chunk.rfind(b' ') + 1
+        tail = chunk[cut:]
+        if chunk[:cut].strip():
+            yield parse_values(chunk[:cut])
+    if tail.strip():
+        yield parse_values(tail)
+
+class GridShape:
+    """
+    Grid shape of a CSV output, fed chunk by chunk without parsing the numbers
+
+    Rasdaman nests every dimension but the first in braces, so the number of
+    opening braces per nesting level gives the size of every axis. Without
+    braces (np.savetxt) the lines are the rows.
+    """
+
+    def __init__(self):
+        self.openings = np.zeros(0, dtype=np.int64)
+        self.depth = 0
+        self.values = 0
+        self.lines = 0
+        self.in_token = False
+
+    def update(self, chunk):
+        chunk = bytes(chunk)
+        if not chunk:
+            return
+        codes = np.frombuffer(chunk, dtype=np.uint8)
+        opening = codes == ord('{')
+        levels = self.depth + np.cumsum(opening.astype(np.int64) - (codes == ord('}')))
+        self.depth = int(levels[-1])
+        counts = np.bincount(levels[opening], minlength=len(self.openings))
+        self.openings = np.pad(self.openings, (0, len(counts) - len(self.openings))) + counts
+
+        token = np.frombuffer(chunk.translate(SEPARATORS), dtype=np.uint8) != ord(' ')
+        self.values += int(np.count_nonzero(token[1:] & ~token[:-1])) + int(token[0] and not self.in_token)
+        self.in_token = bool(token[-1])
+        self.lines += chunk.count(b'\n')
+
+    def shape(self):
+        """
+        Returns:
+            tuple: (shape, True if the shape comes from savetxt rows)
+
+        Raises:
+            ValueError: If the nesting does not describe a regular grid
+        """
+        levels = [int(count) for count in self.openings[1:] if count]
+        if not levels:
+            if self.lines > 1 and self.values % self.lines == 0:
+                return (self.lines, self.values // self.lines), True
+            return (self.values,), False
+
+        sizes = [levels[0]]
+        for outer, inner in zip(levels, levels[1:] + [self.values]):
+            if inner % outer:
+                raise ValueError(f"Not a regular grid ({inner} elements in {outer} groups)")
+            sizes.append(inner // outer)
+        return tuple(sizes), False
+
+def content_chunks(content, chunk_size=CHUNK_SIZE):
+    """Slices of a response body without copying it as a whole"""
+    view = memoryview(content)
+    for start in range(0, len(view), chunk_size):
+        yield view[start:start + chunk_size]
+
+def decode_csv(content, chunk_size=CHUNK_SIZE):
+    """
+    Parse a Rasdaman CSV result ({v,v,...},{...}) into a float array of its grid shape
+
+    The binary sinks store this array, so the shape has to survive: a
+    Lat x Long result becomes a 2-D array, not a flat list of values.
+    """
+    grid = GridShape()
+
+    def chunks():
+        for chunk in content_chunks(content, chunk_size):
+            grid.update(chunk)
+            yield chunk
+
+    parts = list(iter_chunk_values(chunks()))
+    if not parts:
+        return np.empty(0)
+    values = parts[0] if len(parts) == 1 else np.concatenate(parts)
+    shape, _ = grid.shape()
+    return values.reshape(shape)
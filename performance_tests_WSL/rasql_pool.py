@@ -0,0 +1,111 @@
+import threading
+from contextlib import contextmanager
+
+from phases import timed
+
+### rasdapy connections for the RasQL benchmark                             ###
+###                                                                          ###
+### warm: connections are kept open and reused across iterations (and       ###
+###       threads of loadgen.py), optionally renewed after max_uses queries ###
+### cold: every query opens its own connection and closes it afterwards     ###
+###                                                                          ###
+### Opening and closing are timed as the phases connect and close, so they  ###
+### show up next to execute instead of disappearing from the measurement.   ###
+
+MODES = ['warm', 'cold']
+
+class RasqlConnection:
+    def __init__(self, connector, executor):
+        self.connector = connector
+        self.executor = executor
+        self.uses = 0
+
+class RasqlConnectionPool:
+    """
+    Pool of rasdapy DBConnector/QueryExecutor pairs
+
+    The pool grows to the number of concurrent users; idle connections are
+    kept until close_all(). A connection whose query failed is never reused.
+    """
+
+    def __init__(self, host, port, user, password, mode='warm', max_uses=0):
+        if mode not in MODES:
+            raise ValueError(f"Unknown RasQL connection mode {mode}, expected one of {', '.join(MODES)}")
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.mode = mode
+        # Queries per connection before it is renewed, 0 = unlimited (cold always uses 1)
+        self.max_uses = 1 if mode == 'cold' else max_uses
+        self._idle = []
+        self._lock = threading.Lock()
+        self.opened = 0
+        self.closed = 0
+
+    def _open(self, phases):
+        # rasdapy is only available where rasdaman is installed (WSL)
+        from rasdapy.db_connector import DBConnector
+        from rasdapy.query_executor import QueryExecutor
+
+        connector = DBConnector(self.host, self.port, self.user, self.password)
+        timed(phases, 'connect', connector.open)
+        with self._lock:
+            self.opened += 1
+        return RasqlConnection(connector, QueryExecutor(connector))
+
+    def _close(self, connection, phases):
+        try:
+            timed(phases, 'close', connection.connector.close)
+        finally:
+            with self._lock:
+                self.closed += 1
+
+    @contextmanager
+    def connection(self, phases):
+        """
+        QueryExecutor for one query; connect and close times are added to phases
+
+        A reused connection reports a connect time of 0.
+        """
+        with self._lock:
+            connection = self._idle.pop() if self._idle else None
+        if connection is None:
+            connection = self._open(phases)
+        else:
+            phases.setdefault('connect', 0.0)
+
+        succeeded = False
+        try:
+            yield connection.executor
+            succeeded = True
+        finally:
+            connection.uses += 1
+            if succeeded and (not self.max_uses or connection.uses < self.max_uses):
+                with self._lock:
+                    self._idle.append(connection)
+            elif succeeded:
+                self._close(connection, phases)
+            else:
+                # Do not hide the error of the query behind an error while closing
+                try:
+                    self._close(connection, phases)
+                except Exception:
+                    pass
+
+    def close_all(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            try:
+                self._close(connection, {})
+            except Exception as e:
+                print(f"Error closing RasQL connection: {e}")
+
+    def stats(self):
+        return {
+            "mode": self.mode,
+            "max_uses": self.max_uses,
+            "opened": self.opened,
+            "closed": self.closed
+        }
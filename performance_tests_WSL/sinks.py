@@ -0,0 +1,127 @@
+import json
+import numpy as np
+from abc import ABC, abstractmethod
+
+from rasdaman_csv import decode_csv
+
+### Result sinks of the benchmark: how a query result is stored             ###
+###                                                                          ###
+### csv:     as before (HTTP responses raw, RasQL arrays via np.savetxt)     ###
+### npy:     raw NumPy array, read back memory-mapped                        ###
+### parquet: one float column, shape in the schema metadata (pyarrow)       ###
+### arrow:   Arrow IPC file, read back memory-mapped (pyarrow)              ###
+### discard: nothing is written, to measure the pure query latency          ###
+
+class ResultSink(ABC):
+    name = None
+    extension = ''
+    # HTTP responses have to be decoded into an array before they can be written
+    needs_array = True
+    discard = False
+
+    @abstractmethod
+    def write_array(self, path, array):
+        """Store a result array"""
+
+    def write_response(self, path, content, array):
+        """Store an HTTP response body (Rasdaman CSV) or its decoded array"""
+        self.write_array(path, array)
+
+    @abstractmethod
+    def read(self, path):
+        """Read a stored result back as array"""
+
+class CsvSink(ResultSink):
+    name = 'csv'
+    extension = '.csv'
+    needs_array = False
+
+    def write_array(self, path, array):
+        array = np.asarray(array)
+        rows = array.reshape(-1, array.shape[-1]) if array.ndim > 1 else array.reshape(1, -1)
+        np.savetxt(path, rows, delimiter=',', fmt='%.8f')
+
+    def write_response(self, path, content, array):
+        with open(path, 'wb') as file:
+            file.write(content)
+
+    def read(self, path):
+        # Handles both the Rasdaman CSV ({v,v},{v,v}) and the np.savetxt rows
+        with open(path, 'rb') as file:
+            return decode_csv(file.read())
+
+class NpySink(ResultSink):
+    name = 'npy'
+    extension = '.npy'
+
+    def write_array(self, path, array):
+        np.save(path, np.asarray(array))
+
+    def read(self, path):
+        return np.load(path, mmap_mode='r')
+
+class ParquetSink(ResultSink):
+    name = 'parquet'
+    extension = '.parquet'
+
+    def __init__(self):
+        # Imported here so the other sinks work without pyarrow
+        import pyarrow
+        import pyarrow.parquet
+        self.pa = pyarrow
+        self.pq = pyarrow.parquet
+
+    def table(self, array):
+        array = np.asarray(array)
+        table = self.pa.table({"value": array.ravel()})
+        return table.replace_schema_metadata({"shape": json.dumps(array.shape)})
+
+    def write_array(self, path, array):
+        self.pq.write_table(self.table(array), path)
+
+    def read(self, path):
+        return self.to_array(self.pq.read_table(path))
+
+    def to_array(self, table):
+        shape = json.loads(table.schema.metadata[b'shape'])
+        return table.column('value').to_numpy().reshape(shape)
+
+class ArrowSink(ParquetSink):
+    name = 'arrow'
+    extension = '.arrow'
+
+    def write_array(self, path, array):
+        table = self.table(array)
+        with self.pa.OSFile(path, 'wb') as file:
+            with self.pa.ipc.new_file(file, table.schema) as writer:
+                writer.write_table(table)
+
+    def read(self, path):
+        # The array points into the mapping, it stays open as long as the array is used
+        source = self.pa.memory_map(path, 'r')
+        return self.to_array(self.pa.ipc.open_file(source).read_all())
+
+class DiscardSink(ResultSink):
+    name = 'discard'
+    needs_array = False
+    discard = True
+
+    def write_array(self, path, array):
+        pass
+
+    def read(self, path):
+        raise ValueError("The discard sink does not store results")
+
+SINKS = {sink.name: sink for sink in [CsvSink, NpySink, ParquetSink, ArrowSink, DiscardSink]}
+
+def get_sink(name):
+    if name not in SINKS:
+        raise ValueError(f"Unknown result sink {name}, expected one of {', '.join(SINKS)}")
+    return SINKS[name]()
+
+def read_result(path):
+    """Read a stored result with the sink matching its file extension"""
+    for sink in SINKS.values():
+        if sink.extension and path.endswith(sink.extension):
+            return sink().read(path)
+    raise ValueError(f"No result sink for {path}")
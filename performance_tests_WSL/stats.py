@@ -0,0 +1,350 @@
+import csv
+import math
+import numpy as np
+
+### Latency statistics for the benchmark reports: high-resolution histogram, ###
+### percentiles, bootstrap confidence intervals and outlier detection        ###
+
+PERCENTILES = [50, 90, 95, 99, 99.9]
+
+class LatencyHistogram:
+    """
+    Log-linear latency histogram in the style of HdrHistogram.
+
+    Values are recorded in microseconds. Every power of two is split into
+    equally sized sub-buckets, so every recorded value is kept with a relative
+    error below 10^-significant_digits independent of its magnitude (1 us up
+    to hours), while the memory stays bounded by the number of distinct buckets.
+    """
+
+    def __init__(self, significant_digits=3):
+        self.significant_digits = significant_digits
+        self.sub_bucket_count = 2 ** math.ceil(math.log2(2 * 10 ** significant_digits))
+        self.sub_bucket_half_count = self.sub_bucket_count // 2
+        self.sub_bucket_bits = self.sub_bucket_count.bit_length() - 1
+        self.counts = {}
+        self.total_count = 0
+        self.min_value = None
+        self.max_value = None
+
+    def bucket_index(self, value):
+        if value < self.sub_bucket_count:
+            return value
+        shift = value.bit_length() - self.sub_bucket_bits
+        return shift * self.sub_bucket_half_count + (value >> shift)
+
+    def highest_equivalent_value(self, index):
+        """Largest value that falls into the bucket (the value HdrHistogram reports for percentiles)"""
+        if index < self.sub_bucket_count:
+            return index
+        shift = index // self.sub_bucket_half_count - 1
+        sub_bucket = index - shift * self.sub_bucket_half_count
+        return ((sub_bucket + 1) << shift) - 1
+
+    def record(self, seconds):
+        value = max(int(round(seconds * 1e6)), 0)
+        index = self.bucket_index(value)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.total_count += 1
+        self.min_value = value if self.min_value is None else min(self.min_value, value)
+        self.max_value = value if self.max_value is None else max(self.max_value, value)
+
+    def record_all(self, samples):
+        for seconds in samples:
+            self.record(seconds)
+        return self
+
+    def merge(self, other):
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.total_count += other.total_count
+        for value in (other.min_value, other.max_value):
+            if value is not None:
+                self.min_value = value if self.min_value is None else min(self.min_value, value)
+                self.max_value = value if self.max_value is None else max(self.max_value, value)
+        return self
+
+    def percentile(self, percentile):
+        """Value in seconds below or at which the given percentage of all samples lies"""
+        if not self.total_count:
+            return None
+        target = max(math.ceil(percentile / 100 * self.total_count), 1)
+        cumulative = 0
+        for index in sorted(self.counts):
+            cumulative += self.counts[index]
+            if cumulative >= target:
+                # The exact maximum is known, the bucket bound would overestimate it
+                return min(self.highest_equivalent_value(index), self.max_value) / 1e6
+        return self.max_value / 1e6
+
+    def to_dict(self):
+        """Sparse bucket counts, e.g. to merge histograms of several runs later"""
+        return {
+            "unit": "us",
+            "significant_digits": self.significant_digits,
+            "total_count": self.total_count,
+            "min": self.min_value,
+            "max": self.max_value,
+            "buckets": {str(self.highest_equivalent_value(index)): count for index, count in sorted(self.counts.items())}
+        }
+
+def bootstrap_ci(samples, statistic=np.mean, confidence=0.95, resamples=2000, seed=0):
+    """
+    Percentile bootstrap confidence interval of a statistic
+
+    Returns:
+        tuple: (lower, upper) or None for less than two samples
+    """
+    samples = np.asarray(samples, dtype=float)
+    if len(samples) < 2:
+        return None
+
+    rng = np.random.default_rng(seed)
+    resampled = samples[rng.integers(0, len(samples), size=(resamples, len(samples)))]
+    estimates = np.apply_along_axis(statistic, 1, resampled)
+    alpha = (1 - confidence) / 2
+    return float(np.quantile(estimates, alpha)), float(np.quantile(estimates, 1 - alpha))
+
+def mann_whitney_u(baseline, candidate):
+    """
+    Two-sided Mann-Whitney U test (normal approximation with tie and continuity correction)
+
+    Returns:
+        tuple: (U of the candidate, p-value) or None for an empty sample
+    """
+    baseline = np.asarray(baseline, dtype=float)
+    candidate = np.asarray(candidate, dtype=float)
+    n1, n2 = len(candidate), len(baseline)
+    if not n1 or not n2:
+        return None
+
+    values = np.concatenate([candidate, baseline])
+    _, inverse, counts = np.unique(values, return_inverse=True, return_counts=True)
+    # Tied values get the average of their ranks
+    average_ranks = np.cumsum(counts) - (counts - 1) / 2
+    ranks = average_ranks[inverse]
+
+    u = ranks[:n1].sum() - n1 * (n1 + 1) / 2
+    n = n1 + n2
+    ties = float(np.sum(counts ** 3 - counts))
+    variance = n1 * n2 / 12 * ((n + 1) - ties / (n * (n - 1))) if n > 1 else 0.0
+    if variance <= 0:
+        return float(u), 1.0
+
+    mean = n1 * n2 / 2
+    z = (abs(u - mean) - 0.5) / math.sqrt(variance)
+    return float(u), min(math.erfc(max(z, 0.0) / math.sqrt(2)), 1.0)
+
+def bootstrap_test(baseline, candidate, statistic=np.median, resamples=2000, confidence=0.95, seed=0):
+    """
+    Bootstrap of the relative change statistic(candidate) / statistic(baseline) - 1
+
+    Returns:
+        dict: Relative change, its confidence interval and the two-sided
+        p-value of "no change", or None for an empty sample
+    """
+    baseline = np.asarray(baseline, dtype=float)
+    candidate = np.asarray(candidate, dtype=float)
+    if not len(baseline) or not len(candidate):
+        return None
+
+    rng = np.random.default_rng(seed)
+    baseline_estimates = np.apply_along_axis(
+        statistic, 1, baseline[rng.integers(0, len(baseline), size=(resamples, len(baseline)))]
+    )
+    candidate_estimates = np.apply_along_axis(
+        statistic, 1, candidate[rng.integers(0, len(candidate), size=(resamples, len(candidate)))]
+    )
+    with np.errstate(divide='ignore', invalid='ignore'):
+        changes = candidate_estimates / baseline_estimates - 1
+
+    alpha = (1 - confidence) / 2
+    # (count + 1) / (resamples + 1): a bootstrap never proves p = 0
+    p = 2 * (min(np.sum(changes <= 0), np.sum(changes >= 0)) + 1) / (resamples + 1)
+    return {
+        "change": float(statistic(candidate) / statistic(baseline) - 1) if statistic(baseline) else None,
+        "ci": (float(np.nanquantile(changes, alpha)), float(np.nanquantile(changes, 1 - alpha))),
+        "p": float(min(p, 1.0))
+    }
+
+def adjust_p_values(p_values, method='holm'):
+    """
+    p-values corrected for testing many comparisons at once
+
+    holm keeps the chance of any false positive below alpha (Holm-Bonferroni),
+    bh the expected share of false positives (Benjamini-Hochberg), none
+    leaves the values unchanged. None entries (no test) stay None.
+
+    Returns:
+        list: Adjusted p-values in the order of p_values
+    """
+    indices = [i for i, p in enumerate(p_values) if p is not None]
+    adjusted = list(p_values)
+    if method == 'none' or not indices:
+        return adjusted
+
+    values = np.array([p_values[i] for i in indices], dtype=float)
+    order = np.argsort(values)
+    m = len(values)
+    if method == 'holm':
+        # p_(k) * (m - k + 1), kept monotonic from the smallest p upwards
+        corrected = np.maximum.accumulate(values[order] * (m - np.arange(m)))
+    elif method == 'bh':
+        # p_(k) * m / k, kept monotonic from the largest p downwards
+        corrected = np.minimum.accumulate((values[order] * m / np.arange(1, m + 1))[::-1])[::-1]
+    else:
+        raise ValueError(f"Unknown correction {method}")
+
+    result = np.empty(m)
+    result[order] = np.minimum(corrected, 1.0)
+    for i, value in zip(indices, result):
+        adjusted[i] = float(value)
+    return adjusted
+
+def detect_outliers(samples, k=1.5):
+    """
+    Outliers by Tukey's fences: values outside [Q1 - k*IQR, Q3 + k*IQR]
+
+    Returns:
+        dict: Fences and the (1-based) iterations of the outliers
+    """
+    samples = np.asarray(samples, dtype=float)
+    if len(samples) < 4:
+        return {"lower_fence": None, "upper_fence": None, "count": 0, "iterations": []}
+
+    q1, q3 = np.percentile(samples, [25, 75])
+    iqr = q3 - q1
+    lower, upper = q1 - k * iqr, q3 + k * iqr
+    iterations = [int(i) + 1 for i in np.where((samples < lower) | (samples > upper))[0]]
+    return {
+        "lower_fence": float(lower),
+        "upper_fence": float(upper),
+        "count": len(iterations),
+        "iterations": iterations
+    }
+
+def percentile_key(percentile):
+    return f"p{percentile:g}".replace('.', '')
+
+def describe(samples, confidence=0.95):
+    """Summary statistics of the latencies (seconds) of one API and query"""
+    if not samples:
+        return None
+
+    histogram = LatencyHistogram().record_all(samples)
+    stats = {
+        "count": len(samples),
+        "mean": float(np.mean(samples)),
+        "min": float(np.min(samples)),
+        "max": float(np.max(samples)),
+        "std": float(np.std(samples))
+    }
+    for percentile in PERCENTILES:
+        stats[percentile_key(percentile)] = histogram.percentile(percentile)
+
+    stats["confidence"] = confidence
+    stats["mean_ci"] = bootstrap_ci(samples, np.mean, confidence)
+    stats["p50_ci"] = bootstrap_ci(samples, np.median, confidence)
+    stats["outliers"] = detect_outliers(samples)
+    stats["histogram"] = histogram.to_dict()
+    return stats
+
+def measurements(result):
+    """Measurements of one API: the result itself and, with cache mode both, its cold run"""
+    yield result
+    if result.get('cold'):
+        yield result['cold']
+
+CSV_COLUMNS = (
+    ["query", "api", "cache", "count", "errors", "mean", "std", "min", "max"]
+    + [percentile_key(p) for p in PERCENTILES]
+    + ["mean_ci_low", "mean_ci_high", "p50_ci_low", "p50_ci_high", "outliers"]
+)
+
+def write_csv_report(results, path):
+    """One row per query, API and cache state, latencies in seconds"""
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_COLUMNS)
+        writer.writeheader()
+        for name, apis in results['queries'].items():
+            for api, api_result in apis.items():
+                for result in measurements(api_result):
+                    stats = result['stats'] or {}
+                    mean_ci = stats.get('mean_ci') or (None, None)
+                    p50_ci = stats.get('p50_ci') or (None, None)
+                    row = {
+                        "query": name,
+                        "api": api,
+                        "cache": result.get('cache', 'warm'),
+                        "count": stats.get('count', 0),
+                        "errors": len(result['errors']),
+                        "mean_ci_low": mean_ci[0],
+                        "mean_ci_high": mean_ci[1],
+                        "p50_ci_low": p50_ci[0],
+                        "p50_ci_high": p50_ci[1],
+                        "outliers": stats.get('outliers', {}).get('count', 0)
+                    }
+                    for column in ["mean", "std", "min", "max"] + [percentile_key(p) for p in PERCENTILES]:
+                        row[column] = stats.get(column)
+                    writer.writerow(row)
+
+def format_stats(stats):
+    """Text summary of describe() for query_stats.txt"""
+    confidence = int(stats['confidence'] * 100)
+    lines = [
+        f"Average Time: {stats['mean']:.3f} seconds",
+        f"Minimum Time: {stats['min']:.3f} seconds",
+        f"Maximum Time: {stats['max']:.3f} seconds",
+        f"Standard Deviation: {stats['std']:.3f} seconds",
+        "Percentiles: " + ", ".join(
+            f"{percentile_key(p)} {stats[percentile_key(p)]:.3f}" for p in PERCENTILES
+        ) + " seconds"
+    ]
+    if stats['mean_ci']:
+        lines.append(f"Mean {confidence}% CI: {stats['mean_ci'][0]:.3f} - {stats['mean_ci'][1]:.3f} seconds")
+        lines.append(f"Median {confidence}% CI: {stats['p50_ci'][0]:.3f} - {stats['p50_ci'][1]:.3f} seconds")
+    outliers = stats['outliers']
+    if outliers['count']:
+        lines.append(f"Outliers (outside {outliers['lower_fence']:.3f} - {outliers['upper_fence']:.3f} seconds): "
+                     f"{outliers['count']} at iterations {', '.join(map(str, outliers['iterations']))}")
+    else:
+        lines.append("Outliers: none")
+    return lines
+
+def describe_phases(phase_samples):
+    """Mean and percentiles of every request phase and its share of the summed phase means"""
+    means = {phase: float(np.mean(samples)) for phase, samples in phase_samples.items() if samples}
+    total = sum(means.values())
+    phases = {}
+    for phase, samples in phase_samples.items():
+        if not samples:
+            continue
+        p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+        phases[phase] = {
+            "count": len(samples),
+            "mean": means[phase],
+            "p50": float(p50),
+            "p95": float(p95),
+            "p99": float(p99),
+            "share": means[phase] / total if total else None
+        }
+    return phases
+
+def format_phases(phases):
+    if not phases:
+        return []
+    return ["Phases (mean): " + ", ".join(
+        f"{phase} {stats['mean']:.3f}s ({(stats['share'] or 0) * 100:.0f}%)" for phase, stats in phases.items()
+    )]
+
+def write_phase_report(results, path):
+    """One row per query, API, cache state and phase, times in seconds"""
+    columns = ["query", "api", "cache", "phase", "count", "mean", "p50", "p95", "p99", "share"]
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=columns)
+        writer.writeheader()
+        for name, apis in results['queries'].items():
+            for api, api_result in apis.items():
+                for result in measurements(api_result):
+                    for phase, stats in (result.get('phases') or {}).items():
+                        writer.writerow(dict(stats, query=name, api=api, cache=result.get('cache', 'warm'), phase=phase))
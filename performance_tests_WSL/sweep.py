@@ -0,0 +1,346 @@
+import os
+import re
+import sys
+import csv
+import json
+import random
+import socket
+import argparse
+from datetime import datetime, timedelta
+
+import numpy as np
+import requests
+
+import benchmark
+from benchmark import APIS, DEFAULT_APIS, DEFAULT_MATRIX, SCRIPT_DIR, TESTS, close_rasql_pool, load_matrix
+from sinks import SINKS, get_sink
+from validate import FULL_SIZES
+
+### Workload sweep over era5_weekly: queries over a grid of box sizes       ###
+### (cells per side) and temporal lengths (timestamps) at random positions. ###
+### Latency and returned bytes are recorded per API, and a scaling model   ###
+### is fitted per API to predict the cost of arbitrary requests:           ###
+###                                                                          ###
+###   python sweep.py run --sizes 1 4 16 64 --timestamps 1 16 167           ###
+###   python sweep.py predict --model <dir>/sweep_model.json --cells 32 36 --timestamps 10
+
+RESOLUTION = 0.25
+LAT_ORIGIN = -90.0
+LONG_ORIGIN = 0.0
+TIME_FORMAT = '%Y-%m-%dT%H:%M:%S.%fZ'
+
+# Combinations above this many values are skipped (CSV results take ~18 bytes per value)
+DEFAULT_MAX_VALUES = 2_000_000
+
+SAMPLE_COLUMNS = ["api", "lat_cells", "long_cells", "timestamps", "values", "bytes", "latency", "error", "subset"]
+
+def format_time(timestamp):
+    """Timestamp in the format of queries.json, with milliseconds"""
+    return timestamp.strftime(TIME_FORMAT)[:-4] + 'Z'
+
+def served_time_axis(matrix):
+    """
+    Timestamps of the irregular ansi axis from DescribeCoverage (coefficients)
+
+    Returns:
+        list: Timestamps, None if the coverage cannot be described
+    """
+    try:
+        response = requests.get(matrix['endpoints']['wcs'], params={
+            'SERVICE': 'WCS',
+            'VERSION': '2.0.1',
+            'REQUEST': 'DescribeCoverage',
+            'COVERAGEID': matrix['collection']
+        }, auth=tuple(matrix['auth']), timeout=30)
+        response.raise_for_status()
+    except requests.RequestException as e:
+        print(f"DescribeCoverage failed ({e})")
+        return None
+    coefficients = re.search(r'coefficients>([^<]*)<', response.text)
+    if not coefficients:
+        return None
+    return [datetime.strptime(value, TIME_FORMAT) for value in re.findall(r'"([^"]+)"', coefficients.group(1))]
+
+def time_axis(matrix):
+    """
+    Timestamps of the ansi axis
+
+    The axis is irregular, so the coefficients the server describes are
+    used; "time_axis" of the query matrix (start, step_seconds, count) is
+    the fallback if the server cannot be asked.
+    """
+    timestamps = served_time_axis(matrix)
+    if timestamps:
+        return timestamps
+    axis = matrix['time_axis']
+    print("Using the regular time_axis of the query matrix")
+    start = datetime.strptime(axis['start'], TIME_FORMAT)
+    return [start + timedelta(seconds=axis['step_seconds'] * i) for i in range(axis['count'])]
+
+def bounds(index, cells, origin):
+    """
+    Coordinates selecting grid cells index..index + cells - 1
+
+    Both bounds lie inside a cell, not on its edge, so the rasdaman cell
+    rule and rounding select the same cells.
+    """
+    return origin + (index - 0.3) * RESOLUTION, origin + (index + cells - 1 - 0.2) * RESOLUTION
+
+def sweep_query(name, timestamps, lat, long, time):
+    """
+    Query for the sweep in the format of queries.json
+
+    Args:
+        lat, long, time (tuple): (first index, cells) per axis
+    """
+    south, north = bounds(lat[0], lat[1], LAT_ORIGIN)
+    west, east = bounds(long[0], long[1], LONG_ORIGIN)
+    first, length = time
+    # One timestamp is a slice like Q1 and Q2, longer ranges are trims
+    ansi = str(first) if length == 1 else f"{first}:{first + length - 1}"
+    return {
+        "name": name,
+        "description": f"{lat[1]}x{long[1]} cells, {length} timestamps",
+        "spatial_extent": {"west": west, "east": east, "north": north, "south": south},
+        "temporal_extent": [format_time(timestamps[first]), format_time(timestamps[first + length - 1])],
+        "rasql": {
+            "subset": f"{ansi},{lat[0]}:{lat[0] + lat[1] - 1},{long[0]}:{long[0] + long[1] - 1}",
+            "encode": "csv"
+        }
+    }
+
+def generate_queries(matrix, sizes, lengths, repeats, seed=0, max_values=DEFAULT_MAX_VALUES):
+    """
+    Random queries for every box size and temporal length
+
+    Positions are drawn uniformly (with a fixed seed), the first grid index
+    is kept free so no bound falls outside of the coverage.
+    """
+    rng = random.Random(seed)
+    timestamps = time_axis(matrix)
+    queries = []
+    for cells in sizes:
+        for length in lengths:
+            length = min(length, len(timestamps))
+            if cells * cells * length > max_values:
+                print(f"Skipping {cells}x{cells} cells, {length} timestamps: more than {max_values} values")
+                continue
+            for repeat in range(repeats):
+                lat = (rng.randint(1, FULL_SIZES['Lat'] - cells), cells)
+                long = (rng.randint(1, FULL_SIZES['Long'] - cells), cells)
+                time = (rng.randint(0, len(timestamps) - length), length)
+                name = f"S{cells}x{cells}t{length}_{repeat + 1}"
+                queries.append(sweep_query(name, timestamps, lat, long, time))
+    return queries
+
+def query_cells(query):
+    """Cells per axis (ansi, Lat, Long) from the RasQL subset"""
+    cells = []
+    for bounds_text in query['rasql']['subset'].split(','):
+        low, _, high = bounds_text.partition(':')
+        cells.append(int(high or low) - int(low) + 1)
+    return cells
+
+def run_sweep(matrix, queries, apis, tests, output_dir, writer=None):
+    """Run every query once per API, returns the samples"""
+    samples = []
+    for number, query in enumerate(queries, 1):
+        timestamps, lat_cells, long_cells = query_cells(query)
+        for api in apis:
+            sample = {
+                "api": api,
+                "lat_cells": lat_cells,
+                "long_cells": long_cells,
+                "timestamps": timestamps,
+                "values": lat_cells * long_cells * timestamps,
+                "bytes": None,
+                "latency": None,
+                "error": None,
+                "subset": query['rasql']['subset']
+            }
+            output_file = os.path.join(output_dir, f"{api}_sweep{benchmark.RESULT_SINK.extension}")
+            try:
+                sample["latency"], _ = tests[api](matrix, query, output_file)
+                sample["bytes"] = benchmark.last_result_bytes()
+                print(f"[{number}/{len(queries)}] {query['name']} {api}: {sample['latency']:.3f} seconds, "
+                      f"{sample['bytes']} bytes")
+            except Exception as e:
+                sample["error"] = str(e)
+                print(f"[{number}/{len(queries)}] {query['name']} {api} Error: {e}")
+            samples.append(sample)
+            if writer:
+                writer.writerow(sample)
+    return samples
+
+def fit_linear(x, y):
+    """Least squares y = intercept + slope * x, with R^2"""
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    design = np.column_stack([np.ones_like(x), x])
+    (intercept, slope), *_ = np.linalg.lstsq(design, y, rcond=None)
+    residual = y - (intercept + slope * x)
+    total = np.sum((y - y.mean()) ** 2)
+    return {
+        "intercept": float(intercept),
+        "slope": float(slope),
+        "r2": float(1 - np.sum(residual ** 2) / total) if total else None
+    }
+
+def fit_power(x, y):
+    """Least squares in log-log space: y = coefficient * x^exponent"""
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    positive = (x > 0) & (y > 0)
+    if np.count_nonzero(positive) < 2:
+        return None
+    fit = fit_linear(np.log(x[positive]), np.log(y[positive]))
+    return {"coefficient": float(np.exp(fit['intercept'])), "exponent": fit['slope'], "r2": fit['r2']}
+
+def fit_models(samples):
+    """
+    Scaling model per API
+
+    latency: fixed cost + bytes / throughput (linear) and a power law,
+    bytes: bytes per value, so requests can be predicted from their size
+    """
+    models = {}
+    for api in sorted({sample['api'] for sample in samples}):
+        ok = [s for s in samples if s['api'] == api and s['error'] is None and s['bytes'] is not None]
+        if len(ok) < 2 or len({s['bytes'] for s in ok}) < 2:
+            models[api] = None
+            continue
+        values = [s['values'] for s in ok]
+        sizes = [s['bytes'] for s in ok]
+        latencies = [s['latency'] for s in ok]
+        linear = fit_linear(sizes, latencies)
+        models[api] = {
+            "samples": len(ok),
+            "latency_linear": dict(
+                linear,
+                # Slope in seconds per byte, its inverse is the marginal throughput
+                throughput_mb_s=1 / linear['slope'] / 1e6 if linear['slope'] > 0 else None
+            ),
+            "latency_power": fit_power(sizes, latencies),
+            "bytes": fit_linear(values, sizes)
+        }
+    return models
+
+def predict(model, values):
+    """Predicted bytes and latency (linear and power law) of a request with this many values"""
+    size = model['bytes']['intercept'] + model['bytes']['slope'] * values
+    linear = model['latency_linear']['intercept'] + model['latency_linear']['slope'] * size
+    power = model['latency_power']
+    return {
+        "values": values,
+        "bytes": size,
+        "latency_linear": linear,
+        "latency_power": power['coefficient'] * size ** power['exponent'] if power and size > 0 else None
+    }
+
+def format_models(models):
+    lines = []
+    for api, model in models.items():
+        if not model:
+            lines.append(f"{api}: not enough successful samples")
+            continue
+        linear, power, size = model['latency_linear'], model['latency_power'], model['bytes']
+        throughput = f", {linear['throughput_mb_s']:.1f} MB/s" if linear['throughput_mb_s'] else ""
+        lines.append(f"{api} ({model['samples']} samples):")
+        lines.append(f"  latency = {linear['intercept']:.4f} s + bytes * {linear['slope']:.3e} s{throughput}"
+                     f" (R^2 {linear['r2']:.3f})")
+        if power:
+            lines.append(f"  latency = {power['coefficient']:.3e} * bytes^{power['exponent']:.3f} (R^2 {power['r2']:.3f})")
+        lines.append(f"  bytes = {size['intercept']:.0f} + {size['slope']:.2f} * values")
+    return lines
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Sweep subset sizes and fit latency vs. bytes per API")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help="Run the sweep and fit the models")
+    run_parser.add_argument('--matrix', default=DEFAULT_MATRIX, help="Query matrix (JSON) with endpoints and time_axis")
+    run_parser.add_argument('--apis', nargs='+', choices=APIS, default=DEFAULT_APIS, help="APIs to sweep")
+    run_parser.add_argument('--sizes', nargs='+', type=int, default=[1, 4, 16, 64, 256],
+                            help="Box sizes in grid cells per side")
+    run_parser.add_argument('--timestamps', nargs='+', type=int, default=[1, 4, 16, 64, 167],
+                            help="Temporal lengths in timestamps")
+    run_parser.add_argument('--repeats', type=int, default=3, help="Random positions per size and length")
+    run_parser.add_argument('--seed', type=int, default=0, help="Seed of the random positions")
+    run_parser.add_argument('--max-values', type=int, default=DEFAULT_MAX_VALUES,
+                            help="Skip combinations with more values")
+    run_parser.add_argument('--output-dir', help="Output directory (default: benchmark_results/sweep_<timestamp>)")
+    run_parser.add_argument('--rasql-cli', action='store_true', help="Run RasQL through the rasql binary")
+    run_parser.add_argument('--sink', choices=list(SINKS), default='discard',
+                            help="How results are stored (default: not at all)")
+
+    predict_parser = commands.add_parser('predict', help="Predict bytes and latency of a request")
+    predict_parser.add_argument('--model', required=True, help="sweep_model.json of a sweep")
+    predict_parser.add_argument('--cells', nargs=2, type=int, required=True, metavar=('LAT', 'LONG'),
+                                help="Grid cells of the box")
+    predict_parser.add_argument('--timestamps', type=int, default=1, help="Number of timestamps")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+
+    if args.command == 'predict':
+        with open(args.model) as f:
+            models = json.load(f)['models']
+        values = args.cells[0] * args.cells[1] * args.timestamps
+        for api, model in models.items():
+            if not model:
+                continue
+            prediction = predict(model, values)
+            power = f", {prediction['latency_power']:.3f} seconds (power law, R^2 {model['latency_power']['r2']:.3f})" \
+                if prediction['latency_power'] else ""
+            print(f"{api}: {values} values, {prediction['bytes'] / 1e6:.2f} MB, {prediction['latency_linear']:.3f} seconds "
+                  f"(linear, R^2 {model['latency_linear']['r2']:.3f}){power}")
+        return
+
+    matrix = load_matrix(args.matrix)
+    if 'time_axis' not in matrix:
+        sys.exit(f"{args.matrix} has no time_axis")
+    benchmark.RESULT_SINK = get_sink(args.sink)
+    tests = dict(TESTS, rasql=benchmark.test_rasql_cli_performance) if args.rasql_cli else TESTS
+
+    started = datetime.now()
+    output_dir = args.output_dir or os.path.join(
+        SCRIPT_DIR, 'benchmark_results', f"sweep_{started.strftime('%Y%m%d_%H%M%S')}"
+    )
+    os.makedirs(output_dir, exist_ok=True)
+
+    queries = generate_queries(matrix, args.sizes, args.timestamps, args.repeats, args.seed, args.max_values)
+    print(f"Sweeping {len(queries)} queries against {', '.join(args.apis)}...\n")
+
+    # Samples are written as they come, an aborted sweep keeps its measurements
+    with open(os.path.join(output_dir, 'sweep_samples.csv'), 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=SAMPLE_COLUMNS)
+        writer.writeheader()
+        samples = run_sweep(matrix, queries, args.apis, tests, output_dir, writer)
+    rasql_pool = close_rasql_pool()
+
+    models = fit_models(samples)
+    results = {
+        "meta": {
+            "date": started.strftime('%Y-%m-%d %H:%M:%S'),
+            "host": socket.gethostname(),
+            "matrix": os.path.abspath(args.matrix),
+            "apis": args.apis,
+            "sizes": args.sizes,
+            "timestamps": args.timestamps,
+            "repeats": args.repeats,
+            "seed": args.seed,
+            "sink": args.sink,
+            "rasql_pool": rasql_pool
+        },
+        "models": models
+    }
+    with open(os.path.join(output_dir, 'sweep_model.json'), 'w') as f:
+        json.dump(results, f, indent=2)
+    lines = format_models(models)
+    with open(os.path.join(output_dir, 'sweep_model.txt'), 'w') as f:
+        f.write("\n".join(lines) + "\n")
+
+    print("\n" + "\n".join(lines))
+    print(f"\nResults written to {output_dir}")
+
+if __name__ == "__main__":
+    main()
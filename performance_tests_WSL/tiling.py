@@ -0,0 +1,436 @@
+import os
+import re
+import sys
+import copy
+import json
+import math
+import time
+import bisect
+import argparse
+import subprocess
+from datetime import datetime
+
+import requests
+
+import benchmark
+from benchmark import APIS, DEFAULT_APIS, DEFAULT_MATRIX, SCRIPT_DIR, close_rasql_pool, load_matrix, run_query
+from sinks import SINKS, get_sink
+from validate import FULL_SIZES, GRID_AXES, INGREDIENTS
+
+### Tiling experiments around rasdaman_import_files/ingredients.json         ###
+###                                                                          ###
+### Generates ingredient variants (aligned, regular time-major/space-major/ ###
+### balanced and directional tilings at several tile sizes), ingests every  ###
+### variant and runs the query matrix against it, then recommends a tiling ###
+### per query (access pattern):                                             ###
+###                                                                          ###
+###   python tiling.py variants                                             ###
+###   python tiling.py run --target mock                                    ###
+###   python tiling.py run --target rasdaman --queries Q1 Q3               ###
+###                                                                          ###
+### mock:     mock_rasdaman.py per variant, reads are charged per touched   ###
+###           tile (--tile-latency) and per byte (--disk-bandwidth)         ###
+### rasdaman: wcst_import.sh per variant into a scratch coverage            ###
+###           (era5_weekly_<variant>), deleted again with --delete-after    ###
+
+TARGETS = ['mock', 'rasdaman']
+# Only these APIs are served by the mock. RasQL and the backend would read the real era5_weekly
+# whatever the variant, and their medians would hide the simulated tiling differences
+MOCK_APIS = ['openeo', 'wcs']
+DEFAULT_TILE_SIZES = [1_000_000, 4_000_000, 16_000_000]
+# t2m is imported as float32
+CELL_BYTES = 4
+DEFAULT_IMPORT_COMMAND = ['/opt/rasdaman/bin/wcst_import.sh']
+# Weekly data: one directional partition per year
+WEEKS_PER_YEAR = 52
+
+TILING_PATTERN = re.compile(
+    r'^\s*(?P<kind>ALIGNED|REGULAR)\s*\[(?P<config>[^\]]*)\]\s*(?:TILE\s+SIZE\s+(?P<size>\d+))?\s*$', re.IGNORECASE
+)
+DIRECTIONAL_PATTERN = re.compile(
+    r'^\s*DIRECTIONAL\s*(?P<splits>(?:\[[^\]]*\]\s*,?\s*)+)'
+    r'(?P<subtiling>WITH\s+SUBTILING(?:\s+TILE\s+SIZE\s+(?P<size>\d+))?)?\s*$', re.IGNORECASE
+)
+
+def axis_sizes(matrix=None):
+    """Grid size per axis (ansi from time_axis of the matrix)"""
+    timestamps = matrix['time_axis']['count'] if matrix and 'time_axis' in matrix else 167
+    return [dict(FULL_SIZES, ansi=timestamps)[axis] for axis in GRID_AXES]
+
+def aligned_extents(config, sizes, tile_size, cell_bytes=CELL_BYTES):
+    """
+    Tile extents of an aligned tiling: the configured shape, scaled to the tile size
+
+    All axes are scaled by the same factor; axes that would grow beyond the
+    coverage are clipped and the remaining ones scaled again.
+    """
+    extents = [float(min(extent, size)) for extent, size in zip(config, sizes)]
+    free = list(range(len(sizes)))
+    while free:
+        fixed = math.prod(extent for k, extent in enumerate(extents) if k not in free)
+        scale = (tile_size / cell_bytes / fixed / math.prod(extents[k] for k in free)) ** (1 / len(free))
+        clipped = [k for k in free if extents[k] * scale >= sizes[k]]
+        if not clipped:
+            extents = [extent * scale if k in free else extent for k, extent in enumerate(extents)]
+            break
+        for k in clipped:
+            extents[k] = float(sizes[k])
+        free = [k for k in free if k not in clipped]
+    return [max(int(extent), 1) for extent in extents]
+
+def regular_starts(extent, size):
+    return list(range(0, size, extent))
+
+class Tiling:
+    """
+    Tiling of the coverage as tile boundaries per axis
+
+    Every tiling is modelled as a product grid: per axis the grid indices
+    at which a new tile starts. Directional subtiling is approximated by
+    one aligned subtile shape for all partitions.
+    """
+
+    def __init__(self, text, starts, sizes):
+        self.text = text
+        self.starts = starts
+        self.sizes = sizes
+
+    @classmethod
+    def parse(cls, text, sizes, cell_bytes=CELL_BYTES):
+        match = TILING_PATTERN.match(text)
+        if match:
+            config = []
+            for bounds, size in zip(match.group('config').split(','), sizes):
+                low, _, high = (bound.strip() for bound in bounds.partition(':'))
+                config.append(size if '*' in (low, high) else int(high) - int(low) + 1)
+            if len(config) != len(sizes):
+                raise ValueError(f"Tiling {text!r} needs {len(sizes)} axes")
+            if match.group('kind').upper() == 'ALIGNED':
+                extents = aligned_extents(config, sizes, int(match.group('size') or 4194304), cell_bytes)
+            else:
+                extents = [min(extent, size) for extent, size in zip(config, sizes)]
+            return cls(text, [regular_starts(extent, size) for extent, size in zip(extents, sizes)], sizes)
+
+        match = DIRECTIONAL_PATTERN.match(text)
+        if not match:
+            raise ValueError(f"Unsupported tiling {text!r}")
+        splits = re.findall(r'\[([^\]]*)\]', match.group('splits'))
+        if len(splits) != len(sizes):
+            raise ValueError(f"Tiling {text!r} needs {len(sizes)} split lists")
+        starts = []
+        for split, size in zip(splits, sizes):
+            points = sorted({int(point) for point in split.split(',') if point.strip() not in ('', '*')} | {0})
+            starts.append([point for point in points if point < size])
+
+        if match.group('subtiling'):
+            # Subtiles are aligned tiles of the typical partition
+            partition = [max(b - a for a, b in zip(axis_starts, axis_starts[1:] + [size]))
+                         for axis_starts, size in zip(starts, sizes)]
+            extents = aligned_extents(partition, partition, int(match.group('size') or 4194304), cell_bytes)
+            starts = [
+                sorted({start + offset for start, end in zip(axis_starts, axis_starts[1:] + [size])
+                        for offset in range(0, end - start, extent)})
+                for axis_starts, size, extent in zip(starts, sizes, extents)
+            ]
+        return cls(text, starts, sizes)
+
+    def tile_count(self):
+        return math.prod(len(axis_starts) for axis_starts in self.starts)
+
+    def tile_shape(self):
+        """Largest tile extent per axis"""
+        return [max(b - a for a, b in zip(axis_starts, axis_starts[1:] + [size]))
+                for axis_starts, size in zip(self.starts, self.sizes)]
+
+    def touched(self, selection):
+        """
+        Tiles and cells a read has to load
+
+        Args:
+            selection (list): Per axis a grid index or an inclusive (low, high) range
+
+        Returns:
+            tuple: (number of tiles, number of cells in these tiles)
+        """
+        tiles, cells = 1, 1
+        for axis_selection, axis_starts, size in zip(selection, self.starts, self.sizes):
+            low, high = axis_selection if isinstance(axis_selection, tuple) else (axis_selection, axis_selection)
+            first = bisect.bisect_right(axis_starts, low) - 1
+            last = bisect.bisect_right(axis_starts, high) - 1
+            ends = axis_starts[1:] + [size]
+            tiles *= last - first + 1
+            cells *= ends[last] - axis_starts[first]
+        return tiles, cells
+
+class TileStorage:
+    """Read cost of a tiling for the mock: a fixed cost per tile (seek, decompression) plus the bytes of the tiles"""
+
+    def __init__(self, tiling, tile_latency, disk_bandwidth, cell_bytes=CELL_BYTES):
+        self.tiling = tiling
+        self.tile_latency = tile_latency
+        self.disk_bandwidth = disk_bandwidth
+        self.cell_bytes = cell_bytes
+
+    def read_cost(self, selection):
+        tiles, cells = self.tiling.touched(selection)
+        transfer = cells * self.cell_bytes / self.disk_bandwidth if self.disk_bandwidth else 0.0
+        return tiles * self.tile_latency + transfer
+
+def generate_variants(sizes, tile_sizes=DEFAULT_TILE_SIZES, baseline=None, cell_bytes=CELL_BYTES):
+    """
+    Tiling variants: {name: tiling}
+
+    time_major:  all timestamps of a small spatial block (point time series)
+    space_major: one timestamp of a large spatial block (maps)
+    balanced:    cubes of equal extent on every axis
+    aligned:     the aligned shape of the original ingredients at other tile sizes
+    directional: one partition per year, subtiled to the tile size
+    """
+    timestamps, lat, long = sizes
+    variants = {}
+    if baseline:
+        variants['baseline'] = baseline
+    for tile_size in tile_sizes:
+        cells = tile_size // cell_bytes
+        suffix = f"{tile_size / 1e6:g}MB"
+        side = max(int(math.sqrt(cells / timestamps)), 1)
+        variants[f"time_major_{suffix}"] = f"REGULAR [0:{timestamps - 1}, 0:{side - 1}, 0:{side - 1}] TILE SIZE {tile_size}"
+        # Lat:Long 1:2 like the coverage
+        lat_extent = min(max(int(math.sqrt(cells / 2)), 1), lat)
+        long_extent = min(max(cells // lat_extent, 1), long)
+        variants[f"space_major_{suffix}"] = f"REGULAR [0:0, 0:{lat_extent - 1}, 0:{long_extent - 1}] TILE SIZE {tile_size}"
+        edge = max(int(round(cells ** (1 / 3))), 1)
+        variants[f"balanced_{suffix}"] = (f"REGULAR [0:{min(edge, timestamps) - 1}, 0:{edge - 1}, 0:{edge - 1}] "
+                                          f"TILE SIZE {tile_size}")
+        aligned = f"ALIGNED [0:52, 0:720, 0:1440] TILE SIZE {tile_size}"
+        if aligned != baseline:
+            variants[f"aligned_{suffix}"] = aligned
+        years = ",".join(str(start) for start in range(0, timestamps, WEEKS_PER_YEAR))
+        variants[f"directional_{suffix}"] = f"DIRECTIONAL [{years},*],[0,*],[0,*] WITH SUBTILING TILE SIZE {tile_size}"
+    return variants
+
+def load_ingredients(path=INGREDIENTS):
+    with open(path) as f:
+        return json.load(f)
+
+def write_ingredients(ingredients, name, tiling, directory, service_url=None):
+    """Ingredients of a variant: own coverage id (<coverage>_<variant>) and tiling"""
+    variant = copy.deepcopy(ingredients)
+    variant['input']['coverage_id'] = f"{ingredients['input']['coverage_id']}_{name}"
+    variant['recipe']['options']['tiling'] = tiling
+    if service_url:
+        variant['config']['service_url'] = service_url
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"ingredients_{name}.json")
+    with open(path, 'w') as f:
+        json.dump(variant, f, indent=2)
+    return path, variant['input']['coverage_id']
+
+def import_variant(command, path):
+    """Ingest a variant with wcst_import.sh, returns the import time in seconds"""
+    start = time.perf_counter()
+    process = subprocess.run(command + [path], stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                             universal_newlines=True)
+    if process.returncode != 0:
+        raise RuntimeError(f"Import of {path} failed: {process.stdout[-2000:]}")
+    return time.perf_counter() - start
+
+def delete_coverage(matrix, coverage_id):
+    """Remove a scratch coverage with WCS-T DeleteCoverage"""
+    response = requests.get(matrix['endpoints']['wcs'], params={
+        'SERVICE': 'WCS',
+        'VERSION': '2.0.1',
+        'REQUEST': 'DeleteCoverage',
+        'COVERAGEID': coverage_id
+    }, auth=tuple(matrix['auth']))
+    response.raise_for_status()
+
+def run_variant(matrix, names, apis, iterations, warmup, output_dir):
+    """Run the queries against the endpoints of the matrix, returns {query: {api: result}}"""
+    results = {}
+    for name in names:
+        query = matrix['queries'][name]
+        count = iterations if iterations is not None else query['iterations']
+        print(f"{name}: {query['description']} ({count} iterations)")
+        results[name] = run_query(matrix, query, apis, count, warmup, output_dir)
+    # The next variant is another coverage, possibly on another server
+    close_rasql_pool()
+    return results
+
+def recommend(results, variants, names):
+    """
+    Best variant per query: lowest median latency averaged over the APIs
+
+    Returns:
+        dict: {query: {"medians": {variant: seconds}, "best": variant}}
+    """
+    recommendations = {}
+    for name in names:
+        medians = {}
+        for variant in variants:
+            per_api = [result['stats']['p50'] for result in results.get(variant, {}).get(name, {}).values()
+                       if result['stats']]
+            if per_api:
+                medians[variant] = sum(per_api) / len(per_api)
+        recommendations[name] = {
+            "medians": medians,
+            "best": min(medians, key=medians.get) if medians else None
+        }
+    return recommendations
+
+def write_table(matrix, recommendations, variants, path):
+    """Markdown table: queries as rows, median latency per variant, recommended tiling"""
+    with open(path, 'w') as f:
+        f.write("| Query | Access pattern | " + " | ".join(variants) + " | Recommended |\n")
+        f.write("|" + "---|" * (len(variants) + 3) + "\n")
+        for name, recommendation in recommendations.items():
+            cells = [f"{recommendation['medians'][v]:.3f}" if v in recommendation['medians'] else "-" for v in variants]
+            f.write(f"| {name} | {matrix['queries'][name]['description']} | " + " | ".join(cells)
+                    + f" | {recommendation['best'] or '-'} |\n")
+        f.write("\nMedian latency in seconds, averaged over the APIs.\n")
+        for variant in variants:
+            f.write(f"{variant}: {variants[variant]}\n")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Tiling experiments for era5_weekly")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    for command in ('variants', 'run'):
+        sub = commands.add_parser(command, help="Write the ingredient variants" if command == 'variants'
+                                  else "Ingest every variant and run the query matrix")
+        sub.add_argument('--ingredients', default=INGREDIENTS, help="ingredients.json to derive the variants from")
+        sub.add_argument('--tile-sizes', nargs='+', type=int, default=DEFAULT_TILE_SIZES, help="Tile sizes in bytes")
+        sub.add_argument('--variants', nargs='+', help="Only these variants (default: all)")
+        sub.add_argument('--cell-bytes', type=int, default=CELL_BYTES, help="Bytes per cell of the imported data")
+        sub.add_argument('--matrix', default=DEFAULT_MATRIX, help="Query matrix (JSON)")
+        sub.add_argument('--output-dir', help="Output directory (default: benchmark_results/tiling_<timestamp>)")
+
+    run_parser = commands.choices['run']
+    run_parser.add_argument('--target', choices=TARGETS, default='mock',
+                            help="mock: simulated tile reads, rasdaman: import into a scratch coverage")
+    run_parser.add_argument('--queries', nargs='+', help="Queries to run (default: all)")
+    run_parser.add_argument('--apis', nargs='+', choices=APIS, default=DEFAULT_APIS,
+                            help=f"APIs to benchmark (mock: only {', '.join(MOCK_APIS)})")
+    run_parser.add_argument('--iterations', type=int, default=5, help="Iterations per query and variant")
+    run_parser.add_argument('--warmup', type=int, default=1, help="Unrecorded warm-up runs per query and API")
+    run_parser.add_argument('--sink', choices=list(SINKS), default='discard', help="How results are stored")
+    run_parser.add_argument('--tile-latency', type=float, default=0.002,
+                            help="Mock: seconds per tile read (seek and decompression)")
+    run_parser.add_argument('--disk-bandwidth', type=float, default=200,
+                            help="Mock: MB/s at which tiles are read")
+    run_parser.add_argument('--import-command', nargs='+', default=DEFAULT_IMPORT_COMMAND,
+                            help="Rasdaman: import tool, called with the ingredients file")
+    run_parser.add_argument('--skip-import', action='store_true',
+                            help="Rasdaman: the variants are already imported")
+    run_parser.add_argument('--delete-after', action='store_true',
+                            help="Rasdaman: delete every scratch coverage after its run")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    matrix = load_matrix(args.matrix)
+    ingredients = load_ingredients(args.ingredients)
+    sizes = axis_sizes(matrix)
+
+    variants = generate_variants(sizes, args.tile_sizes, ingredients['recipe']['options'].get('tiling'), args.cell_bytes)
+    if args.variants:
+        unknown = [name for name in args.variants if name not in variants]
+        if unknown:
+            sys.exit(f"Unknown variants: {', '.join(unknown)} (available: {', '.join(variants)})")
+        variants = {name: variants[name] for name in args.variants}
+
+    started = datetime.now()
+    output_dir = args.output_dir or os.path.join(
+        SCRIPT_DIR, 'benchmark_results', f"tiling_{started.strftime('%Y%m%d_%H%M%S')}"
+    )
+    ingredients_dir = os.path.join(output_dir, 'ingredients')
+    wcs_url = matrix['endpoints']['wcs']
+    for name, text in variants.items():
+        tiling = Tiling.parse(text, sizes, args.cell_bytes)
+        path, _ = write_ingredients(ingredients, name, text, ingredients_dir, wcs_url)
+        print(f"{name}: {text} -> tile {tiling.tile_shape()}, {tiling.tile_count()} tiles ({os.path.basename(path)})")
+    if args.command == 'variants':
+        return
+
+    names = args.queries or list(matrix['queries'])
+    unknown = [name for name in names if name not in matrix['queries']]
+    if unknown:
+        sys.exit(f"Unknown queries: {', '.join(unknown)}")
+    benchmark.RESULT_SINK = get_sink(args.sink)
+
+    if args.target == 'mock':
+        skipped = [api for api in args.apis if api not in MOCK_APIS]
+        args.apis = [api for api in args.apis if api in MOCK_APIS]
+        if skipped:
+            print(f"Note: skipping {', '.join(skipped)}, the mock only serves {', '.join(MOCK_APIS)} "
+                  f"(--target rasdaman measures every API)")
+        if not args.apis:
+            sys.exit(f"No API left to benchmark against the mock (choose from {', '.join(MOCK_APIS)})")
+
+    results = {}
+    imports = {}
+    for name, text in variants.items():
+        print(f"\nVariant {name}: {text}")
+        print("=" * 50)
+        variant_dir = os.path.join(output_dir, name)
+        os.makedirs(variant_dir, exist_ok=True)
+        variant_matrix = copy.deepcopy(matrix)
+
+        if args.target == 'mock':
+            # Imported here, the rasdaman target does not need the mock
+            from mock_rasdaman import SyntheticCube, start_server
+            storage = TileStorage(Tiling.parse(text, sizes, args.cell_bytes), args.tile_latency,
+                                  args.disk_bandwidth * 1024 * 1024, args.cell_bytes)
+            server = start_server(SyntheticCube(sizes[0], storage=storage))
+            base = f"http://localhost:{server.server_port}/rasdaman"
+            variant_matrix['endpoints'].update({"openeo": f"{base}/openeo/result", "wcs": f"{base}/ows"})
+            try:
+                results[name] = run_variant(variant_matrix, names, args.apis, args.iterations, args.warmup, variant_dir)
+            finally:
+                server.shutdown()
+                server.server_close()
+            continue
+
+        path, coverage_id = write_ingredients(ingredients, name, text, ingredients_dir, wcs_url)
+        variant_matrix['collection'] = coverage_id
+        try:
+            if not args.skip_import:
+                imports[name] = import_variant(args.import_command, path)
+                print(f"Imported {coverage_id} in {imports[name]:.1f} seconds")
+            results[name] = run_variant(variant_matrix, names, args.apis, args.iterations, args.warmup, variant_dir)
+        except (RuntimeError, OSError) as e:
+            print(f"Variant {name} failed: {e}")
+        finally:
+            if args.delete_after:
+                try:
+                    delete_coverage(variant_matrix, coverage_id)
+                except Exception as e:
+                    print(f"Could not delete {coverage_id}: {e}")
+
+    recommendations = recommend(results, variants, names)
+    with open(os.path.join(output_dir, 'tiling_results.json'), 'w') as f:
+        json.dump({
+            "meta": {
+                "date": started.strftime('%Y-%m-%d %H:%M:%S'),
+                "target": args.target,
+                "apis": args.apis,
+                "iterations": args.iterations,
+                "tile_latency": args.tile_latency if args.target == 'mock' else None,
+                "disk_bandwidth": args.disk_bandwidth if args.target == 'mock' else None,
+                "variants": variants,
+                "import_seconds": imports
+            },
+            "recommendations": recommendations,
+            "results": results
+        }, f, indent=2)
+    write_table(matrix, recommendations, variants, os.path.join(output_dir, 'tiling_recommendations.md'))
+
+    print("\nRecommended tiling per query:")
+    for name, recommendation in recommendations.items():
+        best = recommendation['best']
+        detail = f"{best} ({recommendation['medians'][best]:.3f} s median)" if best else "no results"
+        print(f"{name} ({matrix['queries'][name]['description']}): {detail}")
+    print(f"\nResults written to {output_dir}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,312 @@
+import os
+import sys
+import json
+import argparse
+import itertools
+import numpy as np
+
+from compare_CSVs import find_outputs, iter_values
+from rasdaman_csv import CHUNK_SIZE, GridShape
+from sinks import read_result
+
+### Shape-aware validation of the query outputs                             ###
+###                                                                          ###
+### Every output is parsed into its N-D grid shape: the brace nesting of    ###
+### the Rasdaman CSV ({{v,v}},{{v,v}}), the rows of np.savetxt (RasQL) or   ###
+### the shape stored by the binary sinks. The shape is checked against the ###
+### grid the query selects (rasql subset in queries.json, axis order from   ###
+### ingredients.json), and the outputs of all APIs are aligned on a random  ###
+### sample of grid points, detecting swapped and reversed axes.            ###
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+INGREDIENTS = os.path.join(os.path.dirname(SCRIPT_DIR), 'rasdaman_import_files', 'ingredients.json')
+DEFAULT_SAMPLES = 1000
+MAX_REPORTED_INDICES = 10
+
+# Grid size of the full coverage, the irregular ansi axis depends on the imported data
+FULL_SIZES = {'Lat': 721, 'Long': 1440}
+
+def load_grid_axes(path=INGREDIENTS):
+    """Axis labels of the coverage in grid order (ansi, Lat, Long)"""
+    with open(path) as f:
+        axes = json.load(f)['recipe']['options']['coverage']['slicer']['axes']
+    return sorted(axes, key=lambda axis: axes[axis]['gridOrder'])
+
+GRID_AXES = load_grid_axes()
+
+def expected_grid(query, axes=GRID_AXES):
+    """
+    Axes and sizes a query returns, from its RasQL subset (e.g. "0:166,549:580,25:60")
+
+    Sliced axes disappear, open bounds (*) give the full size (None if unknown).
+
+    Returns:
+        list: [(axis, size or None), ...]
+    """
+    grid = []
+    for axis, bounds in zip(axes, query['rasql']['subset'].split(',')):
+        if ':' not in bounds:
+            continue
+        low, high = bounds.split(':')
+        if low.strip() == '*' or high.strip() == '*':
+            grid.append((axis, FULL_SIZES.get(axis)))
+        else:
+            grid.append((axis, int(high) - int(low) + 1))
+    return grid
+
+def csv_shape(path, chunk_size=CHUNK_SIZE):
+    """
+    Grid shape of a CSV output without parsing the numbers
+
+    Rasdaman nests every dimension but the first in braces, so the number of
+    opening braces per nesting level gives the size of every axis. Without
+    braces (np.savetxt) the lines are the rows.
+
+    Returns:
+        tuple: (shape, True if the shape comes from savetxt rows)
+    """
+    grid = GridShape()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            grid.update(chunk)
+    try:
+        return grid.shape()
+    except ValueError as e:
+        raise ValueError(f"{path}: {e}")
+
+def squeeze(shape):
+    """
+    Shape without axes of size 1
+
+    WCS and OpenEO keep a trimmed axis with a single grid point, RasQL
+    slices it away; both are the same grid.
+    """
+    return tuple(size for size in shape if size != 1) or (1,)
+
+def squeeze_grid(grid):
+    return [(axis, size) for axis, size in grid if size != 1] or [("value", 1)]
+
+def output_shape(path):
+    """Grid shape of any output; binary sinks store the shape"""
+    if path.endswith('.csv'):
+        return csv_shape(path)
+    return tuple(read_result(path).shape), False
+
+def sample_values(path, flat_indices):
+    """Values at the given flat indices, read in one pass"""
+    order = np.argsort(flat_indices)
+    wanted = np.asarray(flat_indices)[order]
+    values = np.full(len(wanted), np.nan)
+    position = 0
+    found = 0
+    for chunk in iter_values(path):
+        end = position + len(chunk)
+        stop = np.searchsorted(wanted, end)
+        values[found:stop] = chunk[wanted[found:stop] - position]
+        found = stop
+        position = end
+        if found == len(wanted):
+            break
+
+    result = np.empty_like(values)
+    result[order] = values
+    return result
+
+def check_shape(shape, grid, reshaped=False):
+    """
+    Compare the shape of an output with the expected grid
+
+    Returns:
+        dict: Expected and actual shape, per-axis discrepancies and a detected axis order
+    """
+    check = {"shape": list(shape), "discrepancies": [], "axis_order": None}
+    expected = [size for _, size in grid]
+    if reshaped and None not in expected and int(np.prod(shape)) == int(np.prod(expected)):
+        # np.savetxt keeps only the last axis, the rows are all other axes flattened;
+        # the row length still shows which axis came last
+        for permutation in itertools.permutations(range(len(expected))):
+            if expected[permutation[-1]] == shape[-1]:
+                shape = tuple(expected[p] for p in permutation)
+                check["reshaped_to"] = list(shape)
+                break
+
+    shape = squeeze(shape)
+    grid = squeeze_grid(grid)
+    axes = [axis for axis, _ in grid]
+    expected = [size for _, size in grid]
+    check.update({"grid_shape": list(shape), "axes": axes, "expected": expected})
+
+    if len(shape) != len(grid):
+        check["discrepancies"].append({"axis": None, "expected": len(grid), "actual": len(shape), "problem": "dimensions"})
+        return check
+
+    for axis, size, actual in zip(axes, expected, shape):
+        if size is not None and size != actual:
+            check["discrepancies"].append({"axis": axis, "expected": size, "actual": actual, "problem": "size"})
+
+    if check["discrepancies"] and None not in expected:
+        for permutation in itertools.permutations(range(len(shape))):
+            if [shape[p] for p in permutation] == expected:
+                order = [None] * len(axes)
+                for axis, p in zip(axes, permutation):
+                    order[p] = axis
+                check["axis_order"] = order
+                break
+    return check
+
+def alignment_candidates(reference_shape, shape):
+    """(permutation, reversed) pairs that map the axes of shape onto reference_shape"""
+    if len(shape) != len(reference_shape):
+        return []
+    candidates = []
+    for permutation in itertools.permutations(range(len(shape))):
+        if all(shape[p] == size for p, size in zip(permutation, reference_shape)):
+            for flips in itertools.product([False, True], repeat=len(shape)):
+                candidates.append((permutation, flips))
+    # Identity first, it wins ties (e.g. constant values)
+    return sorted(candidates, key=lambda c: (list(c[0]) != sorted(c[0]), sum(c[1])))
+
+def compare_aligned(outputs, grid, samples=DEFAULT_SAMPLES, atol=1e-6, rtol=1e-6, seed=0):
+    """
+    Align the outputs of several APIs and compare them on sampled grid points
+
+    The first output is the reference. For every other output all axis
+    permutations and reversals that fit its shape are tried; the best one is
+    reported with its differences per axis.
+
+    Args:
+        outputs (dict): {api: path}
+        grid (list): Expected axes and sizes of the query (expected_grid)
+    """
+    names = list(outputs)
+    shapes = {}
+    checks = {}
+    for name in names:
+        shape, reshaped = output_shape(outputs[name])
+        checks[name] = check_shape(shape, grid, reshaped)
+        shapes[name] = tuple(checks[name]["grid_shape"])
+
+    grid = squeeze_grid(grid)
+    reference = names[0]
+    reference_shape = shapes[reference]
+    axes = [axis for axis, _ in grid] if len(grid) == len(reference_shape) \
+        else [f"axis{k}" for k in range(len(reference_shape))]
+
+    rng = np.random.default_rng(seed)
+    total = int(np.prod(reference_shape))
+    flat = np.arange(total) if total <= samples else np.sort(rng.choice(total, samples, replace=False))
+    points = np.unravel_index(flat, reference_shape)
+    reference_values = sample_values(outputs[reference], flat)
+
+    result = {"reference": reference, "axes": axes, "sampled": len(flat), "outputs": {}}
+    for name in names:
+        result["outputs"][name] = {"shape": list(shapes[name]), "check": checks[name]}
+
+    for name in names[1:]:
+        entry = result["outputs"][name]
+        candidates = alignment_candidates(reference_shape, shapes[name])
+        if not candidates:
+            entry["aligned"] = False
+            entry["discrepancies"] = [
+                {"axis": axis, "reference": size, "actual": actual}
+                for axis, size, actual in itertools.zip_longest(axes, reference_shape, shapes[name])
+                if size != actual
+            ]
+            continue
+
+        # All candidates are sampled in a single pass over the file
+        mapped = []
+        for permutation, flips in candidates:
+            index = [None] * len(reference_shape)
+            for j, (p, flip) in enumerate(zip(permutation, flips)):
+                index[p] = reference_shape[j] - 1 - points[j] if flip else points[j]
+            mapped.append(np.ravel_multi_index(index, shapes[name]))
+        values = sample_values(outputs[name], np.concatenate(mapped)).reshape(len(candidates), -1)
+
+        matches = np.isclose(values, reference_values, rtol=rtol, atol=atol, equal_nan=True)
+        best = int(np.argmax(matches.sum(axis=1)))
+        permutation, flips = candidates[best]
+        mismatch = ~matches[best]
+
+        entry["aligned"] = True
+        entry["axis_order"] = [axes[permutation.index(k)] for k in range(len(axes))]
+        entry["reversed"] = [axis for axis, flip in zip(axes, flips) if flip]
+        entry["mismatches"] = int(mismatch.sum())
+        entry["max_abs_diff"] = float(np.nanmax(np.abs(values[best] - reference_values), initial=0.0))
+        entry["axis_discrepancies"] = {}
+        for j, axis in enumerate(axes):
+            indices = np.unique(points[j][mismatch])
+            if len(indices):
+                entry["axis_discrepancies"][axis] = {
+                    "count": int(len(indices)),
+                    "indices": indices[:MAX_REPORTED_INDICES].tolist()
+                }
+    return result
+
+def check_output(path, grid):
+    """Shape check of a single output against the expected grid (no values are parsed)"""
+    shape, reshaped = output_shape(path)
+    return check_shape(shape, grid, reshaped)
+
+def shape_problems(name, check):
+    """Human-readable problems of a check_shape result"""
+    if check["axis_order"]:
+        return [f"{name}: axes are in the order {', '.join(check['axis_order'])} "
+                f"instead of {', '.join(check['axes'])}"]
+    return [
+        f"{name}: {discrepancy['problem']} of {discrepancy['axis'] or 'grid'} "
+        f"is {discrepancy['actual']}, expected {discrepancy['expected']}"
+        for discrepancy in check["discrepancies"]
+    ]
+
+def validation_problems(validation):
+    """Human-readable problems of a compare_aligned result"""
+    problems = []
+    for name, entry in validation["outputs"].items():
+        problems += shape_problems(name, entry["check"])
+        if entry.get("aligned") is False:
+            problems.append(f"{name}: cannot be aligned with {validation['reference']} "
+                            f"(shape {entry['shape']} vs {validation['outputs'][validation['reference']]['shape']})")
+        if entry.get("aligned"):
+            if entry["axis_order"] != validation["axes"] and not entry["check"]["axis_order"]:
+                problems.append(f"{name}: axis order {', '.join(entry['axis_order'])} "
+                                f"instead of {', '.join(validation['axes'])}")
+            if entry["reversed"]:
+                problems.append(f"{name}: reversed axes {', '.join(entry['reversed'])}")
+            if entry["mismatches"]:
+                per_axis = "; ".join(
+                    f"{axis} at {d['count']} indices "
+                    f"({', '.join(map(str, d['indices']))}{', ...' if d['count'] > MAX_REPORTED_INDICES else ''})"
+                    for axis, d in entry["axis_discrepancies"].items()
+                )
+                problems.append(f"{name}: {entry['mismatches']} of {validation['sampled']} sampled values differ "
+                                f"from {validation['reference']} (max {entry['max_abs_diff']:.3g}): {per_axis}")
+    return problems
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Shape-aware validation of the query outputs")
+    parser.add_argument('--dir', required=True, help="Result directory of benchmark.py")
+    parser.add_argument('--matrix', default=os.path.join(SCRIPT_DIR, 'queries.json'), help="Query matrix (JSON)")
+    parser.add_argument('--queries', nargs='+', help="Queries to validate (default: all with outputs)")
+    parser.add_argument('--samples', type=int, default=DEFAULT_SAMPLES, help="Sampled grid points per query")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    with open(args.matrix) as f:
+        queries = json.load(f)['queries']
+
+    problems = []
+    for name, paths in find_outputs(args.dir, args.queries).items():
+        outputs = {os.path.basename(path): path for path in paths}
+        validation = compare_aligned(outputs, expected_grid(queries[name]), args.samples)
+        query_problems = validation_problems(validation)
+        print(f"{name}: {'OK' if not query_problems else f'{len(query_problems)} problems'}")
+        for problem in query_problems:
+            print(f"  {problem}")
+        problems += query_problems
+
+    sys.exit(1 if problems else 0)
+
+if __name__ == "__main__":
+    main()
@@ -1,36 +1,38 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request, send_file
 from flask_cors import CORS
-import requests
 from lxml import etree
-from datetime import datetime, timezone, timedelta
+from datetime import datetime, timedelta
 import time
+from urllib.parse import urlencode
+from config import RASDAMAN_URL, RESULT_CHUNK_SIZE, DEFAULT_PAGE_LIMIT, MAX_PAGE_LIMIT
+from openeo.backend import rasdaman_get, process_coverages
+from openeo.capabilities import capabilities_cache
+from openeo.processes import compile_process_graph, load_collection_arguments, ProcessGraphError, SUPPORTED_PROCESSES
+from openeo.pyramid import level_coverages, pyramid_levels
+from openeo.jobs import JobExecutor, JobLimitExceeded, JobCanceled, now_iso
+from openeo.results import result_store, parse_range_header, parse_content_range, iter_byte_range
+from openeo.store import job_store, process_graph_store
 
 app = Flask(__name__)
 CORS(app)
 
-# Rasdaman Konfiguration
-RASDAMAN_URL = "http://localhost:8080/rasdaman/ows"
-RASDAMAN_USER = "rasadmin"  
-RASDAMAN_PASS = "rasadmin"
-
-# Test-Prozessgraphen
-user_process_graphs = {
-    "ndvi_1": {
-        "summary": "Normalized Difference Vegetation Index",
-        "description": "Computes the NDVI from red and NIR bands",
-        "process_graph": {
-            "nir": {"process_id": "load_collection", "arguments": {"id": "S2_NIR"}},
-            "red": {"process_id": "load_collection", "arguments": {"id": "S2_RED"}},
-            "subtract": {"process_id": "subtract", "arguments": {"x": {"from_node": "nir"}, "y": {"from_node": "red"}}},
-            "add": {"process_id": "add", "arguments": {"x": {"from_node": "nir"}, "y": {"from_node": "red"}}},
-            "divide": {
-                "process_id": "divide",
-                "arguments": {"x": {"from_node": "subtract"}, "y": {"from_node": "add"}},
-                "result": True
-            }
+# Test-Prozessgraph, wird beim ersten Start in der Datenbank angelegt
+process_graph_store.seed({
+    "id": "ndvi_1",
+    "summary": "Normalized Difference Vegetation Index",
+    "description": "Computes the NDVI from red and NIR bands",
+    "process_graph": {
+        "nir": {"process_id": "load_collection", "arguments": {"id": "S2_NIR"}},
+        "red": {"process_id": "load_collection", "arguments": {"id": "S2_RED"}},
+        "subtract": {"process_id": "subtract", "arguments": {"x": {"from_node": "nir"}, "y": {"from_node": "red"}}},
+        "add": {"process_id": "add", "arguments": {"x": {"from_node": "nir"}, "y": {"from_node": "red"}}},
+        "divide": {
+            "process_id": "divide",
+            "arguments": {"x": {"from_node": "subtract"}, "y": {"from_node": "add"}},
+            "result": True
         }
     }
-}
+})
 
 def convert_hours_to_iso8601(hours_since_1900):
     """Konvertiert Stunden seit 1900-01-01 in ISO 8601-Datumsformat."""
@@ -38,78 +40,37 @@ def convert_hours_to_iso8601(hours_since_1900):
     target_date = base_date + timedelta(hours=hours_since_1900)
     return target_date.isoformat()
 
-# Speicher für innerhalb der Session ertellte Jobs
-jobs_store = {}
-
 def get_rasdaman_collections():
-    """Hole Collections von Rasdaman über WCS GetCapabilities"""
+    """Hole Collections von Rasdaman über das gecachte WCS GetCapabilities-Dokument"""
     try:
-        # WCS GetCapabilities Request
-        params = {
-            'SERVICE': 'WCS',
-            'VERSION': '2.0.1',
-            'REQUEST': 'GetCapabilities'
-        }
-        
-        print(f"Sending request to: {RASDAMAN_URL}")
-        print(f"With parameters: {params}")
-        
-        # Request mit Basic Auth
-        response = requests.get(
-            RASDAMAN_URL, 
-            params=params,
-            auth=(RASDAMAN_USER, RASDAMAN_PASS)  # Basic Auth
-        )
-        
-        print(f"Response status code: {response.status_code}")
-        
-        if response.status_code == 200:
-            print("Successfully authenticated!")
-            print(f"Response content: {response.text[:500]}...")  # First 500 chars
-            
-            # Parse XML Response
-            root = etree.fromstring(response.content)
-            
-            # Define namespaces
-            ns = {
-                'wcs': 'http://www.opengis.net/wcs/2.0',
-                'ows': 'http://www.opengis.net/ows/2.0'
-            }
-            
-            # Extract collections
-            collections = []
-            coverages = root.xpath('//wcs:CoverageId', namespaces=ns)
-            print(f"Found {len(coverages)} coverages")
-            
-            for coverage in coverages:
-                collection_id = coverage.text
-                print(f"Found coverage: {collection_id}")
-                collections.append({
-                    "stac_version": "1.0.0",
-                    "id": collection_id,
-                    "title": collection_id,
-                    "description": f"Rasdaman coverage: {collection_id}",
-                    "extent": {
-                        "spatial": {
-                            "bbox": [[-180, -90, 180, 90]]
-                        },
-                        "temporal": {
-                            "interval": [[None, None]]
-                        }
-                    }
-                })
-            
-            return collections
-        else:
-            print(f"Error: Rasdaman returned status code {response.status_code}")
-            if response.status_code == 401:
-                print("Authentication failed. Please check username and password.")
-            return []
-            
+        capabilities = capabilities_cache.get()
     except Exception as e:
         print(f"Error fetching collections: {e}")
         return []
 
+    # Pyramidenstufen sind keine eigenen Collections, resample_spatial wählt sie aus
+    levels = level_coverages()
+    collections = []
+    for collection_id in capabilities["coverage_ids"]:
+        if collection_id in levels:
+            continue
+        collections.append({
+            "stac_version": "1.0.0",
+            "id": collection_id,
+            "title": collection_id,
+            "description": f"Rasdaman coverage: {collection_id}",
+            "extent": {
+                "spatial": {
+                    "bbox": [[-180, -90, 180, 90]]
+                },
+                "temporal": {
+                    "interval": [[None, None]]
+                }
+            }
+        })
+
+    return collections
+
 # Endpunkt für Anzeige der verfügbaren Collections
 @app.route('/collections')
 def collections():
@@ -139,11 +100,7 @@ def get_collection_metadata(collection_id):
             'REQUEST': 'DescribeCoverage',
             'COVERAGEID': collection_id
         }
-        response = requests.get(
-            RASDAMAN_URL,
-            params=params,
-            auth=(RASDAMAN_USER, RASDAMAN_PASS)
-        )
+        response = rasdaman_get(params)
 
         root = etree.fromstring(response.content)
         ns = {
@@ -169,6 +126,10 @@ def get_collection_metadata(collection_id):
             raw_values = coefficients[0].text.split('"')
             time_values = [value for value in raw_values if value.strip()]
 
+        # Auflösungspyramide: Gitterweite in Grad und Coverage je Stufe (fein nach grob)
+        levels = pyramid_levels(collection_id)
+        spatial_step = {"step": levels[0][0]} if levels else {}
+
         return {
             "id": collection_id,
             "title": collection_id,
@@ -187,10 +148,15 @@ def get_collection_metadata(collection_id):
                     "type": "temporal",
                     "values": time_values
                 },
-                "x": {"type": "spatial", "axis": "x"},
-                "y": {"type": "spatial", "axis": "y"}
+                "x": {"type": "spatial", "axis": "x", **spatial_step},
+                "y": {"type": "spatial", "axis": "y", **spatial_step}
             },
-            "summaries": {}
+            "summaries": {
+                "pyramid_levels": [
+                    {"resolution": resolution, "coverage_id": coverage_id}
+                    for resolution, coverage_id in levels
+                ]
+            } if levels else {}
         }
     except Exception as e:
         print(f"Error fetching collection metadata: {e}")
@@ -210,67 +176,24 @@ def file_formats():
 def get_rasdaman_file_formats():
     """Hole die von Rasdaman unterstützten Dateiformate"""
     try:
-        # WCS GetCapabilities Request
-        params = {
-            'SERVICE': 'WCS',
-            'VERSION': '2.0.1',
-            'REQUEST': 'GetCapabilities'
-        }
-
-        print(f"Sending request to: {RASDAMAN_URL}")
-        print(f"With parameters: {params}")
-
-        # Request mit Basic Auth
-        response = requests.get(
-            RASDAMAN_URL,
-            params=params,
-            auth=(RASDAMAN_USER, RASDAMAN_PASS)
-        )
-
-        print(f"Response status code: {response.status_code}")
-        print(f"Response content: {response.text}")
-
-        if response.status_code == 200:
-            print("Successfully retrieved file format information!")
-
-            # Parse XML Response
-            root = etree.fromstring(response.content)
-
-            # Define namespaces
-            ns = {
-                'wcs': 'http://www.opengis.net/wcs/2.0',
-                'ows': 'http://www.opengis.net/ows/2.0'
-            }
-
-            # Extract input and output formats
-            input_formats = {}
-            output_formats = {}
-
-            # Extracting input formats
-            for format_element in root.xpath('//wcs:ServiceMetadata/wcs:formatSupported', namespaces=ns):
-                format_name = format_element.text
-                input_formats[format_name] = {
-                    "title": format_name
-                }
-
-            # Extracting output formats
-            for format_element in root.xpath('//wcs:ServiceMetadata/wcs:formatSupported', namespaces=ns):
-                format_name = format_element.text
-                output_formats[format_name] = {
-                    "title": format_name
-                }
-
-            return input_formats, output_formats
-        else:
-            print(f"Error: Rasdaman returned status code {response.status_code}")
-            if response.status_code == 401:
-                print("Authentication failed. Please check username and password.")
-            return {}, {}
-
+        capabilities = capabilities_cache.get()
     except Exception as e:
         print(f"Error fetching file formats: {e}")
         return {}, {}
 
+    # Rasdaman meldet keine Trennung zwischen Ein- und Ausgabeformaten
+    input_formats = {}
+    output_formats = {}
+    for format_name in capabilities["formats"]:
+        input_formats[format_name] = {
+            "title": format_name
+        }
+        output_formats[format_name] = {
+            "title": format_name
+        }
+
+    return input_formats, output_formats
+
 # Endpunkt für Anzeige der verfügbaren Prozesse
 @app.route('/processes')
 def get_processes():
@@ -285,83 +208,62 @@ def get_processes():
 def get_rasdaman_processes():
     """Hole die von Rasdaman unterstützten Prozesse"""
     try:
-        # WCS GetCapabilities Request
-        params = {
-            'SERVICE': 'WCS',
-            'VERSION': '2.0.1',
-            'REQUEST': 'GetCapabilities'
-        }
-
-        print(f"Sending request to: {RASDAMAN_URL}")
-        print(f"With parameters: {params}")
-
-        # Request mit Basic Auth
-        response = requests.get(
-            RASDAMAN_URL,
-            params=params,
-            auth=(RASDAMAN_USER, RASDAMAN_PASS)
-        )
-
-        print(f"Response status code: {response.status_code}")
-        print(f"Response content: {response.text}")
-
-        if response.status_code == 200:
-            print("Successfully retrieved process information!")
-
-            # Parse XML Response
-            root = etree.fromstring(response.content)
-
-            # Define namespaces
-            ns = {
-                'wcs': 'http://www.opengis.net/wcs/2.0',
-                'ows': 'http://www.opengis.net/ows/2.0'
-            }
-
-            # Extract processes
-            processes = []
-
-            for process_element in root.xpath('//ows:Operation', namespaces=ns):
-                process_name = process_element.get('name')
-                
-                # Überprüfe, ob es sich um einen unterstützten Prozess handelt
-                if process_name in ['GetCoverage', 'DescribeCoverage', 'ProcessCoverages']:
-                    process_metadata = {
-                        "id": process_name,
-                        "summary": process_name,
-                        "description": process_name,
-                        "parameters": [],
-                        "returns": {
-                            "description": "Processed data",
-                            "schema": {}
-                        },
-                        "categories": [],
-                        "deprecated": False,
-                        "experimental": False,
-                        "exceptions": {},
-                        "examples": [],
-                        "links": []
-                    }
-                    processes.append(process_metadata)
-
-            return processes
-        else:
-            print(f"Error: Rasdaman returned status code {response.status_code}")
-            if response.status_code == 401:
-                print("Authentication failed. Please check username and password.")
-            return []
-
+        capabilities = capabilities_cache.get()
     except Exception as e:
         print(f"Error fetching processes: {e}")
         return []
 
+    processes = []
+    for process_name in SUPPORTED_PROCESSES:
+        # openEO-Prozesse, die /result in WCPS übersetzt
+        processes.append(process_description(process_name, ["wcps"]))
+
+    for process_name in capabilities["operations"]:
+        # Überprüfe, ob es sich um einen unterstützten Prozess handelt
+        if process_name in ['GetCoverage', 'DescribeCoverage', 'ProcessCoverages']:
+            processes.append(process_description(process_name, []))
+
+    return processes
+
+def process_description(process_name, categories):
+    """Metadaten eines Prozesses für /processes"""
+    return {
+        "id": process_name,
+        "summary": process_name,
+        "description": process_name,
+        "parameters": [],
+        "returns": {
+            "description": "Processed data",
+            "schema": {}
+        },
+        "categories": categories,
+        "deprecated": False,
+        "experimental": False,
+        "exceptions": {},
+        "examples": [],
+        "links": []
+    }
+
+# Endpunkt für die Statistik des Capabilities-Caches
+@app.route('/capabilities_cache')
+def get_capabilities_cache_stats():
+    """Zeige Hit/Miss-Zähler des GetCapabilities-Caches"""
+    return jsonify(capabilities_cache.stats())
+
 # Endpunkt für Anzeige/Erstellung von Prozess-Graphen
 @app.route('/process_graphs', methods=['GET', 'POST'])
 def process_graphs_endpoint():
     if request.method == 'GET':
+        try:
+            limit, cursor, fields = get_list_parameters()
+            process_graphs, next_cursor = process_graph_store.list(limit=limit, cursor=cursor)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
         processes = []
-        for pg_id, pg_data in user_process_graphs.items():
+        for pg_data in process_graphs:
             process = {
-                "id": pg_id,
+                "id": pg_data["id"],
                 "summary": pg_data.get("summary", ""),
                 "description": pg_data.get("description", ""),
                 "categories": pg_data.get("categories", []),
@@ -372,27 +274,65 @@ def process_graphs_endpoint():
                 "examples": pg_data.get("examples", []),
                 "links": []
             }
-            processes.append(process)
+            processes.append(select_fields(process, fields))
             
         return jsonify({
             "processes": processes,
-            "links": [
-                {
-                    "rel": "self",
-                    "href": request.base_url,
-                    "type": "application/json"
-                }
-            ]
+            "links": list_links(limit, next_cursor, fields)
         })
     elif request.method == 'POST':
         process_graph_data = request.get_json()
         new_process_graph = save_process_graph(process_graph_data)
         return jsonify(new_process_graph), 201
 
+def get_list_parameters():
+    """
+    limit, cursor und fields einer Listen-Anfrage
+
+    Raises:
+        ValueError: Bei ungültigem limit oder cursor
+    """
+    limit = request.args.get('limit', DEFAULT_PAGE_LIMIT)
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid limit {limit}")
+    if not 1 <= limit <= MAX_PAGE_LIMIT:
+        raise ValueError(f"limit must be between 1 and {MAX_PAGE_LIMIT}")
+
+    cursor = request.args.get('cursor') or None
+    fields = request.args.get('fields')
+    fields = [field.strip() for field in fields.split(',') if field.strip()] if fields else None
+    return limit, cursor, fields
+
+def select_fields(document, fields):
+    """Nur die angeforderten Felder eines Eintrags (die id ist immer enthalten)"""
+    if not fields:
+        return document
+    return {key: value for key, value in document.items() if key == 'id' or key in fields}
+
+def list_links(limit, next_cursor, fields):
+    """self- und next-Link einer Listen-Antwort (openEO-Paginierung)"""
+    links = [{
+        "rel": "self",
+        "href": request.url,
+        "type": "application/json"
+    }]
+    if next_cursor:
+        parameters = {"limit": limit, "cursor": next_cursor}
+        if fields:
+            parameters["fields"] = ",".join(fields)
+        links.append({
+            "rel": "next",
+            "href": f"{request.base_url}?{urlencode(parameters)}",
+            "type": "application/json"
+        })
+    return links
+
 def get_user_process_graphs():
     """Hole alle benutzerdefinierten Prozessgraphen des Nutzers"""
-    # statische Liste
-    return list(user_process_graphs.values())
+    process_graphs, _ = process_graph_store.list()
+    return process_graphs
 
 # Endpunkt für Anzeige dvon Details eines Prozess-Graphens
 @app.route('/process_graphs/<string:process_graph_id>', methods=['GET'])
@@ -406,21 +346,12 @@ def get_process_graph(process_graph_id):
 
 def get_process_graph_details(process_graph_id):
     """Hole die Details eines bestimmten Prozessgraphen"""
-    if process_graph_id in user_process_graphs:
-        process_graph = user_process_graphs[process_graph_id]
-        return process_graph
-    else:
-        return None
+    return process_graph_store.get(process_graph_id)
 
 def save_process_graph(process_graph_data):
-    # Generiere eine eindeutige ID für den neuen Prozessgraphen
-    new_id = f"pg-{len(user_process_graphs) + 1}"
-    
-    # Füge den neuen Prozessgraphen zur Datenstruktur hinzu
-    user_process_graphs[new_id] = process_graph_data
-    process_graph_data["id"] = new_id
-    
-    return process_graph_data
+    # Der Store vergibt eine eindeutige ID für den neuen Prozessgraphen
+    process_graph_data.pop("id", None)
+    return process_graph_store.create(process_graph_data)
 
 # Endpunkt für das Aktualisieren eines bestehenden Prozessgraphen
 @app.route('/process_graphs/<string:process_graph_id>', methods=['PATCH'])
@@ -433,11 +364,7 @@ def update_process_graph(process_graph_id):
         return jsonify({'error': f'Process graph {process_graph_id} not found'}), 404
 
 def update_process_graph(process_graph_id, process_graph_data):
-    if process_graph_id in user_process_graphs:
-        user_process_graphs[process_graph_id].update(process_graph_data)
-        return user_process_graphs[process_graph_id]
-    else:
-        return None
+    return process_graph_store.update(process_graph_id, process_graph_data)
 
 # Endpunkt für das Löschen eines Prozessgraphen
 @app.route('/process_graphs/<string:process_graph_id>', methods=['DELETE'])
@@ -448,11 +375,7 @@ def delete_process_graph(process_graph_id):
         return jsonify({'error': f'Process graph {process_graph_id} not found'}), 404
 
 def delete_process_graph(process_graph_id):
-    if process_graph_id in user_process_graphs:
-        del user_process_graphs[process_graph_id]
-        return True
-    else:
-        return False
+    return process_graph_store.delete(process_graph_id)
 
 # Endpunkt für Anzeige der verfügbaren OpenEO Funktionen
 @app.route('/')
@@ -479,6 +402,10 @@ def get_capabilities():
                 "path": "/jobs",
                 "methods": ["GET", "POST"]
             },
+            {
+                "path": "/result",
+                "methods": ["POST"]
+            },
             {
                 "path": "/file_formats",
                 "methods": ["GET"]
@@ -486,6 +413,10 @@ def get_capabilities():
             {
                 "path": "/process_graphs",
                 "methods": ["GET", "POST", "PATCH", "DELETE"]
+            },
+            {
+                "path": "/capabilities_cache",
+                "methods": ["GET"]
             }
         ],
         "links": [
@@ -510,39 +441,50 @@ def get_openeo_versions():
         ]
     })
 
+# Felder eines Jobs in GET /jobs, wenn der Client keine fields angibt
+JOB_LIST_FIELDS = [
+    "id", "title", "description", "status", "created", "updated",
+    "plan", "budget", "collection_id", "execution_time"
+]
+
 # Endpunkt für das globale Job-Handling
 @app.route('/jobs', methods=['GET', 'POST'])
 def jobs():
     if request.method == 'GET':
+        try:
+            limit, cursor, fields = get_list_parameters()
+            job_list, next_cursor = job_store.list(limit=limit, cursor=cursor)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        # Ohne fields nur die Übersichtsfelder, Prozessgraph und Ergebnis über GET /jobs/<id>
         return jsonify({
-            "jobs": list(jobs_store.values()),
-            "links": [{
-                "rel": "self",
-                "href": request.base_url,
-                "type": "application/json"
-            }]
+            "jobs": [select_fields(job, fields or JOB_LIST_FIELDS) for job in job_list],
+            "links": list_links(limit, next_cursor, fields)
         })
     
     elif request.method == 'POST':
         job_data = request.get_json()
-        job_id = f"job-{len(jobs_store) + 1}"
-
-        collection_id = job_data["process"]["process_graph"]["load_data"]["arguments"]["id"]
+        try:
+            # Der load_collection-Knoten kann beliebig heißen, nicht nur load_data
+            collection_id = load_collection_arguments(job_data["process"]["process_graph"]).get("id")
+        except (KeyError, TypeError, ProcessGraphError) as e:
+            return jsonify({"error": f"Invalid process graph: {e}"}), 400
 
         new_job = {
-            "id": job_id,
             "title": job_data.get("title"),
             "description": job_data.get("description"),
             "process": job_data.get("process"),
             "status": "created",
-            "created": datetime.now().isoformat() + "Z",
+            "created": now_iso(),
             "plan": job_data.get("plan", "free"),
             "budget": job_data.get("budget", None),
             "log_level": job_data.get("log_level", "info"),
             "collection_id": collection_id
         }
         
-        jobs_store[job_id] = new_job
+        new_job = job_store.create(new_job)
+        job_id = new_job["id"]
         
         response = jsonify(new_job)
         response.headers["Location"] = f"{request.base_url}/{job_id}"
@@ -553,7 +495,7 @@ def jobs():
 @app.route('/jobs/<string:job_id>', methods=['GET', 'PATCH', 'DELETE'])
 def job_details(job_id):
     if request.method == 'GET':
-        job = jobs_store.get(job_id)
+        job = job_store.get(job_id)
         if job:
             return jsonify(job)
         else:
@@ -574,125 +516,132 @@ def job_details(job_id):
             return jsonify({'error': f'Job {job_id} not found'}), 404
 
 def update_job(job_id, job_updates):
-    if job_id in jobs_store:
-        job = jobs_store[job_id]
-        job.update(job_updates)
-        return job
-    else:
-        return None
+    return job_store.update(job_id, job_updates)
 
 def delete_job(job_id):
-    if job_id in jobs_store:
-        del jobs_store[job_id]
+    # Laufende Ausführung abbrechen und ihr Ende abwarten, bevor der Job entfernt wird;
+    # ein Worker eines anderen Prozesses verwirft sein Ergebnis, sobald der Job fehlt
+    job_executor.cancel(job_id, wait=True)
+    if job_store.delete(job_id):
+        result_store.delete(job_id)
         return True
     else:
         return False
 
-def parse_temporal_interval(interval: str) -> tuple:
-    """Parse temporal interval in ISO 8601 format."""
-    start, end = interval.split('/')
-    return datetime.fromisoformat(start), datetime.fromisoformat(end)
+def check_not_canceled(cancel_event):
+    """Wirf JobCanceled, falls der Job abgebrochen oder gelöscht wurde"""
+    if cancel_event.is_set():
+        raise JobCanceled()
 
-def construct_wcps_query(collection_id: str, temporal_extent=None, spatial_extent=None):
-    query = f"for data in ({collection_id})"
-    
-    if temporal_extent:
-        start, end = parse_temporal_interval(temporal_extent)
-        query += f" where time(data) >= '{start.isoformat()}' and time(data) <= '{end.isoformat()}'"
-    
-    if spatial_extent:
-        west, south, east, north = spatial_extent
-        query += f" where Long(data) >= {west} and Long(data) <= {east}"
-        query += f" and Lat(data) >= {south} and Lat(data) <= {north}"
-    
-    query += " return encode(data, 'GTiff')"
-    return query
+def iter_job_chunks(response, cancel_event):
+    """Lies die Antwort blockweise, damit ein Abbruch nicht bis zum Ende des Downloads wartet"""
+    for chunk in response.iter_content(chunk_size=RESULT_CHUNK_SIZE):
+        check_not_canceled(cancel_event)
+        yield chunk
+
+def build_job_query(job):
+    """Übersetze den Prozessgraphen eines Jobs in eine WCPS-Query (Query, MIME-Type)"""
+    return compile_process_graph(job["process"]["process_graph"])
+
+def execute_job(job, cancel_event):
+    """Führe die WCPS-Query eines Jobs in Rasdaman aus (läuft im Job-Executor)"""
+    job_id = job['id']
+
+    # Starte die Zeitmessung
+    start_time = time.time()  # Zeitpunkt vor der Ausführung des Jobs
+
+    query, media_type = build_job_query(job)
+    print(f"Job {job_id} WCPS query: {query}")
+
+    # API-Anfrage an Rasdaman
+    with process_coverages(query, stream=True) as response:
+        if response.status_code != 200:
+            # Fehler vom WCS-Server
+            raise RuntimeError(response.text)
+
+        # Antwort blockweise direkt auf die Platte schreiben, im Job landen nur Metadaten
+        result = result_store.write_stream(
+            job_id,
+            iter_job_chunks(response, cancel_event),
+            media_type,
+            before_commit=lambda: check_not_canceled(cancel_event)
+        )
+
+    # Berechne die verstrichene Zeit
+    elapsed_time = time.time() - start_time  # Zeit in Sekunden
+    print(f"Job {job_id} completed in {elapsed_time:.2f} seconds")
+
+    # Job erfolgreich abgeschlossen, außer er wurde inzwischen abgebrochen
+    if not job_executor.set_status(
+        job,
+        'finished',
+        result=result,
+        execution_time=f"{elapsed_time:.2f} seconds"
+    ):
+        raise JobCanceled()
+
+job_executor = JobExecutor(execute_job, store=job_store)
+
+def get_request_user():
+    """Nutzer der aktuellen Anfrage (für die Job-Limits pro Nutzer)"""
+    if request.authorization and request.authorization.username:
+        return request.authorization.username
+    return "anonymous"
 
 # Endpunkt für die Job-Ausführung
 @app.route('/jobs/<job_id>/results', methods=['POST'])
 def start_job(job_id):
-    if job_id not in jobs_store:
+    """Reihe einen Job zur asynchronen Ausführung ein"""
+    job = job_store.get(job_id)
+    if job is None:
         return jsonify({"error": f"Job {job_id} not found"}), 404
-        
-    job = jobs_store[job_id]
-    
+
     try:
-        # Starte die Zeitmessung
-        start_time = time.time()  # Zeitpunkt vor der Ausführung des Jobs
+        # Wartende oder laufende Jobs (auch in anderen Worker-Prozessen) bleiben unverändert
+        job = job_executor.submit(job, get_request_user()) or job_store.get(job_id)
+    except JobLimitExceeded as e:
+        return jsonify({"error": str(e)}), 429
+
+    response = jsonify(job)
+    response.headers["Location"] = f"{request.host_url}jobs/{job_id}"
+    return response, 202
+
+# Endpunkt für den Abbruch eines Jobs
+@app.route('/jobs/<job_id>/results', methods=['DELETE'])
+def cancel_job(job_id):
+    """Breche einen wartenden oder laufenden Job ab, der Job selbst bleibt erhalten"""
+    if not job_store.exists(job_id):
+        return jsonify({"error": f"Job {job_id} not found"}), 404
 
-        job['status'] = 'running'
-        
-        # Extrahiere die räumlichen und zeitlichen Parameter
-        arguments = job["process"]["process_graph"]["load_data"]["arguments"]
-        spatial_extent = arguments["spatial_extent"]
-        temporal_extent = arguments["temporal_extent"]
-        
-        # Konvertiere den Zeitbereich ins ISO 8601-Format
-        start_time_str = datetime.fromisoformat(temporal_extent[0]).astimezone(timezone.utc).isoformat()
-        end_time_str = datetime.fromisoformat(temporal_extent[1]).astimezone(timezone.utc).isoformat()
-        
-        # WCS-Anfrage vorbereiten
-        params = {
-            'SERVICE': 'WCS',
-            'VERSION': '2.0.1',
-            'REQUEST': 'GetCoverage',
-            'COVERAGEID': job["collection_id"],
-            'SUBSET': [
-                f'Lat({spatial_extent["south"]},{spatial_extent["north"]})',
-                f'Long({spatial_extent["west"]},{spatial_extent["east"]})',
-                f'ansi("{start_time_str}","{end_time_str}")'
-            ],
-            'FORMAT': 'application/json'
-        }
-        
-        # API-Anfrage an Rasdaman
-        response = requests.get(
-            RASDAMAN_URL,
-            params=params,
-            auth=(RASDAMAN_USER, RASDAMAN_PASS),
-            stream=True
-        )
-        
-        # Berechne die verstrichene Zeit
-        elapsed_time = time.time() - start_time  # Zeit in Sekunden
-        print(f"Job {job_id} completed in {elapsed_time:.2f} seconds")
-        
-        # Verarbeite die Antwort
-        if response.status_code == 200:
-            result = response.json()  # Wenn JSON-Format erwartet wird
-            
-            # Job erfolgreich abgeschlossen
-            job['status'] = 'finished'
-            job['result'] = {'data': result}
-        else:
-            # Fehler vom WCS-Server
-            job['status'] = 'error'
-            job['error'] = response.text
-        
-        # Füge die verstrichene Zeit zu den Ergebnissen hinzu
-        job['execution_time'] = f"{elapsed_time:.2f} seconds"
-        
-        return jsonify(job), 202
-        
-    except Exception as e:
-        print(f"Error executing job: {str(e)}")
-        job['status'] = 'error'
-        job['error'] = str(e)
-        return jsonify({"error": str(e)}), 500
+    job_executor.cancel(job_id)
+    return '', 204
 
 # Endpunkt für die Anzeige der Ergebnisse eines fertigen Jobs
 @app.route('/jobs/<job_id>/results', methods=['GET'])
 def get_job_results(job_id):
     """Hole die Ergebnisse eines fertiggestellten Jobs"""
-    if job_id not in jobs_store:
+    job = job_store.get(job_id)
+    if job is None:
         return jsonify({"error": f"Job {job_id} not found"}), 404
-        
-    job = jobs_store[job_id]
     
     if job['status'] != 'finished':
         return jsonify({"error": "Job is not finished yet"}), 400
         
     try:
+        # Ergebnisdatei als STAC-Asset, ausgeliefert über den Download-Endpunkt
+        result_file = job['result']
+        data_asset = {
+            "href": f"{request.host_url}jobs/{job_id}/results/{result_file['filename']}",
+            "type": result_file['type'],
+            "roles": ["data"],
+            "file:size": result_file['size'],
+            "file:checksum": result_file['checksum']
+        }
+
+        source = load_collection_arguments(job['process']['process_graph'])
+        spatial_extent = source.get('spatial_extent') or {}
+        temporal_extent = source.get('temporal_extent') or [None]
+
         # Result metadata im STAC-Format
         result = {
             "stac_version": "1.0.0",
@@ -701,21 +650,21 @@ def get_job_results(job_id):
             "geometry": {
                 "type": "Point",
                 "coordinates": [
-                    float(job['process']['process_graph']['load_data']['arguments']['spatial_extent']['west']),
-                    float(job['process']['process_graph']['load_data']['arguments']['spatial_extent']['north'])
+                    float(spatial_extent['west']),
+                    float(spatial_extent['north'])
                 ]
             },
             "properties": {
-                "datetime": job['process']['process_graph']['load_data']['arguments']['temporal_extent'][0],
+                "datetime": temporal_extent[0],
                 "title": job.get('title', ''),
-                "description": job.get('description', ''),
-                "temperature": job.get('result', {}).get('temperature')
+                "description": job.get('description', '')
             },
             "assets": {
-                "data": {
-                    "href": f"http://localhost:8080/rasdaman/ows?service=WCS&version=2.0.1&request=GetCoverage&coverageId=era5_weekly",
+                "data": data_asset,
+                "coverage": {
+                    "href": f"{RASDAMAN_URL}?service=WCS&version=2.0.1&request=GetCoverage&coverageId={job['collection_id']}",
                     "type": "image/tiff",
-                    "roles": ["data"]
+                    "roles": ["source"]
                 },
                 "metadata": {
                     "href": f"http://localhost:5000/jobs/{job_id}",
@@ -736,17 +685,144 @@ def get_job_results(job_id):
         
     except Exception as e:
         print(f"Error executing job: {str(e)}")
-        job['status'] = 'error'
-        job['error'] = {
+        error = {
             'code': 'InternalServerError',
             'message': str(e),
             'status_code': 500
         }
-        return jsonify(job['error']), job['error']['status_code']
+        job_store.update(job_id, {'status': 'error', 'error': error, 'updated': now_iso()})
+        return jsonify(error), error['status_code']
+
+# Endpunkt für den Download einer Ergebnisdatei
+@app.route('/jobs/<job_id>/results/<filename>', methods=['GET'])
+def download_job_result(job_id, filename):
+    """Liefere eine Ergebnisdatei eines fertigen Jobs aus"""
+    job = job_store.get(job_id)
+    if not job or job['status'] != 'finished':
+        return jsonify({"error": f"No results for job {job_id}"}), 404
+
+    path = result_store.file_path(job_id, filename)
+    if path is None:
+        return jsonify({"error": f"Result file {filename} not found"}), 404
+
+    # Range-Anfragen und If-Range (Fortsetzen abgebrochener Downloads) über die Prüfsumme als ETag
+    return send_file(
+        path,
+        mimetype=job['result']['type'],
+        conditional=True,
+        etag=job['result']['checksum'].split(':', 1)[1]
+    )
+
+# Endpunkt für das direkte Durchreichen der Rasdaman-Antwort
+@app.route('/jobs/<job_id>/stream', methods=['GET'])
+def stream_job_result(job_id):
+    """
+    Reiche die Rasdaman-Antwort eines Jobs blockweise an den Client durch.
+
+    Die Daten werden weder gepuffert noch gespeichert, der Speicherbedarf
+    bleibt unabhängig von der Coverage-Größe bei einem Block. Ein Range-Header
+    wird an Rasdaman weitergegeben; ignoriert Rasdaman ihn oder fehlt der
+    Content-Range seiner 206-Antwort, wird der Bereich beim Durchreichen
+    ausgeschnitten.
+    """
+    job = job_store.get(job_id)
+    if not job:
+        return jsonify({"error": f"Job {job_id} not found"}), 404
+
+    try:
+        query, media_type = build_job_query(job)
+    except ProcessGraphError as e:
+        return jsonify({"error": f"Invalid process graph: {e}"}), 400
+
+    byte_range = parse_range_header(request.headers.get('Range'))
+    # Ohne Kompression stimmen Content-Length und Byte-Bereiche mit den ausgelieferten Daten überein
+    upstream_headers = {'Accept-Encoding': 'identity'}
+    if byte_range:
+        upstream_headers['Range'] = request.headers['Range']
+
+    upstream = process_coverages(query, stream=True, headers=upstream_headers)
+    if upstream.status_code == 206 and not parse_content_range(upstream.headers.get('Content-Range')):
+        # Ohne gültigen Content-Range ist unklar, welche Bytes die Antwort enthält:
+        # vollständig neu anfordern und den Bereich selbst ausschneiden
+        upstream.close()
+        upstream = process_coverages(query, stream=True, headers={'Accept-Encoding': 'identity'})
+    if upstream.status_code not in (200, 206):
+        error = upstream.text
+        upstream.close()
+        return jsonify({"error": error}), 502
+
+    headers = {
+        'Content-Type': media_type,
+        'Accept-Ranges': 'bytes'
+    }
+    total = upstream.headers.get('Content-Length')
+    chunks = upstream.iter_content(chunk_size=RESULT_CHUNK_SIZE)
+    status = 200
+
+    if upstream.status_code == 206:
+        status = 206
+        headers['Content-Range'] = upstream.headers['Content-Range']
+        if total is not None:
+            headers['Content-Length'] = total
+    elif byte_range and total is not None:
+        # Rasdaman ignoriert den Range-Header: Bereich selbst ausschneiden
+        total = int(total)
+        start, end = byte_range
+        if start >= total:
+            upstream.close()
+            return '', 416, {'Content-Range': f'bytes */{total}'}
+        end = total - 1 if end is None else min(end, total - 1)
+        status = 206
+        headers['Content-Range'] = f'bytes {start}-{end}/{total}'
+        headers['Content-Length'] = str(end - start + 1)
+        chunks = iter_byte_range(chunks, start, end)
+    elif total is not None and not byte_range:
+        headers['Content-Length'] = total
+    # Range ohne bekannte Gesamtgröße: vollständige Antwort mit Status 200
+
+    return relay_response(upstream, chunks, status, headers)
+
+def relay_response(upstream, chunks, status, headers):
+    """Flask-Response, die die Blöcke einer Rasdaman-Antwort durchreicht und sie danach schließt"""
+    def generate():
+        try:
+            for chunk in chunks:
+                yield chunk
+        finally:
+            upstream.close()
+
+    return Response(generate(), status=status, headers=headers)
+
+# Endpunkt für die synchrone Verarbeitung eines Prozessgraphen
+@app.route('/result', methods=['POST'])
+def process_result():
+    """Übersetze den Prozessgraphen in eine WCPS-Query und liefere das Ergebnis direkt aus"""
+    body = request.get_json(silent=True) or {}
+    process_graph = body.get('process', {}).get('process_graph')
+
+    try:
+        query, media_type = compile_process_graph(process_graph)
+    except ProcessGraphError as e:
+        return jsonify({"error": str(e)}), 400
+
+    print(f"Compiled WCPS query: {query}")
+
+    upstream = process_coverages(query, stream=True, headers={'Accept-Encoding': 'identity'})
+    if upstream.status_code != 200:
+        error = upstream.text
+        upstream.close()
+        # Fehlerhafte Queries meldet Rasdaman mit 4xx, alles andere ist ein Backend-Fehler
+        return jsonify({"error": error}), 400 if 400 <= upstream.status_code < 500 else 502
+
+    headers = {'Content-Type': media_type}
+    if 'Content-Length' in upstream.headers:
+        headers['Content-Length'] = upstream.headers['Content-Length']
+
+    return relay_response(upstream, upstream.iter_content(chunk_size=RESULT_CHUNK_SIZE), 200, headers)
 
 # Debug-Modus (automatischer Reload der app.py nach Änderung)
 # if __name__ == '__main__':
 #     app.run(debug=True, port=5000)
 
 if __name__ == '__main__':
-    app.run(debug=False, port=5000, use_reloader=False)
\ No newline at end of file
+    app.run(debug=False, port=5000, use_reloader=False, threaded=True)
\ No newline at end of file
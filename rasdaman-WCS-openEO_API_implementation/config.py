@@ -1,5 +1,8 @@
+import os
+
 # Rasdaman Konfiguration
-RASDAMAN_URL = "http://localhost:8080/rasdaman/ows"
+# Über die Umgebung überschreibbar, z.B. für den Mock-Server aus performance_tests_WSL/mock_rasdaman.py
+RASDAMAN_URL = os.environ.get("RASDAMAN_URL", "http://localhost:8080/rasdaman/ows")
 RASDAMAN_USER = "rasadmin"  # Falls benötigt
 RASDAMAN_PASS = "rasadmin"   # Falls benötigt
 
@@ -7,4 +10,45 @@ RASDAMAN_PASS = "rasadmin"   # Falls benötigt
 OPENEO_VERSION = "1.2.0"
 BACKEND_VERSION = "0.1.0"
 API_TITLE = "Rasdaman OpenEO Backend"
-API_PORT = 5000
\ No newline at end of file
+API_PORT = 5000
+
+# Capabilities-Cache Konfiguration
+CAPABILITIES_TTL = 300  # Sekunden, bis das GetCapabilities-Dokument als veraltet gilt
+
+# HTTP-Verbindungen zu Rasdaman
+RASDAMAN_POOL_SIZE = 10  # Maximale Anzahl offener Keep-Alive-Verbindungen
+RASDAMAN_CONNECT_TIMEOUT = 5  # Sekunden
+RASDAMAN_READ_TIMEOUT = 300  # Sekunden, große GetCoverage-Anfragen brauchen lange
+RASDAMAN_RETRIES = 3
+RASDAMAN_RETRY_BACKOFF = 0.5  # Sekunden, verdoppelt sich mit jedem Versuch
+
+# Job-Ausführung
+JOB_WORKERS = 4  # Anzahl parallel laufender Batch-Jobs
+MAX_JOBS_PER_USER = 2  # Maximale Anzahl wartender oder laufender Jobs pro Nutzer
+JOB_CANCEL_TIMEOUT = 30  # Sekunden, die das Löschen eines Jobs auf das Ende seiner Ausführung wartet
+JOB_LEASE_SECONDS = 60  # Ohne Verlängerung gilt ein wartender oder laufender Job danach als verwaist
+
+# Ablage der Job-Ergebnisse
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+RESULT_CHUNK_SIZE = 1024 * 1024  # Bytes pro gelesenem Block der Rasdaman-Antwort
+
+# Persistente Ablage von Jobs und Prozessgraphen (SQLite, von allen Worker-Prozessen geteilt)
+DATABASE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "openeo.db")
+DATABASE_TIMEOUT = 30  # Sekunden, die auf eine Schreibsperre gewartet wird
+
+# Paginierung von GET /jobs und GET /process_graphs
+DEFAULT_PAGE_LIMIT = 100  # Einträge pro Seite, wenn der Client kein limit angibt
+MAX_PAGE_LIMIT = 1000
+
+# Auflösungspyramiden (Ingestion: performance_tests_WSL/pyramid.py)
+# Collection -> native Auflösung der Lat/Long-Achsen in Grad und gröbere Stufen
+# als eigene Coverages mit ihrem Skalierungsfaktor (jeder n-te Gitterpunkt)
+PYRAMIDS = {
+    "era5_weekly": {
+        "resolution": 0.25,
+        "levels": {
+            "era5_weekly_1deg": 4,
+            "era5_weekly_4deg": 16
+        }
+    }
+}
@@ -1,5 +1,7 @@
+import os
 import requests
-from typing import Optional, Dict, Any, Union
+from typing import Optional, Dict, Any, Union, Iterator, List
+from urllib.parse import urlparse, parse_qs
 from datetime import datetime, timedelta
 
 class OpenEOClient:
@@ -18,7 +20,8 @@ class OpenEOClient:
         self, 
         endpoint: str, 
         method: str = 'GET', 
-        data: Optional[Dict[str, Any]] = None
+        data: Optional[Dict[str, Any]] = None,
+        params: Optional[Dict[str, Any]] = None
     ) -> Optional[Dict[str, Any]]:
         """
         Make HTTP request to OpenEO API
@@ -27,6 +30,7 @@ class OpenEOClient:
             endpoint (str): API endpoint
             method (str): HTTP method (GET, POST, DELETE, PATCH)
             data (dict, optional): Data to send with request
+            params (dict, optional): Query parameters
             
         Returns:
             dict: Response data or None if request fails
@@ -34,7 +38,7 @@ class OpenEOClient:
         url = f"{self.base_url}/{endpoint.lstrip('/')}"
         
         try:
-            response = requests.request(method=method, url=url, json=data)
+            response = requests.request(method=method, url=url, json=data, params=params)
             response.raise_for_status()
             return response.json() if response.content else None
             
@@ -54,9 +58,44 @@ class OpenEOClient:
         """Get available processes"""
         return self.make_request('processes')
 
-    def get_jobs(self) -> Dict[str, Any]:
-        """Get all jobs"""
-        return self.make_request('jobs')
+    def get_jobs(
+        self,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+        fields: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """
+        Get one page of jobs
+        
+        Args:
+            limit (int, optional): Maximum number of jobs on the page
+            cursor (str, optional): Cursor of the page, taken from the previous page's next link
+            fields (list, optional): Job fields to return (id is always included)
+        """
+        return self.make_request('jobs', params=list_params(limit, cursor, fields))
+
+    def iter_jobs(self, page_size: int = 100, fields: Optional[List[str]] = None) -> Iterator[Dict[str, Any]]:
+        """Iterate over all jobs, fetching the next page only when it is needed"""
+        return self.iter_pages('jobs', 'jobs', page_size, fields)
+
+    def get_process_graphs(
+        self,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+        fields: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """Get one page of user-defined process graphs (see get_jobs)"""
+        return self.make_request('process_graphs', params=list_params(limit, cursor, fields))
+
+    def iter_pages(self, endpoint: str, key: str, page_size: int, fields: Optional[List[str]] = None) -> Iterator[Dict[str, Any]]:
+        """Iterate over the entries of a paginated list endpoint by following its next links"""
+        cursor = None
+        while True:
+            page = self.make_request(endpoint, params=list_params(page_size, cursor, fields)) or {}
+            yield from page.get(key, [])
+            cursor = next_cursor(page)
+            if cursor is None:
+                return
 
     def create_job(
         self,
@@ -100,6 +139,18 @@ class OpenEOClient:
         
         return self.make_request('jobs', method='POST', data=job_data)
 
+    def compute_result(self, process_graph: Dict[str, Any]) -> Any:
+        """
+        Process a graph synchronously via POST /result
+        
+        Args:
+            process_graph (dict): openEO process graph with a save_result node
+            
+        Returns:
+            Decoded JSON result (requires save_result format "json")
+        """
+        return self.make_request('result', method='POST', data={"process": {"process_graph": process_graph}})
+
     def start_job(self, job_id: str) -> Dict[str, Any]:
         """Start specific job"""
         return self.make_request(f'jobs/{job_id}/results', method='POST')
@@ -112,6 +163,39 @@ class OpenEOClient:
         """Delete specific job"""
         return self.make_request(f'jobs/{job_id}', method='DELETE') is None
 
+    def download_file(self, url: str, path: str, chunk_size: int = 1024 * 1024) -> int:
+        """
+        Download a result file in chunks, resuming a partial download
+        
+        Args:
+            url (str): Asset URL (e.g. from get_job_results)
+            path (str): Local target file
+            chunk_size (int): Bytes per chunk written to disk
+            
+        Returns:
+            int: Size of the local file in bytes
+        """
+        offset = os.path.getsize(path) if os.path.exists(path) else 0
+        headers = {'Range': f'bytes={offset}-'} if offset else {}
+        
+        try:
+            with requests.get(url, headers=headers, stream=True) as response:
+                if response.status_code == 416:
+                    # Local file is already complete
+                    return offset
+                response.raise_for_status()
+                
+                # Server ignored the range: start over
+                mode = 'ab' if response.status_code == 206 else 'wb'
+                with open(path, mode) as file:
+                    for chunk in response.iter_content(chunk_size=chunk_size):
+                        file.write(chunk)
+                        
+        except requests.exceptions.RequestException as e:
+            raise OpenEOApiError(f"Download failed: {str(e)}")
+            
+        return os.path.getsize(path)
+
 
 class OpenEOApiError(Exception):
     """Custom exception for OpenEO API errors"""
@@ -119,6 +203,28 @@ class OpenEOApiError(Exception):
 
 
 # Utility functions that can be used by both CLI and GUI
+def list_params(
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    fields: Optional[List[str]] = None
+) -> Dict[str, Any]:
+    """Query parameters of a paginated list request"""
+    params = {}
+    if limit is not None:
+        params['limit'] = limit
+    if cursor:
+        params['cursor'] = cursor
+    if fields:
+        params['fields'] = ','.join(fields)
+    return params
+
+def next_cursor(page: Dict[str, Any]) -> Optional[str]:
+    """Cursor of the next page from the "next" link of a list response, None on the last page"""
+    for link in page.get('links', []):
+        if link.get('rel') == 'next':
+            return parse_qs(urlparse(link['href']).query).get('cursor', [None])[0]
+    return None
+
 def format_timestamp(timestamp: str) -> str:
     """Format ISO timestamp for display"""
     try:
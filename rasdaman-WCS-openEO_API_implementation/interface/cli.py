@@ -2,7 +2,7 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 import json
-from interface import OpenEOClient, validate_spatial_extent, validate_temporal_extent
+from interface import OpenEOClient, next_cursor, validate_spatial_extent, validate_temporal_extent
 import click
 from rich.console import Console
 from rich.table import Table
@@ -73,12 +73,23 @@ def list_processes(client):
 
 @cli.command()
 @click.pass_obj
-def list_jobs(client):
-    """Liste alle Jobs"""
-    jobs = client.make_request('jobs')
-    
-    if jobs:
-        table = Table(title="Jobs")
+@click.option('--limit', default=20, type=click.IntRange(1, 1000), help='Jobs pro Seite')
+def list_jobs(client, limit):
+    """Liste alle Jobs (seitenweise)"""
+    cursor = None
+    page_number = 1
+
+    while True:
+        # Nur die angezeigten Felder laden, Prozessgraph und Ergebnis bleiben auf dem Server
+        jobs = client.get_jobs(
+            limit=limit,
+            cursor=cursor,
+            fields=['title', 'status', 'created', 'execution_time']
+        )
+        if not jobs:
+            return
+
+        table = Table(title=f"Jobs (Seite {page_number})")
         table.add_column("ID", style="cyan")
         table.add_column("Title", style="green")
         table.add_column("Status", style="yellow")
@@ -96,6 +107,11 @@ def list_jobs(client):
         
         console.print(table)
 
+        cursor = next_cursor(jobs)
+        if cursor is None or not click.confirm('Nächste Seite laden?', default=True):
+            return
+        page_number += 1
+
 def display_timestamps_paginated(timestamps, page_size=20):
     """Zeigt Zeitstempel seitenweise an"""
     total_pages = (len(timestamps) + page_size - 1) // page_size
@@ -297,6 +313,22 @@ def get_results(client, job_id):
             border_style="green"
         ))
 
+@cli.command()
+@click.pass_obj
+@click.argument('job_id')
+@click.option('--output', '-o', default=None, help='Zieldatei (Standard: Dateiname des Assets)')
+def download_results(client, job_id, output):
+    """Lade das Ergebnis eines Jobs herunter (setzt abgebrochene Downloads fort)"""
+    results = client.get_job_results(job_id)
+    asset = (results or {}).get('assets', {}).get('data')
+    if not asset:
+        console.print(f"[red]Keine Ergebnisdatei für Job {job_id} gefunden[/red]")
+        return
+
+    output = output or asset['href'].rsplit('/', 1)[-1]
+    size = client.download_file(asset['href'], output)
+    console.print(f"[green]Ergebnis gespeichert als {output} ({size} Bytes)[/green]")
+
 @cli.command()
 @click.pass_obj
 @click.argument('job_id')
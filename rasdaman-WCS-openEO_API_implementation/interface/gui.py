@@ -2,7 +2,7 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from interface import OpenEOClient
+from interface import OpenEOClient, next_cursor
 import streamlit as st
 from datetime import datetime
 import pandas as pd
@@ -11,6 +11,34 @@ import time
 from visualize_data import DataVisualizer
 import matplotlib.pyplot as plt
 
+JOBS_PAGE_SIZE = 50
+
+def load_jobs_page(client, key, fields=None):
+    """Fetch only the currently shown page of jobs, the cursors of visited pages live in the session state"""
+    cursors_key = f"{key}_cursors"
+    if cursors_key not in st.session_state:
+        st.session_state[cursors_key] = [None]
+    return client.get_jobs(
+        limit=JOBS_PAGE_SIZE,
+        cursor=st.session_state[cursors_key][-1],
+        fields=fields
+    )
+
+def show_page_navigation(key, page):
+    """Previous/next buttons for a paginated job list"""
+    cursors = st.session_state[f"{key}_cursors"]
+    cursor = next_cursor(page or {})
+    
+    col_prev, col_next = st.columns(2)
+    with col_prev:
+        if len(cursors) > 1 and st.button("Previous page", key=f"{key}_previous"):
+            cursors.pop()
+            st.rerun()
+    with col_next:
+        if cursor and st.button("Next page", key=f"{key}_next"):
+            cursors.append(cursor)
+            st.rerun()
+
 def show_jobs():
     st.header("Jobs")
     client = OpenEOClient()
@@ -29,17 +57,18 @@ def show_jobs():
         st.experimental_rerun()
     
     with st.spinner("Loading jobs..."):
-        jobs = client.make_request('jobs')
+        jobs = load_jobs_page(client, 'jobs')
     
     if jobs:
         df = pd.DataFrame(jobs.get('jobs', []))
         if not df.empty:
             styled_df = df.style.applymap(
-                lambda x: f"color: {'created': 'blue', 'running': 'orange', 'finished': 'green', 'error': 'red'}.get(x, 'black')",
+                lambda x: f"color: {'created': 'blue', 'queued': 'purple', 'running': 'orange', 'finished': 'green', 'canceled': 'gray', 'error': 'red'}.get(x, 'black')",
                 subset=['status']
             )
             
             st.dataframe(styled_df)
+            show_page_navigation('jobs', jobs)
             
             if not df.empty:
                 selected_job = st.selectbox(
@@ -187,7 +216,7 @@ def show_dashboard():
     
     with col1:
         st.subheader("Active Jobs")
-        jobs = client.make_request('jobs')
+        jobs = load_jobs_page(client, 'dashboard', fields=['title', 'status', 'created', 'updated'])
         if jobs:
             active_jobs = [job for job in jobs.get('jobs', []) if job.get('status') != 'finished']
             df = pd.DataFrame(active_jobs)
@@ -195,6 +224,7 @@ def show_dashboard():
                 st.dataframe(df)
             else:
                 st.info("No active jobs")
+            show_page_navigation('dashboard', jobs)
     
     with col2:
         st.subheader("Available Collections")
@@ -240,7 +270,7 @@ def show_jobs():
         st.rerun()
     
     with st.spinner("Loading jobs..."):
-        jobs = client.make_request('jobs')
+        jobs = load_jobs_page(client, 'jobs')
     
     if jobs:
         df = pd.DataFrame(jobs.get('jobs', []))
@@ -248,14 +278,17 @@ def show_jobs():
             def style_status(val):
                 colors = {
                     'created': 'blue',
+                    'queued': 'purple',
                     'running': 'orange',
                     'finished': 'green',
+                    'canceled': 'gray',
                     'error': 'red'
                 }
                 return f"color: {colors.get(val, 'black')}"
                 
             styled_df = df.style.applymap(style_status, subset=['status'])
             st.dataframe(styled_df)
+            show_page_navigation('jobs', jobs)
             
             selected_job = st.selectbox(
                     "Select Job",
@@ -7,7 +7,8 @@ import requests
 import click
 from rich.console import Console
 from rich.panel import Panel
-from interface import OpenEOClient
+from rich.table import Table
+from interface import OpenEOClient, OpenEOApiError
 from rasterio.io import MemoryFile
 import io
 
@@ -30,11 +31,36 @@ import io
 from rasterio.io import MemoryFile
 from datetime import datetime
 import traceback
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+# Tolerance when comparing grid spacings in degrees (0.25 * 4 is not always exactly 1.0)
+RESOLUTION_TOLERANCE = 1e-9
 
 class DataVisualizer:
-    def __init__(self, client=None):
+    def __init__(self, client=None, max_workers=4, sample_periods=10, resolution=None):
+        """
+        Args:
+            client (OpenEOClient, optional): Client for the OpenEO API
+            max_workers (int): Concurrent GeoTIFF requests when sampling (1 = sequential)
+            sample_periods (int, optional): Sampled timestamps per series, None for full resolution
+            resolution (float, optional): Degrees per pixel of spatial plots, None to derive it
+                from the plot size, 0 for the native resolution
+        """
         self.client = client or OpenEOClient()
+        self.resolution = resolution
         self.auth = ("rasadmin", "rasadmin")
+        self.max_workers = max(1, max_workers)
+        self.sample_periods = sample_periods
+        self.last_timings = []
+
+        # One keep-alive connection per worker, shared by all sampled requests
+        self.session = requests.Session()
+        self.session.auth = self.auth
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=self.max_workers, pool_block=True)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
 
     def get_job_data(self, job_id):
         """Fetch job results and metadata"""
@@ -47,9 +73,10 @@ class DataVisualizer:
             if not results:
                 raise Exception("Could not fetch job results")
 
-            data_url = results.get('assets', {}).get('data', {}).get('href')
+            # The visualization requests subsets directly from Rasdaman
+            data_url = results.get('assets', {}).get('coverage', {}).get('href')
             if not data_url:
-                raise Exception("No data URL in results")
+                raise Exception("No coverage URL in results")
 
             return data_url, job_info
 
@@ -64,49 +91,234 @@ class DataVisualizer:
             dt = timestamp
         return dt.strftime('%Y-%m-%dT%H:%M:%SZ')
 
-    def load_time_series_data(self, data_url, temporal_extent, spatial_extent):
-        """Load time series data for the given spatial region"""
+    def build_time_series_graph(self, collection_id, temporal_extent, spatial_extent, reducer='mean'):
+        """Process graph that reduces each timestamp to one value over the spatial extent"""
+        return {
+            "load_data": {
+                "process_id": "load_collection",
+                "arguments": {
+                    "id": collection_id,
+                    "spatial_extent": spatial_extent,
+                    "temporal_extent": temporal_extent
+                }
+            },
+            "aggregate": {
+                "process_id": "aggregate_spatial",
+                "arguments": {
+                    "data": {"from_node": "load_data"},
+                    "reducer": {
+                        "process_graph": {
+                            "reduce": {
+                                "process_id": reducer,
+                                "arguments": {"data": {"from_parameter": "data"}},
+                                "result": True
+                            }
+                        }
+                    }
+                }
+            },
+            "save": {
+                "process_id": "save_result",
+                "arguments": {
+                    "data": {"from_node": "aggregate"},
+                    "format": "json"
+                },
+                "result": True
+            }
+        }
+
+    def get_collection_timestamps(self, collection_id, temporal_extent):
+        """Timestamps of the collection within the temporal extent"""
+        start_time, end_time = [
+            pd.Timestamp(t) if pd.Timestamp(t).tzinfo else pd.Timestamp(t).tz_localize('UTC')
+            for t in temporal_extent
+        ]
+
+        details = self.client.get_collection_details(collection_id) or {}
+        time_values = details.get('cube:dimensions', {}).get('time', {}).get('values', [])
+        timestamps = pd.to_datetime(time_values, utc=True, errors='coerce')
+        return timestamps[(timestamps >= start_time) & (timestamps <= end_time)]
+
+    def get_timestamps(self, collection_id, temporal_extent, count):
+        """Timestamps for a series of count values within the temporal extent"""
+        timestamps = self.get_collection_timestamps(collection_id, temporal_extent)
+
+        if len(timestamps) != count:
+            start_time, end_time = pd.Timestamp(temporal_extent[0]), pd.Timestamp(temporal_extent[1])
+            # Irregular axis metadata not available: spread the values evenly
+            return pd.date_range(start=start_time, end=end_time, periods=count)
+        return timestamps
+
+    def load_time_series_data(self, collection_id, temporal_extent, spatial_extent):
+        """Load the spatial mean of every timestamp, reduced by the backend in one request"""
         try:
-            values = []
-            start_time = datetime.fromisoformat(temporal_extent[0].replace('Z', '+00:00'))
-            end_time = datetime.fromisoformat(temporal_extent[1].replace('Z', '+00:00'))
-            
-            timestamps = pd.date_range(start=start_time, end=end_time, periods=10)
-            
-            for timestamp in timestamps:
-                timestamp_str = self.format_timestamp(timestamp)
-                
-                if '?' in data_url:
-                    base_url = data_url + '&'
-                else:
-                    base_url = data_url + '?'
-                
-                modified_url = (
-                    f"{base_url}FORMAT=image/tiff&"
-                    f"SUBSET=ansi(\"{timestamp_str}\")&"
-                    f"SUBSET=Lat({spatial_extent['south']},{spatial_extent['north']})&"
-                    f"SUBSET=Long({spatial_extent['west']},{spatial_extent['east']})"
-                )
-                
-                response = requests.get(modified_url, auth=self.auth)
-                
-                if response.status_code != 200:
-                    raise Exception(f"HTTP Error {response.status_code}: {response.text[:500]}")
+            values = self.client.compute_result(
+                self.build_time_series_graph(collection_id, temporal_extent, spatial_extent)
+            )
+            if not isinstance(values, list):
+                values = [values]
+            timestamps = self.get_timestamps(collection_id, temporal_extent, len(values))
+            return timestamps, values
+
+        except OpenEOApiError:
+            raise
+        except Exception as e:
+            raise Exception(f"Error loading time series data: {str(e)}")
+
+    def build_coverage_url(self, data_url, timestamp, spatial_extent):
+        """GetCoverage URL for one timestamp of the spatial extent as GeoTIFF"""
+        if '?' in data_url:
+            base_url = data_url + '&'
+        else:
+            base_url = data_url + '?'
+
+        return (
+            f"{base_url}FORMAT=image/tiff&"
+            f"SUBSET=ansi(\"{self.format_timestamp(timestamp)}\")&"
+            f"SUBSET=Lat({spatial_extent['south']},{spatial_extent['north']})&"
+            f"SUBSET=Long({spatial_extent['west']},{spatial_extent['east']})"
+        )
+
+    def fetch_mean_value(self, url):
+        """Download one GeoTIFF and reduce it to its mean, timing both phases"""
+        start = time.perf_counter()
+        response = self.session.get(url)
+        downloaded = time.perf_counter()
+
+        if response.status_code != 200:
+            raise Exception(f"HTTP Error {response.status_code}: {response.text[:500]}")
 
-                with MemoryFile(io.BytesIO(response.content)) as memfile:
-                    with memfile.open() as dataset:
-                        data = dataset.read(1)
-                        mean_value = np.nanmean(data)
-                        values.append(mean_value)
+        with MemoryFile(io.BytesIO(response.content)) as memfile:
+            with memfile.open() as dataset:
+                data = dataset.read(1)
+                mean_value = np.nanmean(data)
+        decoded = time.perf_counter()
+
+        return mean_value, {
+            'download': downloaded - start,
+            'decode': decoded - downloaded,
+            'total': decoded - start,
+            'bytes': len(response.content)
+        }
+
+    def load_time_series_data_sampled(self, data_url, temporal_extent, spatial_extent, timestamps=None, periods=10):
+        """
+        Load time series data for the given spatial region from sampled GeoTIFFs
+        
+        Requests run on a bounded thread pool. Each worker decodes its GeoTIFF
+        right after downloading it, so decoding overlaps with the downloads of
+        the other workers. Values are returned in timestamp order.
+        
+        Args:
+            data_url (str): WCS GetCoverage URL of the collection
+            temporal_extent (list): Start and end timestamp
+            spatial_extent (dict): west, east, north, south
+            timestamps (list, optional): Timestamps to fetch (e.g. all collection timestamps)
+            periods (int): Evenly spaced timestamps if timestamps is not given
+        """
+        try:
+            if timestamps is None:
+                start_time = datetime.fromisoformat(temporal_extent[0].replace('Z', '+00:00'))
+                end_time = datetime.fromisoformat(temporal_extent[1].replace('Z', '+00:00'))
+                timestamps = pd.date_range(start=start_time, end=end_time, periods=periods)
+
+            urls = [self.build_coverage_url(data_url, timestamp, spatial_extent) for timestamp in timestamps]
+
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                # map keeps the order of the timestamps
+                results = list(executor.map(self.fetch_mean_value, urls))
+            wall_time = time.perf_counter() - start
+
+            values = [value for value, _ in results]
+            self.last_timings = [
+                dict(timing, timestamp=self.format_timestamp(timestamp))
+                for timestamp, (_, timing) in zip(timestamps, results)
+            ]
+            self.report_timings(wall_time)
 
             return timestamps, values
 
         except Exception as e:
             raise Exception(f"Error loading time series data: {str(e)}")
 
-    def load_geotiff_data(self, data_url, temporal_extent):
-        """Load GeoTIFF data for spatial visualization"""
+    def report_timings(self, wall_time):
+        """Print per-request timings of the last sampled series and the speedup from concurrency"""
+        table = Table(title=f"GeoTIFF requests ({self.max_workers} workers)")
+        table.add_column("Timestamp", style="cyan")
+        table.add_column("Download [s]", justify="right")
+        table.add_column("Decode [s]", justify="right")
+        table.add_column("Bytes", justify="right")
+
+        for timing in self.last_timings:
+            table.add_row(
+                timing['timestamp'],
+                f"{timing['download']:.3f}",
+                f"{timing['decode']:.3f}",
+                str(timing['bytes'])
+            )
+        console.print(table)
+
+        sequential_time = sum(timing['total'] for timing in self.last_timings)
+        speedup = sequential_time / wall_time if wall_time > 0 else 0
+        console.print(
+            f"{len(self.last_timings)} requests in {wall_time:.3f} s "
+            f"(sum of request times {sequential_time:.3f} s, speedup {speedup:.1f}x)"
+        )
+
+    def select_coverage(self, collection_id, resolution):
+        """
+        Coarsest pyramid level of the collection whose grid spacing is at most resolution
+
+        The levels come from the collection metadata of the backend
+        (summaries.pyramid_levels). Without levels, or if none is coarse
+        enough, the collection itself is read.
+        """
+        if not collection_id or not resolution:
+            return collection_id
+
+        details = self.client.get_collection_details(collection_id) or {}
+        levels = details.get('summaries', {}).get('pyramid_levels', [])
+        selected = collection_id
+        for level in sorted(levels, key=lambda level: level['resolution']):
+            if level['resolution'] <= resolution + RESOLUTION_TOLERANCE:
+                selected = level['coverage_id']
+        return selected
+
+    def plot_resolution(self, ax, extent):
+        """Degrees per screen pixel of the axes the map is drawn into"""
+        if self.resolution is not None:
+            return self.resolution
+        bbox = ax.get_window_extent()
+        west, east, south, north = extent
+        return min(abs(east - west) / bbox.width, abs(north - south) / bbox.height)
+
+    def coverage_url(self, data_url, coverage_id):
+        """The GetCoverage URL of the job with another coverage (pyramid level)"""
+        parts = urlsplit(data_url)
+        params = [
+            (key, coverage_id if key.lower() == 'coverageid' else value)
+            for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        ]
+        return urlunsplit(parts._replace(query=urlencode(params)))
+
+    def load_geotiff_data(self, data_url, temporal_extent, collection_id=None, resolution=None):
+        """
+        Load GeoTIFF data for spatial visualization
+
+        Args:
+            data_url (str): WCS GetCoverage URL of the collection
+            temporal_extent (list): Start and end timestamp, the start is plotted
+            collection_id (str, optional): Collection of the job, needed to select a pyramid level
+            resolution (float, optional): Degrees per pixel that are still visible, the
+                coarsest pyramid level satisfying it is requested instead of the collection
+        """
         try:
+            coverage_id = self.select_coverage(collection_id, resolution)
+            if coverage_id != collection_id:
+                console.print(f"Reading pyramid level {coverage_id} ({resolution:.3f} degrees per pixel requested)")
+                data_url = self.coverage_url(data_url, coverage_id)
+
             if '?' in data_url:
                 base_url = data_url + '&'
             else:
@@ -145,8 +357,6 @@ class DataVisualizer:
             
             if not temporal_extent:
                 raise Exception("No temporal extent found in job info")
-            
-            data, transform, crs = self.load_geotiff_data(data_url, temporal_extent)
 
             fig, ax = plt.subplots(figsize=(12, 8))
             
@@ -157,6 +367,12 @@ class DataVisualizer:
                 spatial_extent.get('north', 90)
             ]
 
+            # Overviews do not need more pixels than the axes can show
+            collection_id = load_data.get('id', job_info.get('collection_id'))
+            data, transform, crs = self.load_geotiff_data(
+                data_url, temporal_extent, collection_id, self.plot_resolution(ax, extent)
+            )
+
             im = ax.imshow(data, extent=extent, cmap='viridis')
             plt.colorbar(im, ax=ax, label='Value')
             
@@ -184,10 +400,23 @@ class DataVisualizer:
             if not temporal_extent:
                 raise Exception("No temporal extent found in job info")
             
-            timestamps, values = self.load_time_series_data(data_url, temporal_extent, spatial_extent)
+            collection_id = load_data.get('id', job_info.get('collection_id'))
+            try:
+                timestamps, values = self.load_time_series_data(collection_id, temporal_extent, spatial_extent)
+            except OpenEOApiError as e:
+                # Backend without server-side reduction: sample the series on the client
+                console.print(f"[yellow]Server-side reduction failed ({str(e)}), sampling GeoTIFFs instead[/yellow]")
+                sampled_timestamps = None
+                if self.sample_periods is None:
+                    sampled_timestamps = self.get_collection_timestamps(collection_id, temporal_extent)
+                timestamps, values = self.load_time_series_data_sampled(
+                    data_url, temporal_extent, spatial_extent,
+                    timestamps=sampled_timestamps, periods=self.sample_periods
+                )
 
             fig, ax = plt.subplots(figsize=(12, 6))
-            ax.plot(timestamps, values, marker='o')
+            # Full temporal resolution: only mark the points of short series
+            ax.plot(timestamps, values, marker='o' if len(values) <= 50 else None)
             
             ax.set_title(f'Time Series Analysis - Job {job_id}')
             ax.set_xlabel('Time')
@@ -209,10 +438,17 @@ def cli():
 @click.argument('job_id')
 @click.option('--type', type=click.Choice(['timeseries', 'spatial']), 
               default='spatial', help='Art der Visualisierung')
-def visualize(job_id, type):
+@click.option('--workers', type=int, default=4,
+              help='Parallele GeoTIFF-Anfragen beim Sampling (1 = sequentiell)')
+@click.option('--periods', type=int, default=10,
+              help='Anzahl gesampelter Zeitpunkte (0 = volle zeitliche Auflösung)')
+@click.option('--resolution', type=float, default=None,
+              help='Grad pro Pixel der Karte, wählt die gröbste passende Pyramidenstufe '
+                   '(Standard: aus der Bildgröße, 0 = native Auflösung)')
+def visualize(job_id, type, workers, periods, resolution):
     """Visualisiere die Ergebnisse eines Jobs"""
     try:
-        visualizer = DataVisualizer()
+        visualizer = DataVisualizer(max_workers=workers, sample_periods=periods or None, resolution=resolution)
         
         if type == 'timeseries':
             visualizer.visualize_time_series(job_id)
@@ -0,0 +1,119 @@
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from config import (
+    RASDAMAN_URL,
+    RASDAMAN_USER,
+    RASDAMAN_PASS,
+    RASDAMAN_POOL_SIZE,
+    RASDAMAN_CONNECT_TIMEOUT,
+    RASDAMAN_READ_TIMEOUT,
+    RASDAMAN_RETRIES,
+    RASDAMAN_RETRY_BACKOFF
+)
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def create_session(
+    pool_size=RASDAMAN_POOL_SIZE,
+    retries=RASDAMAN_RETRIES,
+    backoff=RASDAMAN_RETRY_BACKOFF
+):
+    """
+    Erstelle eine Session mit Verbindungspool, Keep-Alive und Retry-with-Backoff.
+
+    Der Pool blockiert, wenn alle Verbindungen belegt sind, statt zusätzliche
+    Verbindungen zu öffnen. So bleibt die Anzahl der Sockets zu Rasdaman auch
+    bei einer Flask-App mit vielen Threads begrenzt.
+    """
+    # Rasdaman-Anfragen sind lesend, daher darf auch ProcessCoverages per POST wiederholt werden
+    retry = Retry(
+        total=retries,
+        connect=retries,
+        read=retries,
+        backoff_factor=backoff,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=frozenset(['GET', 'HEAD', 'POST']),
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=pool_size,
+        pool_block=True,
+        max_retries=retry
+    )
+
+    session = requests.Session()
+    session.auth = (RASDAMAN_USER, RASDAMAN_PASS)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def get_session():
+    """Gemeinsame Session für alle Anfragen an Rasdaman (wird beim ersten Zugriff angelegt)"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = create_session()
+    return _session
+
+
+def rasdaman_request(method, params=None, data=None, stream=False, timeout=None, headers=None):
+    """
+    Sende eine Anfrage an den Rasdaman OWS-Endpunkt über den Verbindungspool
+
+    Args:
+        method (str): HTTP-Methode (GET oder POST)
+        params (dict, optional): Query-Parameter
+        data (dict, optional): Formular-Daten (z.B. lange WCPS-Queries)
+        stream (bool): Antwort nicht sofort vollständig laden
+        timeout (tuple, optional): (connect, read) in Sekunden
+        headers (dict, optional): Zusätzliche HTTP-Header
+    """
+    if timeout is None:
+        timeout = (RASDAMAN_CONNECT_TIMEOUT, RASDAMAN_READ_TIMEOUT)
+
+    return get_session().request(
+        method,
+        RASDAMAN_URL,
+        params=params,
+        data=data,
+        stream=stream,
+        timeout=timeout,
+        headers=headers
+    )
+
+
+def rasdaman_get(params, **kwargs):
+    """GET-Anfrage an Rasdaman (siehe rasdaman_request)"""
+    return rasdaman_request('GET', params=params, **kwargs)
+
+
+def rasdaman_post(params=None, data=None, **kwargs):
+    """POST-Anfrage an Rasdaman (siehe rasdaman_request)"""
+    return rasdaman_request('POST', params=params, data=data, **kwargs)
+
+
+def process_coverages(query, **kwargs):
+    """
+    Führe eine WCPS-Query über WCS ProcessCoverages aus
+
+    Die Query wird als Formular-Daten gesendet, da lange Queries die
+    maximale URL-Länge überschreiten können.
+    """
+    return rasdaman_post(
+        data={
+            'SERVICE': 'WCS',
+            'VERSION': '2.0.1',
+            'REQUEST': 'ProcessCoverages',
+            'QUERY': query
+        },
+        **kwargs
+    )
@@ -0,0 +1,159 @@
+import threading
+import time
+
+from lxml import etree
+
+from config import RASDAMAN_URL, CAPABILITIES_TTL
+from openeo.backend import rasdaman_get
+
+# Namespaces des WCS GetCapabilities-Dokuments
+NAMESPACES = {
+    'wcs': 'http://www.opengis.net/wcs/2.0',
+    'ows': 'http://www.opengis.net/ows/2.0'
+}
+
+
+def fetch_capabilities():
+    """Sende einen WCS GetCapabilities Request an Rasdaman und parse die Antwort"""
+    params = {
+        'SERVICE': 'WCS',
+        'VERSION': '2.0.1',
+        'REQUEST': 'GetCapabilities'
+    }
+
+    print(f"Sending request to: {RASDAMAN_URL}")
+    print(f"With parameters: {params}")
+
+    response = rasdaman_get(params)
+
+    print(f"Response status code: {response.status_code}")
+
+    if response.status_code != 200:
+        if response.status_code == 401:
+            print("Authentication failed. Please check username and password.")
+        raise RuntimeError(f"Rasdaman returned status code {response.status_code}")
+
+    return parse_capabilities(response.content)
+
+
+def parse_capabilities(content):
+    """Extrahiere Coverages, Formate und Operationen aus einem GetCapabilities-Dokument"""
+    root = etree.fromstring(content)
+
+    coverage_ids = [coverage.text for coverage in root.xpath('//wcs:CoverageId', namespaces=NAMESPACES)]
+    formats = [
+        format_element.text
+        for format_element in root.xpath('//wcs:ServiceMetadata/wcs:formatSupported', namespaces=NAMESPACES)
+    ]
+    operations = [operation.get('name') for operation in root.xpath('//ows:Operation', namespaces=NAMESPACES)]
+
+    print(f"Found {len(coverage_ids)} coverages")
+
+    return {
+        "coverage_ids": coverage_ids,
+        "formats": formats,
+        "operations": operations
+    }
+
+
+class CapabilitiesCache:
+    """
+    Gemeinsamer Cache für das geparste GetCapabilities-Dokument.
+
+    Innerhalb der TTL wird das Dokument direkt ausgeliefert. Ist es veraltet,
+    wird weiterhin die alte Version ausgeliefert und im Hintergrund neu geladen
+    (stale-while-revalidate). Nur wenn noch gar kein Dokument vorliegt, wird
+    synchron geladen.
+    """
+
+    def __init__(self, ttl=CAPABILITIES_TTL, fetcher=fetch_capabilities):
+        self.ttl = ttl
+        self.fetcher = fetcher
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._capabilities = None
+        self._fetched_at = 0.0
+        self._refreshing = False
+
+        # Zähler für /capabilities_cache
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.errors = 0
+
+    def get(self):
+        """Liefere das geparste Capabilities-Dokument (wirft eine Exception, falls keins geladen werden kann)"""
+        with self._lock:
+            if self._capabilities is not None:
+                if time.monotonic() - self._fetched_at < self.ttl:
+                    self.hits += 1
+                else:
+                    self.stale_hits += 1
+                    self._start_refresh()
+                return self._capabilities
+            self.misses += 1
+
+        # Cache ist leer: synchron laden, parallele Anfragen warten auf denselben Request
+        with self._load_lock:
+            with self._lock:
+                if self._capabilities is not None:
+                    return self._capabilities
+            return self._load()
+
+    def invalidate(self):
+        """Verwerfe das gecachte Dokument, der nächste Zugriff lädt neu"""
+        with self._lock:
+            self._capabilities = None
+            self._fetched_at = 0.0
+
+    def stats(self):
+        """Zähler und Alter des gecachten Dokuments"""
+        with self._lock:
+            age = time.monotonic() - self._fetched_at if self._capabilities is not None else None
+            return {
+                "ttl": self.ttl,
+                "age": age,
+                "cached": self._capabilities is not None,
+                "refreshing": self._refreshing,
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "refreshes": self.refreshes,
+                "errors": self.errors
+            }
+
+    def _load(self):
+        try:
+            capabilities = self.fetcher()
+        except Exception:
+            with self._lock:
+                self.errors += 1
+            raise
+
+        with self._lock:
+            self._capabilities = capabilities
+            self._fetched_at = time.monotonic()
+            self.refreshes += 1
+        return capabilities
+
+    def _start_refresh(self):
+        # Muss mit gehaltenem self._lock aufgerufen werden
+        if self._refreshing:
+            return
+        self._refreshing = True
+        threading.Thread(target=self._refresh, name="capabilities-refresh", daemon=True).start()
+
+    def _refresh(self):
+        try:
+            with self._load_lock:
+                self._load()
+        except Exception as e:
+            # Veraltetes Dokument bleibt bis zum nächsten erfolgreichen Refresh gültig
+            print(f"Error refreshing capabilities: {e}")
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+
+capabilities_cache = CapabilitiesCache()
@@ -0,0 +1,266 @@
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, wait as wait_futures
+from datetime import datetime, timedelta, timezone
+
+from config import JOB_WORKERS, MAX_JOBS_PER_USER, JOB_CANCEL_TIMEOUT, JOB_LEASE_SECONDS
+
+
+class JobLimitExceeded(Exception):
+    """Der Nutzer hat bereits die maximale Anzahl wartender oder laufender Jobs"""
+    pass
+
+
+class JobCanceled(Exception):
+    """Wird von der Job-Funktion geworfen, wenn der Job abgebrochen wurde"""
+    pass
+
+
+# Status, in denen ein Job wartet oder läuft bzw. neu gestartet werden kann
+ACTIVE_STATUSES = ('queued', 'running')
+STARTABLE_STATUSES = ('created', 'finished', 'error', 'canceled')
+# Ein abgebrochener Job verlässt canceled nur über einen Neustart (submit)
+UNCANCELED_STATUSES = ('created',) + ACTIVE_STATUSES + ('finished', 'error')
+
+
+def now_iso(offset=0):
+    """
+    Aktueller Zeitpunkt (UTC) im Format der Job-Zeitstempel
+
+    Das Format hat eine feste Länge, Zeitstempel lassen sich daher auch als
+    Text vergleichen (Ablauf der Leases).
+
+    Args:
+        offset (float): Sekunden, die auf den aktuellen Zeitpunkt addiert werden
+    """
+    moment = datetime.now(timezone.utc) + timedelta(seconds=offset)
+    return moment.strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+class StoreCancelEvent(threading.Event):
+    """
+    Abbruch-Event, das zusätzlich den Status des Jobs im Store prüft.
+
+    So bemerkt ein Job auch einen Abbruch (oder das Löschen des Jobs) aus
+    einem anderen Worker-Prozess.
+    """
+
+    def __init__(self, store, job_id):
+        super().__init__()
+        self.store = store
+        self.job_id = job_id
+
+    def is_set(self):
+        if super().is_set():
+            return True
+        return self.store.get_status(self.job_id) in ('canceled', None)
+
+
+class JobExecutor:
+    """
+    Führt Batch-Jobs in einem begrenzten Thread-Pool aus.
+
+    Ein Job durchläuft die Status queued -> running -> finished/error
+    (bzw. canceled). Die eigentliche Arbeit erledigt die übergebene Funktion
+    run_job(job, cancel_event); sie muss cancel_event regelmäßig prüfen und
+    bei gesetztem Event JobCanceled werfen.
+
+    Mit einem store (siehe openeo.store.JobStore) wird jeder Statuswechsel
+    persistiert. Ein Job kann dann über alle Prozesse hinweg nur einmal
+    eingereiht werden, und Abbrüche werden auch prozessübergreifend erkannt.
+    Das Limit pro Nutzer gilt je Prozess.
+
+    Wartende und laufende Jobs tragen im Store eine Lease (lease_expires),
+    die ein Hintergrund-Thread regelmäßig verlängert. Endet ein Prozess
+    (Neustart, Absturz), läuft die Lease seiner Jobs ab; beim Start setzt
+    der Executor solche verwaisten Jobs auf error, statt sie für immer als
+    queued/running stehen zu lassen. Jobs anderer laufender Prozesse bleiben
+    dabei unberührt.
+    """
+
+    def __init__(self, run_job, max_workers=JOB_WORKERS, max_jobs_per_user=MAX_JOBS_PER_USER, store=None,
+                 lease_seconds=JOB_LEASE_SECONDS):
+        self.run_job = run_job
+        self.store = store
+        self.max_jobs_per_user = max_jobs_per_user
+        self.lease_seconds = lease_seconds
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="openeo-job")
+        self._lock = threading.Lock()
+        self._futures = {}
+        self._cancel_events = {}
+        self._owners = {}
+        self._active_per_user = defaultdict(int)
+        self._stopped = threading.Event()
+
+        if self.store is not None:
+            self.recover_orphaned_jobs()
+            threading.Thread(target=self._renew_leases, name="openeo-job-lease", daemon=True).start()
+
+    def recover_orphaned_jobs(self):
+        """
+        Setze wartende oder laufende Jobs, deren Lease abgelaufen ist, auf error
+
+        Returns:
+            list: IDs der zurückgesetzten Jobs
+        """
+        job_ids = self.store.expire_leases(now_iso(), {
+            'status': 'error',
+            'error': "Job was interrupted by a restart of the backend, start it again",
+            'updated': now_iso()
+        })
+        for job_id in job_ids:
+            print(f"Job {job_id} was orphaned by a restart and set to error")
+        return job_ids
+
+    def submit(self, job, user):
+        """
+        Reihe einen Job zur Ausführung ein
+
+        Returns:
+            dict: Der eingereihte Job oder None, falls er bereits wartet oder läuft
+
+        Raises:
+            JobLimitExceeded: Wenn der Nutzer sein Limit erreicht hat
+        """
+        job_id = job['id']
+        with self._lock:
+            if job_id in self._futures:
+                return None
+            if self._active_per_user[user] >= self.max_jobs_per_user:
+                raise JobLimitExceeded(
+                    f"User {user} already has {self.max_jobs_per_user} queued or running jobs"
+                )
+
+            updates = {'status': 'queued', 'updated': now_iso(), 'lease_expires': now_iso(self.lease_seconds)}
+            if self.store is not None:
+                # Atomarer Statuswechsel: läuft der Job in einem anderen Prozess, schlägt er fehl
+                job = self.store.transition(job_id, STARTABLE_STATUSES, updates, remove=('error',))
+                if job is None:
+                    return None
+                cancel_event = StoreCancelEvent(self.store, job_id)
+            else:
+                job.update(updates)
+                job.pop('error', None)
+                cancel_event = threading.Event()
+
+            self._active_per_user[user] += 1
+            self._cancel_events[job_id] = cancel_event
+            self._owners[job_id] = (job, user)
+
+            self._futures[job_id] = self._pool.submit(self._run, job, user, cancel_event)
+        return job
+
+    def cancel(self, job_id, wait=False, timeout=JOB_CANCEL_TIMEOUT):
+        """
+        Breche einen wartenden oder laufenden Job ab
+
+        Args:
+            job_id (str): Job
+            wait (bool): Warte, bis die Ausführung in diesem Prozess beendet ist
+                (z.B. bevor die Ergebnisse des Jobs gelöscht werden)
+            timeout (float): Sekunden, die höchstens gewartet wird
+
+        Returns:
+            bool: True, falls der Job aktiv war
+        """
+        with self._lock:
+            future = self._futures.get(job_id)
+            cancel_event = self._cancel_events.get(job_id)
+            job, user = self._owners.get(job_id, (None, None))
+        if future is None:
+            # Job eines anderen Prozesses: der Status im Store signalisiert dort den Abbruch
+            if self.store is not None:
+                return self.store.transition(
+                    job_id, ACTIVE_STATUSES, {'status': 'canceled', 'updated': now_iso()}
+                ) is not None
+            return False
+
+        cancel_event.set()
+        # Wartende Jobs werden direkt aus der Queue entfernt, laufende brechen beim nächsten Chunk ab
+        if future.cancel():
+            self.set_status(job, 'canceled')
+            self._release(job_id, user)
+        elif wait:
+            wait_futures([future], timeout=timeout)
+        return True
+
+    def set_status(self, job, status, **fields):
+        """
+        Setze Status und weitere Felder eines Jobs und persistiere sie im Store
+
+        Ein abgebrochener (oder gelöschter) Job bleibt unverändert, ein
+        Worker kann einen Abbruch also nicht mit running/finished/error
+        überschreiben.
+
+        Returns:
+            bool: False, falls der Job abgebrochen oder gelöscht wurde
+        """
+        updates = dict(fields, status=status, updated=now_iso())
+        if self.store is not None:
+            from_statuses = UNCANCELED_STATUSES + ('canceled',) if status == 'canceled' else UNCANCELED_STATUSES
+            if self.store.transition(job['id'], from_statuses, updates) is None:
+                return False
+        elif job.get('status') == 'canceled' and status != 'canceled':
+            return False
+        job.update(updates)
+        return True
+
+    def is_active(self, job_id):
+        with self._lock:
+            return job_id in self._futures
+
+    def stats(self):
+        """Anzahl aktiver Jobs insgesamt und pro Nutzer"""
+        with self._lock:
+            return {
+                "active": len(self._futures),
+                "per_user": {user: count for user, count in self._active_per_user.items() if count}
+            }
+
+    def shutdown(self, wait=True):
+        self._stopped.set()
+        with self._lock:
+            events = list(self._cancel_events.values())
+        for cancel_event in events:
+            cancel_event.set()
+        self._pool.shutdown(wait=wait, cancel_futures=True)
+
+    def _run(self, job, user, cancel_event):
+        try:
+            if cancel_event.is_set():
+                raise JobCanceled()
+
+            if not self.set_status(job, 'running'):
+                raise JobCanceled()
+            self.run_job(job, cancel_event)
+
+        except JobCanceled:
+            self.set_status(job, 'canceled')
+            print(f"Job {job['id']} canceled")
+
+        except Exception as e:
+            print(f"Error executing job: {str(e)}")
+            self.set_status(job, 'error', error=str(e))
+
+        finally:
+            self._release(job['id'], user)
+
+    def _renew_leases(self):
+        """Verlängere die Leases der Jobs dieses Prozesses, bis der Executor beendet wird"""
+        while not self._stopped.wait(self.lease_seconds / 3):
+            with self._lock:
+                job_ids = list(self._futures)
+            if job_ids:
+                try:
+                    self.store.renew_leases(job_ids, now_iso(self.lease_seconds))
+                except Exception as e:
+                    # Ein gesperrter Store darf den Thread nicht beenden, der nächste Versuch folgt
+                    print(f"Error renewing job leases: {str(e)}")
+
+    def _release(self, job_id, user):
+        with self._lock:
+            if self._futures.pop(job_id, None) is None:
+                return
+            self._cancel_events.pop(job_id, None)
+            self._owners.pop(job_id, None)
+            self._active_per_user[user] -= 1
@@ -0,0 +1,337 @@
+from openeo.pyramid import PyramidError, parse_resolution, select_level
+from openeo.wcps import (
+    COVERAGE_AXES,
+    TEMPORAL_AXIS,
+    WcpsQuery,
+    WcpsError,
+    reduce_axes,
+    reduce_axis,
+    remaining_axes,
+    resolve_format,
+    spatial_subsets,
+    subset,
+    temporal_subsets,
+    valid_cells,
+    variable_name
+)
+
+# Arithmetische openEO-Prozesse -> WCPS-Operator
+ARITHMETIC_OPERATORS = {
+    'add': '+',
+    'subtract': '-',
+    'multiply': '*',
+    'divide': '/'
+}
+
+# Reducer in reduce_dimension/aggregate_spatial -> WCPS-Aggregation
+REDUCERS = {
+    'mean': 'avg',
+    'min': 'min',
+    'max': 'max',
+    'sum': 'add',
+    'count': 'count'
+}
+
+# Namen der Zeitdimension (openEO cube:dimensions bzw. Rasdaman-Achse)
+TEMPORAL_DIMENSIONS = ('t', 'time', TEMPORAL_AXIS)
+
+# Projektionen, die resample_spatial ohne Umprojektion erfüllt (die der Coverages)
+NATIVE_PROJECTIONS = (None, 4326, 'EPSG:4326')
+
+SUPPORTED_PROCESSES = (
+    ['load_collection', 'save_result', 'reduce_dimension', 'aggregate_spatial', 'resample_spatial']
+    + list(ARITHMETIC_OPERATORS)
+    + list(REDUCERS)
+)
+
+
+class ProcessGraphError(Exception):
+    """Der Prozessgraph kann nicht in eine WCPS-Query übersetzt werden"""
+    pass
+
+
+class WcpsCompiler:
+    """
+    Übersetzt einen openEO-Prozessgraphen in eine einzige WCPS-Query.
+
+    Jeder load_collection-Knoten wird zu einer Coverage-Variable im
+    for-Teil der Query, räumliche und zeitliche Ausschnitte zu Subsets
+    dieser Variable. Arithmetik wird zu WCPS-Ausdrücken zusammengefasst,
+    Reduktionen zu condense (reduce_dimension) bzw. Coverage-Konstruktoren
+    (aggregate_spatial) mit avg/min/max, save_result bestimmt das encode-Format. Die gesamte
+    Berechnung läuft damit in Rasdaman. resample_spatial wählt die gröbste
+    Stufe der Auflösungspyramide (config.PYRAMIDS), die die angeforderte
+    Auflösung erfüllt, so dass Übersichten nicht die native Auflösung lesen.
+
+    Zu jedem Knoten merkt sich der Compiler die Achsen, die sein Ergebnis
+    noch hat (Slices und Reduktionen entfernen Achsen). Reduktionen
+    beziehen sich nur auf vorhandene Achsen, ein Ergebnis ohne Achsen wird
+    als Skalar ohne encode abgefragt.
+    """
+
+    def __init__(self, process_graph):
+        if not isinstance(process_graph, dict) or not process_graph:
+            raise ProcessGraphError("Process graph must be a non-empty object")
+        self.process_graph = process_graph
+        self.query = WcpsQuery()
+        self.output_format = None
+        # load_collection-Knoten -> angeforderte Auflösung (Grad pro Pixel) aus resample_spatial
+        self.resolutions = {}
+        # Knoten -> Achsen seines Ergebnisses (leer: Skalar)
+        self.axes = {}
+        self._visiting = set()
+
+    def compile(self):
+        """
+        Returns:
+            tuple: (WCPS-Query, MIME-Type des Ergebnisses)
+        """
+        try:
+            result_node = self.result_node()
+            expression = self.expression(result_node)
+            if not self.axes[result_node]:
+                return self.query.build_scalar(expression)
+            return self.query.build(expression, self.output_format)
+        except WcpsError as e:
+            raise ProcessGraphError(str(e))
+
+    def result_node(self):
+        result_nodes = [node_id for node_id, node in self.process_graph.items() if node.get('result')]
+        # Jobs aus CLI und GUI bestehen nur aus einem load_data-Knoten ohne result-Flag
+        if not result_nodes and len(self.process_graph) == 1:
+            return next(iter(self.process_graph))
+        if len(result_nodes) != 1:
+            raise ProcessGraphError("Process graph must have exactly one result node")
+        return result_nodes[0]
+
+    def expression(self, node_id):
+        """WCPS-Ausdruck für den Knoten node_id, seine Achsen stehen danach in self.axes"""
+        node = self.process_graph.get(node_id)
+        if node is None:
+            raise ProcessGraphError(f"Unknown node {node_id}")
+        if node_id in self._visiting:
+            raise ProcessGraphError(f"Process graph contains a cycle at node {node_id}")
+
+        self._visiting.add(node_id)
+        try:
+            process_id = node.get('process_id')
+            arguments = node.get('arguments', {})
+
+            if process_id == 'load_collection':
+                expression, axes = self.load_collection(node_id, arguments)
+            elif process_id == 'save_result':
+                expression, axes = self.save_result(arguments)
+            elif process_id == 'reduce_dimension':
+                expression, axes = self.reduce_dimension(node_id, arguments)
+            elif process_id == 'aggregate_spatial':
+                expression, axes = self.aggregate_spatial(node_id, arguments)
+            elif process_id == 'resample_spatial':
+                expression, axes = self.resample_spatial(node_id, arguments)
+            elif process_id in ARITHMETIC_OPERATORS:
+                expression, axes = self.arithmetic(node_id, process_id, arguments)
+            else:
+                raise ProcessGraphError(f"Process {process_id} is not supported")
+        finally:
+            self._visiting.discard(node_id)
+
+        self.axes[node_id] = axes
+        return expression
+
+    def argument(self, arguments, name):
+        """
+        WCPS-Ausdruck für ein Argument (Knoten-Referenz oder Zahl)
+
+        Returns:
+            tuple: (Ausdruck, Achsen; leer für Zahlen und Skalare)
+        """
+        if name not in arguments:
+            raise ProcessGraphError(f"Missing argument {name}")
+
+        value = arguments[name]
+        if isinstance(value, dict) and 'from_node' in value:
+            expression = self.expression(value['from_node'])
+            return expression, self.axes[value['from_node']]
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return repr(value), ()
+        raise ProcessGraphError(f"Unsupported value for argument {name}: {value!r}")
+
+    def arithmetic(self, node_id, process_id, arguments):
+        x, x_axes = self.argument(arguments, 'x')
+        y, y_axes = self.argument(arguments, 'y')
+        if x_axes and y_axes and x_axes != y_axes:
+            raise ProcessGraphError(
+                f"{process_id} node {node_id}: x has the axes {', '.join(x_axes)}, y {', '.join(y_axes)}"
+            )
+        return f"({x} {ARITHMETIC_OPERATORS[process_id]} {y})", x_axes or y_axes
+
+    def load_collection(self, node_id, arguments):
+        collection_id = arguments.get('id')
+        if not collection_id:
+            raise ProcessGraphError(f"load_collection node {node_id} has no collection id")
+
+        coverage_id = select_level(collection_id, self.resolutions.get(node_id))
+        variable = self.query.coverage(node_id, coverage_id)
+        subsets = spatial_subsets(arguments.get('spatial_extent')) + temporal_subsets(arguments.get('temporal_extent'))
+        return subset(variable, subsets), remaining_axes(COVERAGE_AXES, subsets)
+
+    def resample_spatial(self, node_id, arguments):
+        """
+        Lies die Daten aus der gröbsten Pyramidenstufe, die resolution erfüllt
+
+        Es wird nicht auf die exakte Auflösung interpoliert: das Ergebnis hat
+        die Gitterweite der gewählten Stufe (höchstens resolution). Die Daten
+        müssen direkt aus load_collection kommen, da die Stufe die Coverage
+        im for-Teil der Query bestimmt.
+        """
+        data = arguments.get('data')
+        source = data.get('from_node') if isinstance(data, dict) else None
+        if self.process_graph.get(source, {}).get('process_id') != 'load_collection':
+            raise ProcessGraphError(f"resample_spatial node {node_id}: data must come directly from load_collection")
+        if arguments.get('projection') not in NATIVE_PROJECTIONS:
+            raise ProcessGraphError(
+                f"resample_spatial node {node_id}: reprojection to {arguments['projection']} is not supported"
+            )
+
+        try:
+            resolution = parse_resolution(arguments.get('resolution', 0))
+        except PyramidError as e:
+            raise ProcessGraphError(f"resample_spatial node {node_id}: {e}")
+        previous = self.resolutions.setdefault(source, resolution)
+        if previous != resolution:
+            raise ProcessGraphError(f"resample_spatial node {node_id}: {source} is already resampled to {previous}")
+        return self.argument(arguments, 'data')
+
+    def reduce_dimension(self, node_id, arguments):
+        """
+        Reduziere die Zeitdimension: ein Wert pro Gitterpunkt (Lat, Long)
+
+        Wurde die Zeitachse bereits weggeschnitten (ein einzelner Zeitpunkt),
+        ist die Reduktion dieses einen Schritts der Wert selbst, bei count
+        die Gültigkeit der Zelle.
+        """
+        dimension = arguments.get('dimension')
+        if dimension not in TEMPORAL_DIMENSIONS:
+            raise ProcessGraphError(
+                f"reduce_dimension node {node_id}: only the temporal dimension can be reduced, got {dimension}"
+            )
+
+        data, axes = self.argument(arguments, 'data')
+        function = self.reducer(node_id, arguments.get('reducer'))
+        reduced_axes = tuple(axis for axis in axes if axis != TEMPORAL_AXIS)
+        if TEMPORAL_AXIS not in axes:
+            if not axes:
+                raise ProcessGraphError(f"reduce_dimension node {node_id}: data has no dimension {dimension}")
+            return (f"(int){valid_cells(data)}" if function == 'count' else data), reduced_axes
+        return reduce_axis(data, function, TEMPORAL_AXIS, prefix=self.iterator_prefix(node_id)), reduced_axes
+
+    def aggregate_spatial(self, node_id, arguments):
+        """
+        Reduziere die räumlichen Dimensionen: ein Wert pro Zeitschritt
+
+        Ohne Zeitachse (einzelner Zeitpunkt oder zuvor zeitlich reduziert)
+        ist das Ergebnis ein Skalar.
+        """
+        data, axes = self.argument(arguments, 'data')
+        function = self.reducer(node_id, arguments.get('reducer'))
+
+        geometries = arguments.get('geometries')
+        if geometries:
+            subsets = spatial_subsets(geometry_bbox(geometries))
+            data, axes = subset(data, subsets), remaining_axes(axes, subsets)
+        if not axes:
+            raise ProcessGraphError(f"aggregate_spatial node {node_id}: data has no dimensions left")
+
+        keep_axes = [axis for axis in axes if axis == TEMPORAL_AXIS]
+        expression = reduce_axes(data, function, keep_axes, name=variable_name(node_id),
+                                 prefix=self.iterator_prefix(node_id))
+        return expression, tuple(keep_axes)
+
+    @staticmethod
+    def iterator_prefix(node_id):
+        """Präfix der Iteratoren eines Knotens, eindeutig auch bei geschachtelten Reduktionen"""
+        return f"i_{variable_name(node_id)}"
+
+    def reducer(self, node_id, reducer):
+        """WCPS-Aggregation für einen Reducer-Graphen mit genau einem Knoten (mean, min, max, ...)"""
+        nodes = list((reducer or {}).get('process_graph', {}).values())
+        if len(nodes) != 1:
+            raise ProcessGraphError(f"Node {node_id}: reducer must consist of exactly one process")
+
+        process_id = nodes[0].get('process_id')
+        if process_id not in REDUCERS:
+            raise ProcessGraphError(f"Node {node_id}: reducer {process_id} is not supported")
+        return REDUCERS[process_id]
+
+    def save_result(self, arguments):
+        # Rasdaman erwartet die Daten unter "x", openEO unter "data"
+        data = self.argument(arguments, 'data' if 'data' in arguments else 'x')
+
+        output_format = arguments.get('format')
+        resolve_format(output_format)
+        self.output_format = output_format
+        return data
+
+
+def geometry_bbox(geometries):
+    """
+    Bounding Box (west, east, south, north) der Geometrien von aggregate_spatial
+
+    Unterstützt eine Bounding Box als Objekt sowie GeoJSON (Geometry, Feature,
+    FeatureCollection). Rasdaman schneidet rechteckig, Polygone werden daher
+    auf ihre Bounding Box reduziert.
+    """
+    if all(key in geometries for key in ('west', 'east', 'south', 'north')):
+        return geometries
+
+    coordinates = []
+
+    def collect(value):
+        if isinstance(value, (list, tuple)) and len(value) >= 2 and all(isinstance(v, (int, float)) for v in value[:2]):
+            coordinates.append(value[:2])
+        elif isinstance(value, (list, tuple)):
+            for item in value:
+                collect(item)
+
+    features = geometries.get('features', [geometries])
+    for feature in features:
+        geometry = feature.get('geometry', feature)
+        collect(geometry.get('coordinates', []))
+
+    if not coordinates:
+        raise ProcessGraphError("aggregate_spatial: geometries do not contain any coordinates")
+
+    longitudes = [c[0] for c in coordinates]
+    latitudes = [c[1] for c in coordinates]
+    return {
+        "west": min(longitudes),
+        "east": max(longitudes),
+        "south": min(latitudes),
+        "north": max(latitudes)
+    }
+
+
+def load_collection_arguments(process_graph):
+    """
+    Argumente des ersten load_collection-Knotens, unabhängig von seiner Knoten-ID
+
+    Raises:
+        ProcessGraphError: Wenn der Graph keinen load_collection-Knoten hat
+    """
+    if isinstance(process_graph, dict):
+        for node in process_graph.values():
+            if isinstance(node, dict) and node.get('process_id') == 'load_collection':
+                return node.get('arguments') or {}
+    raise ProcessGraphError("Process graph has no load_collection node")
+
+
+def compile_process_graph(process_graph):
+    """
+    Übersetze einen openEO-Prozessgraphen in eine WCPS-Query
+
+    Returns:
+        tuple: (WCPS-Query, MIME-Type des Ergebnisses)
+
+    Raises:
+        ProcessGraphError: Wenn der Graph nicht unterstützt wird
+    """
+    return WcpsCompiler(process_graph).compile()
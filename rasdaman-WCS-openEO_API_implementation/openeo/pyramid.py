@@ -0,0 +1,73 @@
+from config import PYRAMIDS
+
+# Toleranz beim Vergleich von Auflösungen in Grad (0.25 * 4 ist nicht immer exakt 1.0)
+RESOLUTION_TOLERANCE = 1e-9
+
+
+class PyramidError(ValueError):
+    """Die angeforderte Auflösung ist ungültig"""
+    pass
+
+
+def pyramid_levels(collection_id):
+    """
+    Stufen der Auflösungspyramide einer Collection, von fein nach grob
+
+    Returns:
+        list: (Auflösung in Grad, Coverage); die erste Stufe ist die Collection
+        selbst, leer, wenn für die Collection keine Pyramide konfiguriert ist
+    """
+    pyramid = PYRAMIDS.get(collection_id)
+    if not pyramid:
+        return []
+    resolution = pyramid['resolution']
+    levels = [(resolution * factor, coverage_id) for coverage_id, factor in pyramid['levels'].items()]
+    return [(resolution, collection_id)] + sorted(levels)
+
+
+def level_coverages():
+    """Coverages, die nur eine Pyramidenstufe einer anderen Collection sind"""
+    return {coverage_id for pyramid in PYRAMIDS.values() for coverage_id in pyramid['levels']}
+
+
+def parse_resolution(resolution):
+    """
+    Auflösung in Grad pro Pixel aus einer Zahl oder einem Paar [x, y]
+
+    Bei unterschiedlichen Auflösungen je Achse entscheidet die feinere.
+    0 bzw. None bedeutet: keine Änderung der Auflösung (Ergebnis None).
+    """
+    if resolution is None:
+        return None
+    values = resolution if isinstance(resolution, (list, tuple)) else [resolution]
+    if not values or any(isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0
+                         for value in values):
+        raise PyramidError(f"Invalid resolution {resolution!r}")
+    if any(value == 0 for value in values):
+        return None
+    return min(values)
+
+
+def select_level(collection_id, resolution=None):
+    """
+    Gröbste Pyramidenstufe, die die angeforderte Auflösung noch erfüllt
+
+    Eine Stufe erfüllt die Auflösung, wenn ihre Gitterweite höchstens so
+    groß ist wie die angeforderte. Ist keine Stufe grob genug oder gibt es
+    keine Pyramide, bleibt es bei der Collection selbst.
+
+    Args:
+        collection_id (str): Collection (Basis-Coverage)
+        resolution (float, optional): Grad pro Pixel, None für die native Auflösung
+
+    Returns:
+        str: Coverage, aus der gelesen wird
+    """
+    if resolution is None:
+        return collection_id
+
+    selected = collection_id
+    for level_resolution, coverage_id in pyramid_levels(collection_id):
+        if level_resolution <= resolution + RESOLUTION_TOLERANCE:
+            selected = coverage_id
+    return selected
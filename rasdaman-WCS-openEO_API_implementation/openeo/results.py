@@ -0,0 +1,168 @@
+import hashlib
+import os
+import shutil
+
+from config import RESULTS_DIR
+
+# Dateiendungen der von Rasdaman gelieferten Formate
+FILE_EXTENSIONS = {
+    'application/json': 'json',
+    'text/csv': 'csv',
+    'text/plain': 'txt',
+    'image/tiff': 'tif',
+    'image/png': 'png',
+    'image/jpeg': 'jpg',
+    'application/netcdf': 'nc'
+}
+
+
+class ResultStore:
+    """
+    Legt Job-Ergebnisse als Dateien unter RESULTS_DIR/<job_id>/ ab.
+
+    Im Job selbst werden nur Metadaten (Dateiname, Pfad, Größe, Format,
+    Prüfsumme) gespeichert, nie die Daten.
+    """
+
+    def __init__(self, root=RESULTS_DIR):
+        self.root = root
+
+    def job_dir(self, job_id):
+        return os.path.join(self.root, job_id)
+
+    def write_stream(self, job_id, chunks, media_type, name="result", before_commit=None):
+        """
+        Schreibe die Blöcke einer Antwort in eine Ergebnisdatei
+
+        Args:
+            job_id (str): Job, zu dem das Ergebnis gehört
+            chunks (iterable): Bytes-Blöcke (z.B. response.iter_content())
+            media_type (str): MIME-Type des Ergebnisses
+            name (str): Dateiname ohne Endung
+            before_commit (callable, optional): Wird vor dem Umbenennen der
+                vollständigen Datei aufgerufen; wirft es eine Exception (z.B.
+                weil der Job inzwischen gelöscht wurde), wird die Datei verworfen
+
+        Returns:
+            dict: Metadaten der geschriebenen Datei
+        """
+        directory = self.job_dir(job_id)
+        os.makedirs(directory, exist_ok=True)
+
+        filename = f"{name}.{FILE_EXTENSIONS.get(media_type, 'bin')}"
+        path = os.path.join(directory, filename)
+        tmp_path = path + ".part"
+
+        checksum = hashlib.sha256()
+        size = 0
+        try:
+            with open(tmp_path, 'wb') as file:
+                for chunk in chunks:
+                    if not chunk:
+                        continue
+                    file.write(chunk)
+                    checksum.update(chunk)
+                    size += len(chunk)
+            if before_commit is not None:
+                before_commit()
+            # Erst die vollständige Datei wird unter ihrem endgültigen Namen sichtbar
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            # Ein inzwischen gelöschter Job hinterlässt kein leeres Verzeichnis
+            try:
+                os.rmdir(directory)
+            except OSError:
+                pass
+            raise
+
+        return {
+            "filename": filename,
+            "path": path,
+            "size": size,
+            "type": media_type,
+            "checksum": f"sha256:{checksum.hexdigest()}"
+        }
+
+    def file_path(self, job_id, filename):
+        """Pfad einer Ergebnisdatei oder None, falls sie nicht existiert"""
+        directory = os.path.realpath(self.job_dir(job_id))
+        path = os.path.realpath(os.path.join(directory, filename))
+        # Keine Pfade außerhalb des Job-Verzeichnisses ausliefern
+        if os.path.dirname(path) != directory or not os.path.isfile(path):
+            return None
+        return path
+
+    def delete(self, job_id):
+        """Lösche alle Ergebnisdateien eines Jobs"""
+        shutil.rmtree(self.job_dir(job_id), ignore_errors=True)
+
+
+result_store = ResultStore()
+
+
+def parse_range_header(range_header):
+    """
+    Parse einen HTTP Range-Header mit genau einem Byte-Bereich
+
+    Returns:
+        tuple: (start, end) mit end=None für offene Bereiche, oder None,
+        falls der Header fehlt oder nicht unterstützt wird
+    """
+    if not range_header or not range_header.startswith('bytes='):
+        return None
+
+    byte_range = range_header[len('bytes='):].strip()
+    if ',' in byte_range or '-' not in byte_range:
+        return None
+
+    start, end = byte_range.split('-', 1)
+    # Suffix-Bereiche (bytes=-500) setzen die Gesamtgröße voraus
+    if not start.isdigit() or (end and not end.isdigit()):
+        return None
+
+    start = int(start)
+    end = int(end) if end else None
+    if end is not None and end < start:
+        return None
+    return start, end
+
+
+def parse_content_range(content_range):
+    """
+    Parse einen Content-Range-Header einer 206-Antwort (bytes start-end/total)
+
+    Returns:
+        tuple: (start, end, total) mit total=None für unbekannte Gesamtgröße
+        (bytes start-end/*), oder None, falls der Header fehlt oder ungültig ist
+    """
+    if not content_range or not content_range.startswith('bytes '):
+        return None
+
+    byte_range, _, total = content_range[len('bytes '):].strip().partition('/')
+    start, _, end = byte_range.partition('-')
+    if not start.isdigit() or not end.isdigit() or not (total.isdigit() or total == '*'):
+        return None
+
+    start, end = int(start), int(end)
+    total = int(total) if total != '*' else None
+    if end < start or (total is not None and end >= total):
+        return None
+    return start, end, total
+
+
+def iter_byte_range(chunks, start, end=None):
+    """Liefere nur die Bytes start..end (inklusive) eines Block-Streams"""
+    position = 0
+    for chunk in chunks:
+        chunk_start = position
+        position += len(chunk)
+        if position <= start:
+            continue
+        if end is not None and chunk_start > end:
+            break
+
+        lower = max(start - chunk_start, 0)
+        upper = len(chunk) if end is None else min(end - chunk_start + 1, len(chunk))
+        yield chunk[lower:upper]
@@ -0,0 +1,322 @@
+import base64
+import json
+import sqlite3
+import threading
+import uuid
+from contextlib import contextmanager
+
+from config import DATABASE_PATH, DATABASE_TIMEOUT
+from openeo.jobs import ACTIVE_STATUSES, now_iso
+
+
+class SqliteStore:
+    """
+    Persistente Ablage von JSON-Dokumenten (Jobs, Prozessgraphen) in SQLite.
+
+    Die Datenbank läuft im WAL-Modus, damit mehrere Worker-Prozesse (z.B.
+    gunicorn) gleichzeitig lesen können, während einer schreibt. Jeder Thread
+    verwendet eine eigene Verbindung. Schreibzugriffe laufen in
+    BEGIN IMMEDIATE-Transaktionen, Lesen-Ändern-Schreiben ist damit atomar.
+
+    Das vollständige Dokument liegt als JSON in der Spalte data, id, status,
+    created und updated werden zusätzlich als Spalten für Indizes und
+    Abfragen gespeichert.
+
+    created_table gibt an, ob dieser Store die Tabelle angelegt hat (erster
+    Start mit der Datenbank); nur dann legt seed Dokumente an.
+    """
+
+    table = None
+    id_prefix = None
+
+    def __init__(self, path=DATABASE_PATH, timeout=DATABASE_TIMEOUT):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        self.created_table = self._create_schema()
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            # isolation_level=None: Transaktionen werden explizit gesteuert
+            connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            connection.row_factory = sqlite3.Row
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    @contextmanager
+    def _transaction(self):
+        """Schreibtransaktion, die die Datenbank sofort für andere Schreiber sperrt"""
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield connection
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+
+    def _create_schema(self):
+        """
+        Returns:
+            bool: True, falls die Tabelle neu angelegt wurde
+        """
+        with self._transaction() as connection:
+            # Die Schreibsperre stellt sicher, dass nur ein Prozess die Tabelle neu anlegt
+            exists = connection.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (self.table,)
+            ).fetchone() is not None
+            connection.execute(f"""
+                CREATE TABLE IF NOT EXISTS {self.table} (
+                    id TEXT PRIMARY KEY,
+                    status TEXT,
+                    created TEXT NOT NULL,
+                    updated TEXT,
+                    data TEXT NOT NULL
+                )
+            """)
+            connection.execute(f"CREATE INDEX IF NOT EXISTS idx_{self.table}_status ON {self.table} (status)")
+            # Sortierung und Keyset-Paginierung nach (created, id)
+            connection.execute(f"CREATE INDEX IF NOT EXISTS idx_{self.table}_created ON {self.table} (created, id)")
+        return not exists
+
+    def new_id(self):
+        """Eindeutige ID, auch über mehrere Prozesse und nach dem Löschen von Einträgen"""
+        return f"{self.id_prefix}-{uuid.uuid4().hex}"
+
+    @staticmethod
+    def _row_values(document):
+        return (
+            document.get('status'),
+            document.get('created') or now_iso(),
+            document.get('updated'),
+            json.dumps(document)
+        )
+
+    def create(self, document):
+        """
+        Lege ein Dokument an; ohne id wird eine neue vergeben
+
+        Returns:
+            dict: Das gespeicherte Dokument inklusive id
+        """
+        document = dict(document)
+        document.setdefault('id', self.new_id())
+        document.setdefault('created', now_iso())
+        with self._transaction() as connection:
+            connection.execute(
+                f"INSERT INTO {self.table} (id, status, created, updated, data) VALUES (?, ?, ?, ?, ?)",
+                (document['id'],) + self._row_values(document)
+            )
+        return document
+
+    def seed(self, document):
+        """
+        Lege ein Dokument an, wenn die Tabelle gerade erst angelegt wurde
+
+        Bei jedem späteren Start bleibt die Datenbank unverändert, ein vom
+        Nutzer gelöschtes Dokument kommt also nicht wieder.
+        """
+        if not self.created_table:
+            return
+        document = dict(document)
+        document.setdefault('created', now_iso())
+        with self._transaction() as connection:
+            connection.execute(
+                f"INSERT OR IGNORE INTO {self.table} (id, status, created, updated, data) VALUES (?, ?, ?, ?, ?)",
+                (document['id'],) + self._row_values(document)
+            )
+
+    def get(self, document_id):
+        """Dokument oder None"""
+        row = self._connection().execute(
+            f"SELECT data FROM {self.table} WHERE id = ?", (document_id,)
+        ).fetchone()
+        return json.loads(row['data']) if row else None
+
+    def exists(self, document_id):
+        return self._connection().execute(
+            f"SELECT 1 FROM {self.table} WHERE id = ?", (document_id,)
+        ).fetchone() is not None
+
+    def update(self, document_id, updates):
+        """
+        Übernimm die Felder aus updates in das Dokument (atomar)
+
+        Returns:
+            dict: Das aktualisierte Dokument oder None, falls es nicht existiert
+        """
+        with self._transaction() as connection:
+            row = connection.execute(
+                f"SELECT data FROM {self.table} WHERE id = ?", (document_id,)
+            ).fetchone()
+            if row is None:
+                return None
+
+            document = json.loads(row['data'])
+            document.update(updates)
+            # Die id ist der Primärschlüssel und lässt sich nicht ändern
+            document['id'] = document_id
+            connection.execute(
+                f"UPDATE {self.table} SET status = ?, created = ?, updated = ?, data = ? WHERE id = ?",
+                self._row_values(document) + (document_id,)
+            )
+        return document
+
+    def delete(self, document_id):
+        """
+        Returns:
+            bool: True, falls das Dokument existierte
+        """
+        with self._transaction() as connection:
+            cursor = connection.execute(f"DELETE FROM {self.table} WHERE id = ?", (document_id,))
+        return cursor.rowcount > 0
+
+    def list(self, limit=None, cursor=None, status=None):
+        """
+        Dokumente sortiert nach Erstellungszeitpunkt, seitenweise
+
+        Die Paginierung erfolgt über (created, id) des letzten Eintrags der
+        vorherigen Seite, nicht über OFFSET. Jede Seite kostet damit gleich
+        viel, unabhängig davon, wie weit vorne sie liegt.
+
+        Args:
+            limit (int, optional): Maximale Anzahl Einträge der Seite
+            cursor (str, optional): next_cursor der vorherigen Seite
+            status (str, optional): Nur Dokumente mit diesem Status
+
+        Returns:
+            tuple: (Liste der Dokumente, Cursor der nächsten Seite oder None)
+        """
+        conditions = []
+        parameters = []
+        if status is not None:
+            conditions.append("status = ?")
+            parameters.append(status)
+        if cursor:
+            created, last_id = decode_cursor(cursor)
+            conditions.append("(created, id) > (?, ?)")
+            parameters.extend([created, last_id])
+
+        sql = f"SELECT id, created, data FROM {self.table}"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY created, id"
+        if limit is not None:
+            # Ein Eintrag mehr zeigt an, ob es eine weitere Seite gibt
+            sql += " LIMIT ?"
+            parameters.append(limit + 1)
+
+        rows = self._connection().execute(sql, parameters).fetchall()
+        next_cursor = None
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1]['created'], rows[-1]['id'])
+        return [json.loads(row['data']) for row in rows], next_cursor
+
+
+class JobStore(SqliteStore):
+    """Batch-Jobs (Tabelle jobs)"""
+
+    table = "jobs"
+    id_prefix = "job"
+
+    def get_status(self, job_id):
+        """Status eines Jobs ohne das Dokument zu laden, None falls er nicht existiert"""
+        row = self._connection().execute(
+            "SELECT status FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        return row['status'] if row else None
+
+    def transition(self, job_id, from_statuses, updates, remove=()):
+        """
+        Aktualisiere einen Job nur, wenn er sich in einem der Status from_statuses befindet
+
+        Damit kann ein Job auch über mehrere Prozesse hinweg nur einmal
+        eingereiht oder abgebrochen werden.
+
+        Args:
+            job_id (str): Job
+            from_statuses (tuple): Erlaubte Ausgangsstatus
+            updates (dict): Zu setzende Felder
+            remove (tuple): Zu entfernende Felder (z.B. error eines früheren Laufs)
+
+        Returns:
+            dict: Das aktualisierte Dokument oder None
+        """
+        with self._transaction() as connection:
+            row = connection.execute(
+                "SELECT status, data FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+            if row is None or row['status'] not in from_statuses:
+                return None
+
+            job = json.loads(row['data'])
+            for field in remove:
+                job.pop(field, None)
+            job.update(updates)
+            connection.execute(
+                "UPDATE jobs SET status = ?, created = ?, updated = ?, data = ? WHERE id = ?",
+                self._row_values(job) + (job_id,)
+            )
+        return job
+
+    def renew_leases(self, job_ids, lease_expires):
+        """Verlängere die Lease der wartenden oder laufenden Jobs unter job_ids"""
+        for job_id in job_ids:
+            self.transition(job_id, ACTIVE_STATUSES, {'lease_expires': lease_expires})
+
+    def expire_leases(self, now, updates):
+        """
+        Übernimm updates in alle wartenden oder laufenden Jobs, deren Lease vor now abgelaufen ist
+
+        Jobs ohne Lease stammen aus einer Version ohne Leases und gelten
+        ebenfalls als verwaist.
+
+        Returns:
+            list: IDs der geänderten Jobs
+        """
+        placeholders = ", ".join("?" for _ in ACTIVE_STATUSES)
+        expired = []
+        with self._transaction() as connection:
+            rows = connection.execute(
+                f"SELECT id, data FROM jobs WHERE status IN ({placeholders})", ACTIVE_STATUSES
+            ).fetchall()
+            for row in rows:
+                job = json.loads(row['data'])
+                if job.get('lease_expires', '') >= now:
+                    continue
+                job.pop('lease_expires', None)
+                job.update(updates)
+                connection.execute(
+                    "UPDATE jobs SET status = ?, created = ?, updated = ?, data = ? WHERE id = ?",
+                    self._row_values(job) + (row['id'],)
+                )
+                expired.append(row['id'])
+        return expired
+
+
+class ProcessGraphStore(SqliteStore):
+    """Benutzerdefinierte Prozessgraphen (Tabelle process_graphs)"""
+
+    table = "process_graphs"
+    id_prefix = "pg"
+
+
+def encode_cursor(created, document_id):
+    return base64.urlsafe_b64encode(f"{created}|{document_id}".encode()).decode()
+
+
+def decode_cursor(cursor):
+    """(created, id) aus einem Cursor, ValueError bei ungültigem Cursor"""
+    try:
+        created, document_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|', 1)
+    except Exception:
+        raise ValueError(f"Invalid cursor {cursor}")
+    return created, document_id
+
+
+job_store = JobStore()
+process_graph_store = ProcessGraphStore()
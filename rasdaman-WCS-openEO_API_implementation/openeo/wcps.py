@@ -0,0 +1,332 @@
+import re
+
+# Achsennamen der Rasdaman-Coverages (siehe rasdaman_import_files/ingredients.json)
+TEMPORAL_AXIS = "ansi"
+LAT_AXIS = "Lat"
+LONG_AXIS = "Long"
+# Achsen einer Coverage in Gitterreihenfolge
+COVERAGE_AXES = (TEMPORAL_AXIS, LAT_AXIS, LONG_AXIS)
+
+# Ausgabeformate: openEO-Name bzw. MIME-Type -> (WCPS-Format, MIME-Type)
+OUTPUT_FORMATS = {
+    'csv': ('csv', 'text/csv'),
+    'text/csv': ('csv', 'text/csv'),
+    'json': ('json', 'application/json'),
+    'application/json': ('json', 'application/json'),
+    'gtiff': ('GTiff', 'image/tiff'),
+    'image/tiff': ('GTiff', 'image/tiff'),
+    'netcdf': ('netCDF', 'application/netcdf'),
+    'application/netcdf': ('netCDF', 'application/netcdf'),
+    'png': ('PNG', 'image/png'),
+    'image/png': ('PNG', 'image/png')
+}
+DEFAULT_FORMAT = 'json'
+
+# Reduzierende WCPS-Funktionen (Kurzform von condense)
+AGGREGATIONS = ['add', 'avg', 'count', 'min', 'max', 'some', 'all']
+CONDENSE_OPERATORS = ['+', '*', 'min', 'max', 'and', 'or']
+# Aggregation -> condense-Operator für Reduktionen entlang einer Achse (avg und count über +)
+CONDENSE_AGGREGATIONS = {
+    'add': '+',
+    'avg': '+',
+    'count': '+',
+    'min': 'min',
+    'max': 'max',
+    'some': 'or',
+    'all': 'and'
+}
+
+OPEN_BOUNDS = (None, '*', '..')
+
+# CRS der Gitterkoordinaten (Pixel-Indizes), wie sie imageCrsDomain liefert
+GRID_CRS = "CRS:1"
+
+# Zahlen, die ungequotet in die Query dürfen (float() akzeptiert auch nan, inf, 1_0, ...)
+NUMBER_PATTERN = re.compile(r'^[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?$')
+# Coverage-IDs, die in den for-Teil der Query eingesetzt werden dürfen
+COVERAGE_ID_PATTERN = re.compile(r'^[A-Za-z_]\w*$')
+
+
+class WcpsError(ValueError):
+    """Die Query kann mit den angegebenen Parametern nicht gebaut werden"""
+    pass
+
+
+class Variable(str):
+    """
+    Vom Compiler erzeugte Iterator-Variable ($i_ansi), wird ungequotet eingesetzt
+
+    Nur Werte dieses Typs gelten als Variable, ein vom Nutzer übergebenes
+    "$x" wird wie jeder andere Zeitpunkt gequotet.
+    """
+    pass
+
+
+def resolve_format(output_format):
+    """(WCPS-Format, MIME-Type) für einen openEO-Formatnamen oder MIME-Type"""
+    key = (output_format or DEFAULT_FORMAT).lower()
+    if key not in OUTPUT_FORMATS:
+        raise WcpsError(f"Output format {output_format} is not supported")
+    return OUTPUT_FORMATS[key]
+
+
+def format_bound(value):
+    """Grenze eines Subsets: Zahlen bleiben unverändert, Zeitpunkte werden gequotet"""
+    if value in OPEN_BOUNDS:
+        return '*'
+    if isinstance(value, bool):
+        raise WcpsError(f"Invalid subset bound {value!r}")
+    if isinstance(value, (int, float)):
+        return repr(value)
+
+    # Iterator-Variablen eines Coverage-Konstruktors ($t) bleiben ungequotet
+    if isinstance(value, Variable):
+        return str(value)
+
+    value = str(value).strip()
+    if NUMBER_PATTERN.match(value):
+        return value
+    value = value[1:-1] if len(value) >= 2 and value[0] == value[-1] == '"' else value
+    # Ein Anführungszeichen würde den String beenden und den Rest als WCPS einsetzen
+    if '"' in value or '\\' in value or any(ord(c) < 32 for c in value):
+        raise WcpsError(f"Invalid subset bound {value!r}")
+    return f'"{value}"'
+
+
+class Subset:
+    """
+    Ausschnitt entlang einer Achse.
+
+    Fallen beide Grenzen zusammen, wird ein Slice erzeugt (die Achse
+    verschwindet aus dem Ergebnis), sonst ein Trim. Ist die Achse nach
+    beiden Seiten offen, wird sie gar nicht eingeschränkt.
+    """
+
+    def __init__(self, axis, low, high=None, slice_point=False, crs=None):
+        self.axis = axis
+        self.low = low
+        self.high = low if slice_point else high
+        # z.B. GRID_CRS, um in Gitterkoordinaten statt Geokoordinaten zu schneiden
+        self.crs = crs
+
+    @property
+    def is_slice(self):
+        return self.low not in OPEN_BOUNDS and format_bound(self.low) == format_bound(self.high)
+
+    @property
+    def is_full(self):
+        return self.low in OPEN_BOUNDS and self.high in OPEN_BOUNDS
+
+    def __str__(self):
+        axis = f'{self.axis}:"{self.crs}"' if self.crs else self.axis
+        if self.is_slice:
+            return f"{axis}({format_bound(self.low)})"
+        return f"{axis}({format_bound(self.low)}:{format_bound(self.high)})"
+
+
+def spatial_subsets(spatial_extent):
+    """Lat/Long-Subsets aus einem openEO spatial_extent (west, east, south, north)"""
+    if not spatial_extent:
+        return []
+    try:
+        return [
+            Subset(LAT_AXIS, spatial_extent['south'], spatial_extent['north']),
+            Subset(LONG_AXIS, spatial_extent['west'], spatial_extent['east'])
+        ]
+    except KeyError as e:
+        raise WcpsError(f"spatial_extent is missing {e}")
+
+
+def temporal_subsets(temporal_extent):
+    """ansi-Subset aus einem openEO temporal_extent [start, end]"""
+    if not temporal_extent:
+        return []
+    if len(temporal_extent) != 2:
+        raise WcpsError("temporal_extent must have exactly two elements")
+    return [Subset(TEMPORAL_AXIS, temporal_extent[0], temporal_extent[1])]
+
+
+def remaining_axes(axes, subsets):
+    """
+    Achsen eines Ausdrucks nach den Subsets (Slices entfernen ihre Achse)
+
+    Raises:
+        WcpsError: Wenn ein Subset eine Achse betrifft, die es nicht (mehr) gibt
+    """
+    for s in subsets:
+        if not s.is_full and s.axis not in axes:
+            raise WcpsError(f"Cannot subset {s.axis}, the data only has the axes {', '.join(axes) or 'none'}")
+    sliced = {s.axis for s in subsets if s.is_slice}
+    return tuple(axis for axis in axes if axis not in sliced)
+
+
+def subset(expression, subsets):
+    """Wende Subsets auf einen Coverage-Ausdruck an (volle Achsen entfallen)"""
+    parts = [str(s) for s in subsets if not s.is_full]
+    if not parts:
+        return expression
+    return f"{expression}[{', '.join(parts)}]"
+
+
+def aggregate(function, expression):
+    """Reduziere einen Coverage-Ausdruck auf einen Skalar (avg, min, max, ...)"""
+    if function not in AGGREGATIONS:
+        raise WcpsError(f"Aggregation {function} is not supported")
+    return f"{function}({expression})"
+
+
+def valid_cells(expression):
+    """Boolescher Ausdruck, der für jede Zelle mit Wert wahr ist (NaN = NaN ist falsch)"""
+    return f"({expression} = {expression})"
+
+
+def count_cells(expression):
+    """
+    Anzahl der Zellen eines Coverage-Ausdrucks
+
+    count erwartet in WCPS einen booleschen Ausdruck, gezählt werden daher
+    die Zellen, deren Wert gleich sich selbst ist.
+    """
+    return aggregate('count', valid_cells(expression))
+
+
+def axis_iterator(variable, axis, coverage):
+    """Iterator über den Grid-Bereich einer Achse, z.B. $t ansi(imageCrsDomain($c, ansi))"""
+    return f"${variable} {axis}(imageCrsDomain({coverage}, {axis}))"
+
+
+def condense(operator, iterators, using, where=None):
+    """Allgemeine Reduktion: condense <op> over <iteratoren> [where ...] using <ausdruck>"""
+    if operator not in CONDENSE_OPERATORS:
+        raise WcpsError(f"Condense operator {operator} is not supported")
+    where_clause = f" where {where}" if where else ""
+    return f"condense {operator} over {', '.join(iterators)}{where_clause} using {using}"
+
+
+def coverage_over(name, iterators, values):
+    """Neue Coverage aus einem Ausdruck pro Gitterpunkt: coverage <name> over ... values ..."""
+    return f"coverage {name} over {', '.join(iterators)} values {values}"
+
+
+def reduce_axes(expression, function, keep_axes, name="reduced", prefix="i"):
+    """
+    Reduziere einen Coverage-Ausdruck über alle Achsen außer keep_axes
+
+    Für jeden Gitterpunkt der verbleibenden Achsen wird die Aggregation über
+    die übrigen Achsen berechnet, z.B. der räumliche Mittelwert je Zeitschritt:
+    coverage reduced over $i_ansi ansi(imageCrsDomain(X, ansi))
+    values avg(X[ansi:"CRS:1"($i_ansi)])
+
+    Ohne verbleibende Achsen ist das Ergebnis ein Skalar. Die Iteratoren
+    heißen $<prefix>_<achse>; ineinander geschachtelte Reduktionen brauchen
+    verschiedene Präfixe.
+    """
+    reducer = count_cells if function == 'count' else lambda data: aggregate(function, data)
+    if not keep_axes:
+        return reducer(expression)
+
+    iterators = [axis_iterator(f"{prefix}_{axis}", axis, expression) for axis in keep_axes]
+    point = subset(expression, [
+        Subset(axis, Variable(f"${prefix}_{axis}"), slice_point=True, crs=GRID_CRS) for axis in keep_axes
+    ])
+    # Geklammert, sonst bezöge sich ein folgender Subset auf den values-Ausdruck
+    return f"({coverage_over(name, iterators, reducer(point))})"
+
+
+def reduce_axis(expression, function, axis, prefix="i"):
+    """
+    Reduziere einen Coverage-Ausdruck entlang einer Achse, die übrigen Achsen bleiben
+
+    condense läuft einmal je Schritt der Achse über ganze Ebenen, z.B. der
+    zeitliche Mittelwert je Gitterpunkt:
+    (condense + over $i_ansi ansi(imageCrsDomain(X, ansi)) using X[ansi:"CRS:1"($i_ansi)])
+    / (condense + over $i_ansi ansi(imageCrsDomain(X, ansi)) using 1)
+
+    reduce_axes mit den übrigen Achsen als keep_axes würde dagegen eine
+    Aggregation je Gitterpunkt erzeugen, bei era5 rund eine Million.
+    Der Iterator heißt $<prefix>_<achse> (siehe reduce_axes).
+    """
+    if function not in CONDENSE_AGGREGATIONS:
+        raise WcpsError(f"Aggregation {function} is not supported")
+
+    iterator = axis_iterator(f"{prefix}_{axis}", axis, expression)
+    step = subset(expression, [Subset(axis, Variable(f"${prefix}_{axis}"), slice_point=True, crs=GRID_CRS)])
+    if function == 'count':
+        # Boolesche Ebenen werden für die Summe in Zahlen umgewandelt
+        step = f"(int){valid_cells(step)}"
+    reduced = condense(CONDENSE_AGGREGATIONS[function], [iterator], step)
+    if function == 'avg':
+        return f"(({reduced}) / ({condense('+', [iterator], '1')}))"
+    return f"({reduced})"
+
+
+def variable_name(name):
+    """Gültiger WCPS-Variablenname (ohne $)"""
+    variable = re.sub(r'\W', '_', name)
+    if not variable or variable[0].isdigit():
+        variable = f"c_{variable}"
+    return variable
+
+
+class WcpsQuery:
+    """
+    Baut eine WCPS-Query der Form
+    for $a in (cov_a), $b in (cov_b) return encode(<ausdruck>, "<format>").
+
+    Reduziert der Ausdruck auf einen Skalar, entfällt das encode und
+    Rasdaman liefert nur den Wert zurück.
+    """
+
+    def __init__(self):
+        self.coverages = {}
+
+    def coverage(self, name, coverage_id):
+        """Registriere eine Coverage und liefere ihre Variable ($name)"""
+        if not isinstance(coverage_id, str) or not COVERAGE_ID_PATTERN.match(coverage_id):
+            raise WcpsError(f"Invalid coverage id {coverage_id!r}")
+        variable = variable_name(name)
+        existing = self.coverages.setdefault(variable, coverage_id)
+        if existing != coverage_id:
+            raise WcpsError(f"Variable ${variable} is already bound to {existing}")
+        return f"${variable}"
+
+    def for_clause(self):
+        if not self.coverages:
+            raise WcpsError("Query does not use any coverage")
+        return "for " + ", ".join(f"${variable} in ({coverage_id})" for variable, coverage_id in self.coverages.items())
+
+    def build(self, expression, output_format=None):
+        """
+        Returns:
+            tuple: (WCPS-Query, MIME-Type des Ergebnisses)
+        """
+        wcps_format, media_type = resolve_format(output_format)
+        return f'{self.for_clause()} return encode({expression}, "{wcps_format}")', media_type
+
+    def build_scalar(self, expression):
+        """Query ohne encode für skalare Ergebnisse (Rasdaman liefert Text)"""
+        return f"{self.for_clause()} return {expression}", 'text/plain'
+
+
+def subset_query(coverage_id, spatial_extent=None, temporal_extent=None, output_format=None, aggregation=None):
+    """
+    Query für einen Ausschnitt einer Coverage, optional reduziert
+
+    Args:
+        coverage_id (str): Rasdaman-Coverage
+        spatial_extent (dict, optional): west, east, south, north (oder '*')
+        temporal_extent (list, optional): [start, end]; start == end ergibt einen Slice
+        output_format (str, optional): openEO-Formatname oder MIME-Type
+        aggregation (str, optional): avg, min, max, ... über den gesamten Ausschnitt
+
+    Returns:
+        tuple: (WCPS-Query, MIME-Type des Ergebnisses)
+    """
+    query = WcpsQuery()
+    expression = subset(
+        query.coverage("c", coverage_id),
+        spatial_subsets(spatial_extent) + temporal_subsets(temporal_extent)
+    )
+    if aggregation:
+        return query.build_scalar(aggregate(aggregation, expression))
+    return query.build(expression, output_format)